@@ -0,0 +1,231 @@
+"""
+Intent Matcher - the keyword scan of the agents, made whole-word and scored.
+
+Same loop as before (`kw in query` for every keyword), with the mistakes
+fixed:
+
+- the query and the keywords are lowercased and accent-folded the same way,
+  so "reunion" == "reunión" and "MUÉSTRAME" == "muéstrame"
+- a substring hit only counts on word boundaries: "plan" no longer matches
+  "planta", "lee" no longer matches "leer"; the boundary check runs only
+  for the few keywords that hit
+- every intent gets a score (multi-word phrases weigh more), so the
+  result no longer depends on which keyword list is checked first;
+  ties fall back to the declaration order of the intents. This drops
+  the early exit on the first hit: every keyword is checked
+
+A trailing "*" on a keyword makes it a stem ("analiz*" → analiza, analizar).
+Where several keywords start at the same word the longest phrase wins, then
+the exact word, then the longest stem. Phrase words are matched separated
+by one space.
+
+`CentroidRouter` is the second stage for queries no keyword catches: the
+query embedding is compared (cosine, NumPy) with one centroid per intent,
+the mean of a few example utterances. Only a clear winner is returned.
+"""
+import time
+import string
+import asyncio
+import unicodedata
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+from loguru import logger
+
+try:
+    import numpy as np
+except ImportError:  # optional: without it there is no second stage
+    np = None
+
+# Punctuation separates words ("¿" and accents disappear with the ASCII fold)
+_SEPARATORS = str.maketrans({c: " " for c in string.punctuation if c != "_"})
+# Spanish accents, folded with str.replace (C speed; NFKD costs more than the whole scan)
+_ACCENTS = (("á", "a"), ("é", "e"), ("í", "i"), ("ó", "o"), ("ú", "u"), ("ü", "u"), ("ñ", "n"))
+
+
+def normalize(text: str) -> str:
+    if text.isascii():
+        return text.lower()
+    return unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode().lower()
+
+
+def words(text: str) -> List[str]:
+    return normalize(text).translate(_SEPARATORS).split()
+
+
+def fold(text: str) -> str:
+    """Lowercase without Spanish accents; other non-ASCII characters are kept as they are."""
+    text = text.lower()
+    if not text.isascii():
+        for accented, plain in _ACCENTS:
+            if accented in text:
+                text = text.replace(accented, plain)
+    return text
+
+
+def _is_word_char(c: str) -> bool:
+    return c.isalnum() or c == "_"
+
+
+@dataclass
+class IntentMatch:
+    intent: str
+    score: float
+    keywords: List[str] = field(default_factory=list)
+
+
+class IntentMatcher:
+    def __init__(self, intents: Dict[str, Sequence[str]]):
+        self.order = {intent: i for i, intent in enumerate(intents)}
+        # keyword (folded, "*" kept) -> intents declaring it; a keyword may belong to several
+        self._owners: Dict[str, List[str]] = {}
+        for intent, keywords in intents.items():
+            for kw in keywords:
+                text = " ".join(fold(kw.rstrip("*")).split())
+                if not text:
+                    continue
+                owners = self._owners.setdefault(text + ("*" if kw.endswith("*") else ""), [])
+                if intent not in owners:
+                    owners.append(intent)
+        # phrases weigh one per word; at one position: more words, exact before stem, longer stem
+        self._weights = {kw: float(kw.count(" ") + 1) for kw in self._owners}
+        priority = {kw: (-kw.count(" "), kw.endswith("*"), -len(kw)) for kw in self._owners}
+        # the legacy loop, one needle per keyword text: (needle, [(keyword, is_stem, priority)])
+        needles: Dict[str, List[Tuple[str, bool, Tuple]]] = {}
+        for kw in self._owners:
+            needles.setdefault(kw.rstrip("*"), []).append((kw, kw.endswith("*"), priority[kw]))
+        self._table = tuple(needles.items())
+
+    def _keywords(self, text: str) -> List[str]:
+        """Keywords found in `text`, left to right, without overlaps."""
+        query = fold(text)
+        n = len(query)
+        spans: List[Tuple[int, Tuple, int, str]] = []
+        for needle, entries in self._table:
+            if needle not in query:
+                continue
+            i = query.find(needle)
+            while i >= 0:
+                if i == 0 or not _is_word_char(query[i - 1]):
+                    end = i + len(needle)
+                    for kw, stem, priority in entries:
+                        if stem or end == n or not _is_word_char(query[end]):
+                            spans.append((i, priority, end, kw))
+                i = query.find(needle, i + 1)
+        if len(spans) < 2:
+            return [span[3] for span in spans]
+        spans.sort()
+        found: List[str] = []
+        done = 0
+        for start, _, end, kw in spans:
+            if start >= done:
+                found.append(kw)
+                done = end
+        return found
+
+    def _tally(self, text: str) -> Dict[str, List[str]]:
+        """intent -> its keywords found in `text`."""
+        found: Dict[str, List[str]] = {}
+        for kw in self._keywords(text):
+            for intent in self._owners[kw]:
+                found.setdefault(intent, []).append(kw)
+        return found
+
+    def _rank(self, intent: str, kws: List[str]) -> Tuple[float, int]:
+        return -sum(self._weights[kw] for kw in kws), self.order[intent]
+
+    def scores(self, text: str) -> List[IntentMatch]:
+        """Every matching intent with its score, best first (ties: declaration order)."""
+        found = self._tally(text)
+        ranked = sorted((self._rank(i, kws), i) for i, kws in found.items())
+        return [IntentMatch(i, -rank[0], found[i]) for rank, i in ranked]
+
+    def best(self, text: str) -> Optional[IntentMatch]:
+        found = self._tally(text)
+        if not found:
+            return None
+        rank, intent = min((self._rank(i, kws), i) for i, kws in found.items())
+        return IntentMatch(intent, -rank[0], found[intent])
+
+
+# texts -> vectors, e.g. vector_search_service.embed_many (embedding cache included)
+Embedder = Callable[[List[str]], Awaitable[List[List[float]]]]
+
+# Seconds before retrying the centroid build after the embedder failed
+CENTROID_RETRY_AFTER = 60.0
+
+
+def _unit_rows(vectors):
+    matrix = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
+
+
+class CentroidRouter:
+    """
+    Nearest intent centroid by cosine similarity.
+    A match needs similarity >= threshold and a lead of at least `margin`
+    over the runner-up; anything else returns None.
+    """
+
+    def __init__(
+        self,
+        examples: Dict[str, Sequence[str]],
+        embed: Embedder,
+        threshold: float = 0.72,
+        margin: float = 0.04,
+    ):
+        self.examples = {intent: list(texts) for intent, texts in examples.items() if texts}
+        self.embed = embed
+        self.threshold = threshold
+        self.margin = margin
+        self.intents: List[str] = list(self.examples)
+        self._centroids = None  # (n_intents, dim) unit rows
+        self._lock: Optional[asyncio.Lock] = None
+        self._retry_at = 0.0
+
+    @staticmethod
+    def available() -> bool:
+        return np is not None
+
+    async def _ensure(self) -> bool:
+        if self._centroids is not None:
+            return True
+        if np is None or not self.intents or time.monotonic() < self._retry_at:
+            return False
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if self._centroids is not None:
+                return True
+            texts = [t for intent in self.intents for t in self.examples[intent]]
+            try:
+                vectors = _unit_rows(await self.embed(texts))
+            except Exception as e:
+                self._retry_at = time.monotonic() + CENTROID_RETRY_AFTER
+                logger.warning(f"⚠️ Centroid router: no se pudieron embeber los ejemplos ({e})")
+                return False
+            rows, start = [], 0
+            for intent in self.intents:
+                end = start + len(self.examples[intent])
+                rows.append(vectors[start:end].mean(axis=0))
+                start = end
+            self._centroids = _unit_rows(rows)
+            logger.info(f"🧭 Centroid router: {len(self.intents)} intents, {len(texts)} ejemplos")
+        return True
+
+    async def classify(self, text: str) -> Optional[IntentMatch]:
+        """Best intent with its cosine similarity as score, or None if unsure/unavailable."""
+        if not await self._ensure():
+            return None
+        try:
+            query = _unit_rows(await self.embed([text]))[0]
+        except Exception as e:
+            logger.warning(f"⚠️ Centroid router: embedding de la consulta falló ({e})")
+            return None
+        similarities = self._centroids @ query
+        order = np.argsort(-similarities)
+        best = float(similarities[order[0]])
+        runner_up = float(similarities[order[1]]) if len(order) > 1 else -1.0
+        if best < self.threshold or best - runner_up < self.margin:
+            return None
+        return IntentMatch(self.intents[order[0]], round(best, 3))
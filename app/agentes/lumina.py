@@ -6,6 +6,8 @@ from typing import Dict, Any, Optional
 from loguru import logger
 import httpx
 from app.core.config import get_settings
+from app.utils.hydra import get_pool
+from app.utils.deadline import DeadlineExceeded, timeout_for
 
 settings = get_settings()
 
@@ -39,32 +41,35 @@ ENTREGABLES TÉCNICOS:
 
     async def think(self, query: str, context: Optional[Dict[str, Any]] = None) -> str:
         """Generate strategic insight."""
-        if not settings.MISTRAL_API_KEY:
+        pool = get_pool("mistral")
+        if not pool.keys:
             logger.warning("⏭️ Lumina: Sin conexión a Mistral")
             return "💡 Lumina está reconectando... análisis pendiente."
         
-        headers = {
-            "Authorization": f"Bearer {settings.MISTRAL_API_KEY}",
-            "Content-Type": "application/json"
-        }
-        
         messages = [
             {"role": "system", "content": self.SYSTEM_PROMPT},
             {"role": "user", "content": f"Contexto: {context or 'N/A'}\n\nConsulta: {query}"}
         ]
         
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    self.API_URL, 
-                    headers=headers, 
-                    json={"model": self.MODEL, "messages": messages, "temperature": 0.4},
-                    timeout=30.0
-                )
-                response.raise_for_status()
-                result = response.json()["choices"][0]["message"]["content"]
-                logger.info(f"✨ Lumina iluminó ({len(result)} chars)")
-                return result
+            async with pool.lease(model=self.MODEL) as api_key:
+                headers = {
+                    "Authorization": f"Bearer {api_key}",
+                    "Content-Type": "application/json"
+                }
+                async with httpx.AsyncClient() as client:
+                    response = await client.post(
+                        self.API_URL, 
+                        headers=headers, 
+                        json={"model": self.MODEL, "messages": messages, "temperature": 0.4},
+                        timeout=timeout_for(30.0, "lumina")
+                    )
+                    response.raise_for_status()
+                    result = response.json()["choices"][0]["message"]["content"]
+            logger.info(f"✨ Lumina iluminó ({len(result)} chars)")
+            return result
+        except DeadlineExceeded:
+            raise  # the caller reports the skipped stage; an error string would look like an answer
         except Exception as e:
             logger.error(f"❌ Lumina error: {e}")
             return f"Error estratégico: {str(e)}"
@@ -6,6 +6,7 @@ from typing import Dict, Any, Optional
 from loguru import logger
 from app.services.vector_search import vector_search_service
 from app.core.config import get_settings
+from app.utils.deadline import DeadlineExceeded, within
 
 settings = get_settings()
 
@@ -25,7 +26,7 @@ class Memoris:
         logger.info(f"📚 Memorís buscando: '{query[:50]}...'")
         
         try:
-            results = await vector_search_service.search(query, org_id, limit=5)
+            results = await within(vector_search_service.search(query, org_id, limit=5), "memoris")
             
             if not results:
                 return "🔍 Memorís no encontró información relevante en la base de conocimiento."
@@ -39,6 +40,8 @@ class Memoris:
             logger.info(f"📚 Memorís recuperó {len(results)} fragmentos")
             return formatted
             
+        except DeadlineExceeded:
+            return "⏱️ Memorís no alcanzó a consultar la base de conocimiento a tiempo."
         except Exception as e:
             logger.error(f"❌ Memorís error: {e}")
             return f"Error consultando memoria: {str(e)}"
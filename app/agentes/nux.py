@@ -6,11 +6,20 @@ from typing import Dict, Any, Optional
 from loguru import logger
 import httpx
 from app.core.config import get_settings
+from app.utils.hydra import get_pool
+from app.utils.deadline import DeadlineExceeded, timeout_for
+from app.utils.hedging import claim_side_effects
 from app.services.n8n import n8n_service
 from app.services.notion import notion_service
+from app.agentes.intent import IntentMatcher
 
 settings = get_settings()
 
+NUX_INTENTS = IntentMatcher({
+    "followup": ["crea tarea", "crea una tarea", "anota", "seguimiento", "apunta"],
+    "outreach": ["envía*", "contacta*", "prospecta*", "outreach"],
+})
+
 
 class Nux:
     """
@@ -41,14 +50,16 @@ REGLAS:
 
     async def act(self, query: str, context: Optional[Dict[str, Any]] = None) -> str:
         """Execute sales/prospecting action."""
-        query_lower = query.lower()
+        intent = NUX_INTENTS.best(query)
         
-        # Direct Notion task creation
-        if any(kw in query_lower for kw in ["crea tarea", "anota", "seguimiento", "apunta"]):
+        # Direct Notion task creation (as a Cortex hedge, Nux now owns the race)
+        if intent and intent.intent == "followup":
+            claim_side_effects("nux:followup")
             return await self._create_followup(query)
         
         # Trigger outreach workflow
-        if any(kw in query_lower for kw in ["envía", "contacta", "prospecta", "outreach"]):
+        if intent and intent.intent == "outreach":
+            claim_side_effects("nux:outreach")
             return await self._trigger_outreach(query, context)
         
         # Use LLM for complex decisions
@@ -84,27 +95,30 @@ REGLAS:
     
     async def _llm_decide(self, query: str, context: Optional[Dict[str, Any]] = None) -> str:
         """Use Groq for complex sales decisions."""
-        if not settings.GROQ_API_KEY:
+        pool = get_pool("groq")
+        if not pool.keys:
             return "⚠️ Nux sin conexión (falta API Key de Groq)"
         
-        headers = {
-            "Authorization": f"Bearer {settings.GROQ_API_KEY}",
-            "Content-Type": "application/json"
-        }
-        
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    self.API_URL,
-                    headers=headers,
-                    json={"model": self.MODEL, "messages": [
-                        {"role": "system", "content": self.SYSTEM_PROMPT},
-                        {"role": "user", "content": query}
-                    ]},
-                    timeout=15.0
-                )
-                response.raise_for_status()
-                return response.json()["choices"][0]["message"]["content"]
+            async with pool.lease(model=self.MODEL) as api_key:
+                headers = {
+                    "Authorization": f"Bearer {api_key}",
+                    "Content-Type": "application/json"
+                }
+                async with httpx.AsyncClient() as client:
+                    response = await client.post(
+                        self.API_URL,
+                        headers=headers,
+                        json={"model": self.MODEL, "messages": [
+                            {"role": "system", "content": self.SYSTEM_PROMPT},
+                            {"role": "user", "content": query}
+                        ]},
+                        timeout=timeout_for(15.0, "nux")
+                    )
+                    response.raise_for_status()
+                    return response.json()["choices"][0]["message"]["content"]
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             logger.error(f"❌ Nux LLM error: {e}")
             return f"Error: {e}"
@@ -3,7 +3,7 @@ Aureon Cortex - Polímata Enrutador
 El sistema de orquestación multi-agente de ElevatOS.
 Con auto-recuperación: si Vox falla, Lumina toma el control.
 """
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Tuple
 from loguru import logger
 from pydantic import BaseModel, Field
 
@@ -11,20 +11,48 @@ from app.agentes.lumina import Lumina
 from app.agentes.nux import Nux
 from app.agentes.memoris import Memoris
 from app.agentes.vox import Vox
+from app.agentes.intent import IntentMatcher, CentroidRouter
 from app.core.config import get_settings
+from app.services.vector_search import vector_search_service
+from app.services.response_cache import SemanticResponseCache, cacheable, response_scope, ttl_for
+from app.services.transcription import transcription_service
+from app.utils.hydra import get_pool
+from app.utils.hedging import LatencyTracker, hedged
+from app.utils.circuit_breaker import get_breaker
+from app.utils.deadline import DeadlineExceeded, current_deadline, timeout_for, within
 
 settings = get_settings()
 
-import os
-from groq import Groq
+import re
+import asyncio
 
 
 
+class Subtask(BaseModel):
+    """One part of a multi-intent message: the agent and the clauses meant for it."""
+    agent: str
+    query: str
+
+
 class RoutingDecision(BaseModel):
     """Structured routing decision."""
     agent: str = Field(description="Target agent: lumina, nux, memoris, vox")
     confidence: float = Field(default=0.8)
     reasoning: str = Field(default="")
+    subtasks: List[Subtask] = Field(default_factory=list, description="2+ agents to run concurrently")
+
+
+# Clause boundaries for multi-intent messages ("analiza X y agéndame Y")
+CLAUSE_SPLIT = re.compile(r"\s*(?:[,;]|\.\s|\s(?:y|e|además|también|luego|después)\s)\s*", re.IGNORECASE)
+# Agents that can take part in a fan-out (Vox is the conversational default, not a task)
+FANOUT_AGENTS = ("lumina", "nux", "memoris", "scheduler")
+MAX_FANOUT = 3
+AGENT_LABELS = {
+    "lumina": "✨ Lumina",
+    "nux": "⚡ Nux",
+    "memoris": "📚 Memorís",
+    "scheduler": "📅 Scheduler",
+}
 
 
 class AureonCortex:
@@ -44,11 +72,60 @@ class AureonCortex:
     Lumina (1.5/Mistral) toma el control automáticamente.
     """
     
+    DEADLINE_MESSAGE = "⏱️ Se me acabó el tiempo para esta consulta. ¿Me la repites más concreta o en partes?"
+
+    # Whole words, accent-insensitive; "*" marks a stem (see app/agentes/intent.py)
     INTENT_KEYWORDS = {
-        "lumina": ["estrategia", "analiza", "plan", "riesgo", "evalúa", "piensa", "insight", "roi"],
-        "nux": ["vende", "prospecta", "lead", "cliente", "contacta", "seguimiento", "outreach", "cierra"],
+        "lumina": ["estrategia", "analiz*", "plan", "planes", "riesgo*", "evalú*", "piensa", "insight*", "roi"],
+        "nux": ["vende", "prospect*", "lead", "leads", "cliente", "clientes", "contacta*", "seguimiento", "outreach", "cierra"],
         "memoris": ["recuerda", "busca", "encuentra", "qué dijimos", "historial", "contexto", "conocimiento"],
-        "scheduler": ["reunión", "calendario", "agenda", "cita", "programe", "agendar", "clase", "correo", "email", "gmail", "notion", "tarea"],
+        "scheduler": ["reunión", "reuniones", "calendario", "agenda", "cita", "citas", "programe", "agend*", "clase", "clases", "correo*", "email*", "gmail", "notion", "tarea", "tareas"],
+    }
+    INTENTS = IntentMatcher(INTENT_KEYWORDS)
+
+    # Second stage (no keyword hit): nearest centroid of these examples. "vox" is a
+    # centroid too, so small talk stays with Vox instead of being forced elsewhere.
+    INTENT_EXAMPLES = {
+        "lumina": [
+            "¿Qué opinas de subir los precios un 20% el próximo trimestre?",
+            "¿Vale la pena contratar otro desarrollador o seguimos con freelancers?",
+            "Compara las ventajas de ofrecer mantenimiento mensual frente a proyectos cerrados",
+            "¿Cómo deberíamos posicionar la agencia frente a la competencia?",
+            "Qué métricas deberíamos mirar para saber si la campaña funcionó",
+            "Dame pros y contras de expandirnos a México",
+        ],
+        "nux": [
+            "Consígueme empresas de logística que podrían necesitar automatizaciones",
+            "Redacta un mensaje en frío para una clínica dental",
+            "¿A quién le podemos ofrecer el paquete de chatbots esta semana?",
+            "Escríbele al dueño de la panadería para ofrecerle la demo",
+            "Arma una lista de restaurantes en Caracas para venderles el bot de WhatsApp",
+            "Necesito cerrar más ventas este mes",
+        ],
+        "memoris": [
+            "¿Qué le cobramos a Vernal por el último proyecto?",
+            "¿Cómo configuramos el webhook de Telegram la otra vez?",
+            "¿Dónde quedó documentado el proceso de onboarding?",
+            "¿Qué workflow de n8n usamos para las facturas?",
+            "Muéstrame lo que tenemos guardado sobre el cliente de seguros",
+            "¿Cuál era la contraseña del panel de Hostinger? Está en la documentación",
+        ],
+        "scheduler": [
+            "¿Estoy libre mañana a las 10?",
+            "Pon una llamada con Andrea el viernes por la tarde",
+            "Recuérdame pagar el servidor el lunes",
+            "Mueve la junta del martes para el jueves",
+            "¿Qué pendientes tengo para hoy?",
+            "Bloquea dos horas el miércoles para trabajar en la propuesta",
+        ],
+        "vox": [
+            "Hola, ¿cómo estás?",
+            "Gracias, eso es todo por ahora",
+            "Cuéntame un chiste",
+            "¿Quién eres?",
+            "Buenos días Aureon",
+            "Explícame qué es una API en palabras sencillas",
+        ],
     }
 
     def __init__(self):
@@ -58,21 +135,97 @@ class AureonCortex:
         self.memoris = Memoris()
         self.scheduler = Scheduler()
         self.vox = Vox()
+        self.latency = LatencyTracker(settings.HEDGE_PERCENTILE, settings.HEDGE_DEFAULT_DELAY)
+        self.response_cache: Optional[SemanticResponseCache] = None
+        if settings.RESPONSE_CACHE_ENABLED:
+            self.response_cache = SemanticResponseCache(
+                "cortex",
+                embed=lambda texts: vector_search_service.embed_many(texts, "SEMANTIC_SIMILARITY"),
+                similarity=settings.RESPONSE_CACHE_SIMILARITY,
+            )
+        self.centroids: Optional[CentroidRouter] = None
+        if settings.SEMANTIC_ROUTING and CentroidRouter.available():
+            self.centroids = CentroidRouter(
+                self.INTENT_EXAMPLES,
+                lambda texts: vector_search_service.embed_many(texts, "SEMANTIC_SIMILARITY"),
+                threshold=settings.SEMANTIC_ROUTING_THRESHOLD,
+                margin=settings.SEMANTIC_ROUTING_MARGIN,
+            )
         logger.info("🧠 Aureon Cortex inicializado | Lumina ✨ | Nux ⚡ | Memorís 📚 | Scheduler 📅 | Vox 🎙️")
 
+    def split_intents(self, query: str) -> List[Subtask]:
+        """
+        Clause-level intents, grouped per agent in order of appearance.
+        Clauses without a keyword stay with the previous agent ("agenda con Andrea y Carlos").
+        Each agent gets its clauses as written (adjacent ones keep their connector).
+        """
+        spans, start = [], 0
+        for sep in CLAUSE_SPLIT.finditer(query):
+            spans.append((start, sep.start()))
+            start = sep.end()
+        spans.append((start, len(query)))
+
+        groups: Dict[str, List[int]] = {}  # agent -> clause indexes
+        pending: List[int] = []
+        current: Optional[str] = None
+        for i, (a, b) in enumerate(spans):
+            clause = query[a:b]
+            if not clause.strip():
+                continue
+            best = self.INTENTS.best(clause)
+            agent = best.intent if best and best.intent in FANOUT_AGENTS else None
+            if agent is None or (agent not in groups and len(groups) >= MAX_FANOUT):
+                # No keyword (or beyond MAX_FANOUT): the text stays with the previous agent
+                (groups[current] if current else pending).append(i)
+                continue
+            groups.setdefault(agent, []).extend(pending + [i])
+            pending, current = [], agent
+
+        subtasks = []
+        for agent, indexes in groups.items():
+            runs: List[List[int]] = []
+            for i in indexes:
+                if runs and runs[-1][-1] == i - 1:
+                    runs[-1].append(i)
+                else:
+                    runs.append([i])
+            text = "; ".join(query[spans[r[0]][0]:spans[r[-1]][1]].strip() for r in runs)
+            subtasks.append(Subtask(agent=agent, query=text))
+        return subtasks
+
     def classify_intent(self, query: str) -> RoutingDecision:
-        """Classify and route to the appropriate agent."""
-        query_lower = query.lower()
-        
-        for agent, keywords in self.INTENT_KEYWORDS.items():
-            for kw in keywords:
-                if kw in query_lower:
-                    logger.info(f"🎯 Enrutando a: {agent.upper()} (keyword: {kw})")
-                    return RoutingDecision(agent=agent, confidence=0.9, reasoning=f"Keyword: '{kw}'")
+        """Classify and route to the appropriate agent (whole-word keyword tables, every intent scored)."""
+        ranked = self.INTENTS.scores(query)
+        if len([m for m in ranked if m.intent in FANOUT_AGENTS]) > 1:
+            subtasks = self.split_intents(query)
+            if len(subtasks) > 1:
+                agents = [t.agent for t in subtasks]
+                logger.info(f"🎯 Multi-intención: {' + '.join(a.upper() for a in agents)}")
+                return RoutingDecision(
+                    agent=agents[0], confidence=0.8, reasoning=f"Multi-intent: {agents}", subtasks=subtasks
+                )
+        if ranked:
+            best = ranked[0]
+            total = sum(m.score for m in ranked)
+            # A single matching intent keeps the historical 0.9; contested matches get less
+            confidence = round(0.5 + 0.4 * best.score / total, 2)
+            logger.info(f"🎯 Enrutando a: {best.intent.upper()} (keywords: {', '.join(best.keywords)})")
+            return RoutingDecision(agent=best.intent, confidence=confidence, reasoning=f"Keywords: {best.keywords}")
         
         # Default: Vox handles general conversation
         return RoutingDecision(agent="vox", confidence=0.7, reasoning="Conversación general")
 
+    async def classify(self, query: str) -> RoutingDecision:
+        """Keywords first; if none hit, the embedding centroids (no LLM call) before defaulting to Vox."""
+        decision = self.classify_intent(query)
+        if decision.agent != "vox" or self.centroids is None:
+            return decision
+        match = await self.centroids.classify(query)
+        if match and match.intent != "vox":
+            logger.info(f"🧭 Enrutando a: {match.intent.upper()} (centroide, similitud {match.score})")
+            return RoutingDecision(agent=match.intent, confidence=match.score, reasoning="Centroide semántico")
+        return decision
+
     async def route(
         self, 
         query: str, 
@@ -83,11 +236,70 @@ class AureonCortex:
         Main routing method - the heart of Aureon Cortex.
         Con auto-recuperación: si Vox falla, Lumina entra al rescate.
         """
-        decision = self.classify_intent(query)
-        logger.info(f"🔀 Cortex → {decision.agent.upper()} | Confianza: {decision.confidence}")
-        
+        decision = await self.classify(query)
+        targets = " + ".join(t.agent.upper() for t in decision.subtasks) or decision.agent.upper()
+        logger.info(f"🔀 Cortex → {targets} | Confianza: {decision.confidence}")
+
+        # Near-duplicate questions are answered from the response cache (text only:
+        # attachments change the question)
+        cache = self.response_cache
+        parts = decision.subtasks or [Subtask(agent=decision.agent, query=query)]
+        ttl = min(ttl_for(t.agent, t.query) for t in parts) if cache is not None and query and not attachments else 0.0
+        scope = response_scope(
+            (context or {}).get("organization_id"), (context or {}).get("user_id"), "+".join(t.agent for t in parts)
+        )
+        if cache is not None:
+            if ttl > 0:
+                cached = await cache.get(query, scope)
+                if cached is not None:
+                    return cached
+            else:
+                cache.bypass()
+
+        deadline = current_deadline()
+        skipped = len(deadline.skipped) if deadline else 0
+        if decision.subtasks:
+            answer, complete = await self._fan_out(query, decision.subtasks, context)
+        else:
+            answer = await self._dispatch(decision.agent, query, context, attachments)
+            complete = True
+        # Answers that lost stages to the deadline are degraded: don't replay them.
+        # Same for a merged reply with a failed part (the header hides its error prefix).
+        if ttl > 0 and complete and not (deadline and len(deadline.skipped) > skipped):
+            await cache.put(query, scope, answer, ttl)
+        return answer
+
+    async def _fan_out(self, query: str, subtasks: List[Subtask], context: Optional[Dict[str, Any]]) -> Tuple[str, bool]:
+        """
+        Run every agent of a multi-intent message concurrently and merge the replies in message order.
+        Returns the merged reply and whether every part is cacheable.
+        """
+        # Each agent gets its clauses; the whole message travels in the context
+        shared = {**(context or {}), "mensaje_completo": query}
+
+        async def run(task: Subtask) -> str:
+            try:
+                return await within(self._dispatch(task.agent, task.query, dict(shared), None), f"fanout:{task.agent}")
+            except DeadlineExceeded:
+                return "⏱️ No alcanzó a terminar a tiempo."
+
+        started = asyncio.get_running_loop().time()
+        replies = await asyncio.gather(*(run(t) for t in subtasks))
+        logger.info(f"🔀 Fan-out {len(subtasks)} agentes en {asyncio.get_running_loop().time() - started:.2f}s")
+        merged = "\n\n".join(
+            f"**{AGENT_LABELS.get(t.agent, t.agent)}** — _{t.query}_\n{reply}" for t, reply in zip(subtasks, replies)
+        )
+        return merged, all(cacheable(reply) for reply in replies)
+
+    async def _dispatch(
+        self,
+        agent: str,
+        query: str,
+        context: Optional[Dict[str, Any]],
+        attachments: Optional[List[Dict[str, Any]]],
+    ) -> str:
         try:
-            match decision.agent:
+            match agent:
                 case "lumina":
                     return await self.lumina.think(query, context)
                 case "nux":
@@ -100,9 +312,12 @@ class AureonCortex:
                     # Vox es el default, pero tiene fallback a Lumina
                     return await self._universal_fallback(query, context, attachments)
                     
+        except DeadlineExceeded:
+            logger.error(f"⏱️ Cortex: {agent} no terminó dentro del deadline")
+            return self.DEADLINE_MESSAGE
         except Exception as e:
             error_str = str(e)
-            logger.error(f"❌ Cortex error en {decision.agent}: {e}")
+            logger.error(f"❌ Cortex error en {agent}: {e}")
             
             # Si cualquier agente falla, intentar con Lumina
             if "429" in error_str or "RESOURCE_EXHAUSTED" in error_str:
@@ -114,29 +329,6 @@ class AureonCortex:
             
             return "🔧 Mis sistemas principales están en mantenimiento preventivo. Dame 30 segundos para recalibrar."
 
-    async def _transcribe_audio(self, file_path: str) -> str:
-        """Transcribe audio using Groq Whisper (Fast & Cheap fallback)."""
-        try:
-            if not settings.GROQ_API_KEY:
-                logger.warning("🚫 Groq API Key missing for transcription.")
-                return ""
-                
-            client = Groq(api_key=settings.GROQ_API_KEY)
-            
-            with open(file_path, "rb") as file:
-                transcription = client.audio.transcriptions.create(
-                    file=(os.path.basename(file_path), file.read()),
-                    model="whisper-large-v3",
-                    response_format="text"
-                )
-            
-            logger.info(f"👂 Audio Transcrito (Groq): {transcription[:50]}...")
-            return transcription.strip()
-            
-        except Exception as e:
-            logger.error(f"❌ Error transcribiendo audio con Groq: {e}")
-            return ""
-
     async def _universal_fallback(
         self,
         query: str,
@@ -146,66 +338,104 @@ class AureonCortex:
         """
         🛡️ Protocolo Universal de Resiliencia
         Cadena de mando: Vox (Gemini) -> Lumina (Mistral) -> Nux (Groq) -> DeepSeek/OpenAI
+        Hedged: si un núcleo tarda más que su p95 (HEDGE_PERCENTILE), el siguiente arranca en paralelo.
         """
         
-        # 0. Audio Rescue: If query is empty and we have audio, transcribe it first if Vox fails
-        # But Vox handles audio natively. We only need to transcribe if Vox FAILS.
-        # However, we can't easily retry Vox with transcription since it was likely a 429.
-        # So we transcribe for the NEXT agents (Lumina/Nux) who only speak text.
-        
-        audio_path = None
+        # Audio Rescue: every agent in the chain speaks text, so a voice note without
+        # caption gets a Groq Whisper transcription. Telegram sends the bytes
+        # ({"type": "audio", "data"}), other callers may pass a file ({"type": "voice", "path"}).
+        audio = None
         if attachments:
             for att in attachments:
-                if att.get('type') == 'voice' and att.get('path'):
-                    audio_path = att.get('path')
+                if att.get('type') in ('audio', 'voice') and (att.get('data') or att.get('path')):
+                    audio = att
                     break
 
-        # 1. Intentar con Vox (Gemini 2.0 / 1.5)
-        try:
-            logger.info("🎙️ Aureon: Intentando Vox (Gemini)...")
-            return await self.vox.respond(query, context, attachments)
-        except Exception as e:
-            logger.warning(f"⚠️ Vox falló: {e}. Recuperando contexto de audio...")
-            
-            # 🚨 EMERGENCY HEARING AID
-            if audio_path and not query:
-                logger.info("🦻 Vox falló en audio. Activando Groq Whisper para transcribir...")
-                transcribed_text = await self._transcribe_audio(audio_path)
-                if transcribed_text:
-                    query = transcribed_text
-                    # Update context to reflect transcription
-                    if context is None: context = {}
-                    context['transcription_source'] = 'Groq Whisper Fallback'
+        # 🚨 EMERGENCY HEARING AID: shared by every attempt (hedges start in parallel) and run once.
+        transcript: Optional[asyncio.Task] = None
+
+        async def text_query() -> str:
+            nonlocal transcript, context
+            if query or not audio:
+                return query
+            if transcript is None:
+                logger.info("🦻 Nota de voz sin texto. Activando Groq Whisper para transcribir...")
+                mime_type = audio.get('mime_type', 'audio/ogg')
+                if audio.get('data'):
+                    pending = transcription_service.transcribe(audio['data'], mime_type)
                 else:
-                    logger.warning("🔕 No se pudo transcribir el audio. Lumina volará a ciegas.")
+                    pending = transcription_service.transcribe_file(audio['path'], mime_type)
+                transcript = asyncio.ensure_future(pending)
+            text = await asyncio.shield(transcript)
+            if text:
+                if context is None: context = {}
+                context['transcription_source'] = 'Groq Whisper Fallback'
+            else:
+                logger.warning("🔕 No se pudo transcribir el audio. Lumina volará a ciegas.")
+            return text
 
-        # 2. Fallback a Lumina (Mistral Large) via Mistral API
-        try:
-            logger.info(f"✨ Aureon: Vox caído. Lumina tomando el control (Mistral)... Query: {query}")
-            return await self.lumina.think(query, context)
-        except Exception as e:
-            logger.warning(f"⚠️ Lumina falló: {e}. Activando Nux...")
+        # 1. Vox (Gemini 2.0 / 1.5) — gets the attachment count, not the audio itself
+        async def vox():
+            logger.info("🎙️ Aureon: Intentando Vox (Gemini)...")
+            return await self.vox.respond(await text_query(), context, attachments)
 
-        # 3. Fallback a Nux (Groq LLaMA 3)
-        try:
-            logger.info("⚡ Aureon: Lumina caída. Nux tomando el control (Groq)...")
-            # Force Nux to act as chat executioner
-            nux_response = await self.nux.act(query, context)
-            return nux_response
-        except Exception as e:
-            logger.warning(f"⚠️ Nux falló: {e}. Activando Núcleo de Último Recurso...")
+        # 2. Lumina (Mistral Large) via Mistral API
+        async def lumina():
+            text = await text_query()
+            logger.info(f"✨ Aureon: Lumina tomando el control (Mistral)... Query: {text}")
+            return await self.lumina.think(text, context)
+
+        # 3. Nux (Groq LLaMA 3), forced to act as chat executioner
+        async def nux():
+            logger.info("⚡ Aureon: Nux tomando el control (Groq)...")
+            return await self.nux.act(await text_query(), context)
 
         # 4. Último Recurso: DeepSeek / OpenAI (Direct API)
+        async def last_resort():
+            return await self._direct_completion(await text_query())
+
+        # Sequential chain, but a slow provider gets raced by the next one.
+        # Providers with an open circuit are skipped instead of waiting for their timeout.
+        attempts = []
+        for name, provider, attempt in (
+            ("vox", "gemini", vox), ("lumina", "mistral", lumina), ("nux", "groq", nux), ("direct", None, last_resort),
+        ):
+            if provider and get_breaker(provider).is_open():
+                logger.warning(f"⏭️ Saltando {name.upper()}: circuito de {provider.upper()} abierto")
+                continue
+            attempts.append((name, attempt))
+
         try:
-            import httpx
-            logger.info("🥥 Aureon: Activando DeepSeek/OpenAI...")
-            api_key = settings.DEEPSEEK_API_KEY or settings.OPENAI_API_KEY
-            if not api_key:
-                raise ValueError("No DeepSeek/OpenAI key available")
-            
-            base_url = "https://api.deepseek.com/v1/chat/completions" if settings.DEEPSEEK_API_KEY else "https://api.openai.com/v1/chat/completions"
-            model = "deepseek-chat" if settings.DEEPSEEK_API_KEY else "gpt-3.5-turbo"
-            
+            return await hedged(
+                attempts,
+                self.latency,
+                scope="cortex",
+                enabled=settings.HEDGE_ENABLED,
+            )
+        except Exception as e:
+            deadline = current_deadline()
+            if isinstance(e, DeadlineExceeded) or (deadline is not None and deadline.expired()):
+                logger.error(f"⏱️ Deadline agotado. Etapas omitidas: {deadline.skipped if deadline else []}")
+                return self.DEADLINE_MESSAGE
+            logger.error(f"❌ FALLO TOTAL DEL SISTEMA: {e}")
+            return "🔥 Error Crítico: Todos los núcleos de IA están fuera de línea. Por favor contacta a soporte."
+        finally:
+            if transcript is not None and not transcript.done():
+                transcript.cancel()
+
+    async def _direct_completion(self, query: str) -> str:
+        """DeepSeek (or OpenAI) chat completion over plain HTTP."""
+        import httpx
+        logger.info("🥥 Aureon: Activando DeepSeek/OpenAI...")
+        use_deepseek = bool(get_pool("deepseek").keys)
+        pool = get_pool("deepseek" if use_deepseek else "openai")
+        if not pool.keys:
+            raise ValueError("No DeepSeek/OpenAI key available")
+
+        base_url = "https://api.deepseek.com/v1/chat/completions" if use_deepseek else "https://api.openai.com/v1/chat/completions"
+        model = "deepseek-chat" if use_deepseek else "gpt-3.5-turbo"
+
+        async with pool.lease(model=model) as api_key:
             async with httpx.AsyncClient() as client:
                 resp = await client.post(
                     base_url,
@@ -214,13 +444,10 @@ class AureonCortex:
                         "model": model,
                         "messages": [{"role": "user", "content": query}]
                     },
-                    timeout=10.0
+                    timeout=timeout_for(10.0, "direct")
                 )
                 resp.raise_for_status()
                 return resp.json()['choices'][0]['message']['content']
-        except Exception as e:
-            logger.error(f"❌ FALLO TOTAL DEL SISTEMA: {e}")
-            return "🔥 Error Crítico: Todos los núcleos de IA están fuera de línea. Por favor contacta a soporte."
 
 
 # Singleton
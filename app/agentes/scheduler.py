@@ -3,8 +3,16 @@ from loguru import logger
 from app.services.mcp_client import mcp_client
 from app.services.notion import notion_service
 from app.services.google_workspace import google_service
+from app.agentes.intent import IntentMatcher
 import asyncio
 
+# Sub-intents of Scheduler.act; on equal scores the first one wins
+SCHEDULER_INTENTS = IntentMatcher({
+    "sync": ["correo*", "email*", "gmail"],
+    "create": ["agendar", "agenda una", "crear", "crea", "nueva reunión", "nueva tarea", "tarea", "anota", "cita"],
+    "list": ["qué tengo", "revisa", "lee", "busca", "muéstrame", "agenda", "calendario", "tareas"],
+})
+
 
 class Scheduler:
     """
@@ -69,10 +77,11 @@ class Scheduler:
         try:
 
             # Analyze intent
-            query_lower = query.lower()
+            intent = SCHEDULER_INTENTS.best(query)
+            intent = intent.intent if intent else None
             
             # intent: SYNC GMAIL TASKS (Generic Trigger)
-            if any(kw in query_lower for kw in ["correo", "email", "gmail"]):
+            if intent == "sync":
                 # If "andrea" is specific, it keeps the logic, but for now let's make it general since it filters by sender internaly
                 results = await self.sync_emails()
                 
@@ -88,7 +97,7 @@ class Scheduler:
                 return response
 
             # intent: CREATE / WRITE
-            elif any(kw in query_lower for kw in ["agendar", "crear", "nueva reunión", "tarea", "anota", "cita"]):
+            elif intent == "create":
                 # Simple logic to find a database (MVP: takes the first one found)
                 dbs = await notion_service.list_databases()
                 if not dbs:
@@ -105,7 +114,7 @@ class Scheduler:
                     return "⚠️ Pude conectar con Notion pero hubo un error creando la página. Verifica los permisos de integración."
             
             # intent: LIST / READ
-            elif any(kw in query_lower for kw in ["qué tengo", "revisa", "lee", "busca", "muéstrame", "agenda", "calendario"]):
+            elif intent == "list":
                 summary = await notion_service.get_tasks_summary()
                 return f"📅 He consultado tu Notion:\n\n{summary}"
 
@@ -6,11 +6,14 @@ import os
 from typing import Dict, Any, Optional, List
 from loguru import logger
 from pydantic_ai import Agent
+from pydantic_ai.models import infer_model
 from app.core.config import get_settings
-from app.utils.hydra import hydra_pool
+from app.utils.hydra import hydra_pool, HydraExhausted
+from app.utils.deadline import DeadlineExceeded, within
 from app.agentes.memoris import Memoris
 from app.agentes.lumina import Lumina
 from app.agentes.scheduler import Scheduler
+from app.services.blueprints import find_blueprints, format_blueprints
 from pydantic_ai import RunContext
 
 settings = get_settings()
@@ -45,77 +48,87 @@ Misión 🚀:
 Herramientas 🛠️:
 - `consultar_memoria`: Úsala SIEMPRE que se mencione un cliente o proyecto pasado.
 - `sync_andrea_emails`: Úsala si preguntan por correos o pendientes de Andrea.
-- `pedir_estrategia`: Úsala si necesitas un plan detallado, blueprint, o análisis complejo (Lumina)."""
+- `pedir_estrategia`: Úsala si necesitas un plan detallado, blueprint, o análisis complejo (Lumina).
+- `buscar_blueprints`: Úsala para saber qué workflows n8n usan ciertos nodos (ej: notion + telegramTrigger)."""
 
     def __init__(self):
         self.agent = None
-        self.current_model = None
+        self.current_model = MODEL_CHAIN[0]
         self.current_key = None
+        self._models: Dict[tuple, Any] = {}
         self.memoris = Memoris()
         self.lumina = Lumina()
         self.scheduler = Scheduler()
         self._init_agent()
     
-    def _init_agent(self, model_index: int = 0):
-        """Initialize with Gemini, with fallback models."""
-        if model_index >= len(MODEL_CHAIN):
-            logger.error("❌ Vox: All models exhausted!")
-            return False
-        
+    def _init_agent(self) -> bool:
+        """Build the agent and register its tools. Key and model are bound per run via Hydra leases."""
         try:
-            key = hydra_pool.get_active_key() or settings.GEMINI_API_KEY
-            if key:
-                # Set both to ensure compatibility across different libraries
-                os.environ["GEMINI_API_KEY"] = key
-                os.environ["GOOGLE_API_KEY"] = key
-                
-                self.current_key = key
-                self.current_model = MODEL_CHAIN[model_index]
-                
-                self.agent = Agent(
-                    model=self.current_model,
-                    system_prompt=self.SYSTEM_PROMPT,
-                    deps_type=Dict[str, Any]
-                )
-                
-                # 🛠️ Register Memoris Tool (RAG)
-                @self.agent.tool
-                async def consultar_memoria(ctx: RunContext[Dict[str, Any]], query: str) -> str:
-                    """Usa esto para buscar contexto, info de clientes, o historial en la base de datos."""
-                    logger.info(f"🧠 Vox -> Memoris: {query}")
-                    return await self.memoris.recall(query, ctx.deps)
-
-                # 🛠️ Register Scheduler Tool (Email/Notion)
-                @self.agent.tool
-                async def sync_andrea_emails(ctx: RunContext[Dict[str, Any]]) -> str:
-                    """
-                    Revisa los correos de Andrea (Gmail) y crea tareas en Notion si hay algo nuevo.
-                    Devuelve un resumen de lo que encontró. Úsalo para responder "¿Revisaste el correo?".
-                    """
-                    logger.info(f"🧠 Vox -> Scheduler (Sync Emails)")
-                    res = await self.scheduler.sync_emails()
-                    if not res['created'] and not res['ignored']:
-                        return "No encontré correos nuevos de Andrea/Elevat en las últimas 48h."
-                    return f"Resumen Sync: Creadas={res['created']}, Ignoradas(Duplicadas)={res['ignored']}."
-
-                # 🛠️ Register Lumina Tool (Strategy)
-                @self.agent.tool
-                async def pedir_estrategia(ctx: RunContext[Dict[str, Any]], solicitud: str) -> str:
-                    """
-                    Pide a Lumina (el estratega) que genere un plan, análisis o 'blueprint'.
-                    Úsalo cuando el usuario pida "flujos", "JSON", "arquitectura", o análisis complejos.
-                    """
-                    logger.info(f"🧠 Vox -> Lumina: {solicitud}")
-                    return await self.lumina.think(solicitud, ctx.deps)
-
-                logger.info(f"🎙️ Vox inicializado con {self.current_model} | Key: {key[:8]}...")
-                return True
-            else:
-                logger.warning("⚠️ No Gemini key available for Vox")
-                return False
+            self.agent = Agent(
+                system_prompt=self.SYSTEM_PROMPT,
+                deps_type=Dict[str, Any]
+            )
+
+            # 🛠️ Register Memoris Tool (RAG)
+            @self.agent.tool
+            async def consultar_memoria(ctx: RunContext[Dict[str, Any]], query: str) -> str:
+                """Usa esto para buscar contexto, info de clientes, o historial en la base de datos."""
+                logger.info(f"🧠 Vox -> Memoris: {query}")
+                return await self.memoris.recall(query, ctx.deps)
+
+            # 🛠️ Register Scheduler Tool (Email/Notion)
+            @self.agent.tool
+            async def sync_andrea_emails(ctx: RunContext[Dict[str, Any]]) -> str:
+                """
+                Revisa los correos de Andrea (Gmail) y crea tareas en Notion si hay algo nuevo.
+                Devuelve un resumen de lo que encontró. Úsalo para responder "¿Revisaste el correo?".
+                """
+                logger.info(f"🧠 Vox -> Scheduler (Sync Emails)")
+                res = await self.scheduler.sync_emails()
+                if not res['created'] and not res['ignored']:
+                    return "No encontré correos nuevos de Andrea/Elevat en las últimas 48h."
+                return f"Resumen Sync: Creadas={res['created']}, Ignoradas(Duplicadas)={res['ignored']}."
+
+            # 🛠️ Register Lumina Tool (Strategy)
+            @self.agent.tool
+            async def pedir_estrategia(ctx: RunContext[Dict[str, Any]], solicitud: str) -> str:
+                """
+                Pide a Lumina (el estratega) que genere un plan, análisis o 'blueprint'.
+                Úsalo cuando el usuario pida "flujos", "JSON", "arquitectura", o análisis complejos.
+                """
+                logger.info(f"🧠 Vox -> Lumina: {solicitud}")
+                return await self.lumina.think(solicitud, ctx.deps)
+
+            # 🛠️ Register Blueprint Index Tool (n8n structure, no embeddings)
+            @self.agent.tool
+            async def buscar_blueprints(ctx: RunContext[Dict[str, Any]], tipos_de_nodo: List[str], en_orden: bool = False) -> str:
+                """
+                Busca workflows n8n por tipo de nodo (ej: ["notion", "telegramTrigger"]).
+                Con en_orden=True exige que los nodos estén conectados en ese orden (ej: webhook → notion).
+                """
+                org_id = (ctx.deps or {}).get("organization_id", self.memoris.DEFAULT_ORG_ID)
+                logger.info(f"🧠 Vox -> Blueprints: {tipos_de_nodo} (orden={en_orden})")
+                results = await find_blueprints(org_id, tipos_de_nodo, ordered=en_orden)
+                return format_blueprints(results, tipos_de_nodo)
+
+            logger.info(f"🎙️ Vox inicializado | Cadena: {', '.join(MODEL_CHAIN)}")
+            return True
         except Exception as e:
-            logger.error(f"❌ Vox init error with {MODEL_CHAIN[model_index]}: {e}")
-            return self._init_agent(model_index + 1)
+            logger.error(f"❌ Vox init error: {e}")
+            self.agent = None
+            return False
+
+    def _model_for(self, key: str, model_name: str):
+        """Model instance bound to a specific Hydra key (cached per key/model pair)."""
+        cache_key = (key, model_name)
+        model = self._models.get(cache_key)
+        if model is None:
+            # google-gla models read the key from env when they are built
+            os.environ["GEMINI_API_KEY"] = key
+            os.environ["GOOGLE_API_KEY"] = key
+            model = infer_model(model_name)
+            self._models[cache_key] = model
+        return model
 
     async def respond(
         self, 
@@ -134,36 +147,36 @@ Herramientas 🛠️:
         if attachments:
             enriched += f"\n[Adjuntos: {len(attachments)}]"
         
-        # Try with current model, fallback if needed
-        for attempt in range(len(MODEL_CHAIN)):
+        # Try models fastest-healthy first (Hydra EWMA ranking); every attempt leases its
+        # own key, which records latency/outcome and enforces the per-key in-flight cap.
+        chain = hydra_pool.rank_models(MODEL_CHAIN)
+        model_idx = 0
+        for attempt in range(len(chain)):
+            model_name = chain[model_idx]
             try:
-                result = await self.agent.run(enriched)
-                logger.info(f"🎙️ Vox respondió ({len(result.data)} chars) via {self.current_model}")
+                async with hydra_pool.lease(fallback_key=settings.GEMINI_API_KEY, model=model_name) as key:
+                    self.current_key = key
+                    # Retries share the request budget instead of multiplying the worst case
+                    result = await within(self.agent.run(enriched, model=self._model_for(key, model_name)), f"vox:{model_name}")
+                self.current_model = model_name
+                logger.info(f"🎙️ Vox respondió ({len(result.data)} chars) via {model_name} | Key: {key[:8]}...")
                 return result.data
-                
+
+            except (HydraExhausted, DeadlineExceeded) as e:
+                logger.error(f"❌ Vox: {e}")
+                break
+
             except Exception as e:
                 error_str = str(e)
                 logger.error(f"❌ Vox error (attempt {attempt + 1}): {e}")
-                
-                # Report failure to Hydra
-                if self.current_key and ("429" in error_str or "RESOURCE_EXHAUSTED" in error_str):
-                    hydra_pool.report_failure(self.current_key, 429)
-                elif self.current_key:
-                    hydra_pool.report_failure(self.current_key, 500)
-                
-                # Try to reinitialize with next key/model
-                model_idx = MODEL_CHAIN.index(self.current_model) if self.current_model in MODEL_CHAIN else 0
-                
+
                 if "429" in error_str or "RESOURCE_EXHAUSTED" in error_str:
-                    # Get new key, same model
-                    if not self._init_agent(model_idx):
-                        # No keys left, try next model
-                        self._init_agent(model_idx + 1)
-                else:
-                    # Other error, try next model
-                    self._init_agent(model_idx + 1)
-                
-                if not self.agent:
+                    # Key already cooled down by the lease; next attempt gets a new key, same model
+                    continue
+
+                # Other error, try next model
+                model_idx += 1
+                if model_idx >= len(chain):
                     break
         
         raise RuntimeError("Vox: All Gemini models in the chain failed.")
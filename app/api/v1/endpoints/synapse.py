@@ -2,9 +2,12 @@ from fastapi import APIRouter, HTTPException, BackgroundTasks
 from pydantic import BaseModel
 from typing import Optional, List, Dict, Any
 from loguru import logger
+from app.core.config import get_settings
 from app.services.agent_pydantic import pydantic_brain, AureonDependencies
+from app.utils.deadline import request_deadline
 
 router = APIRouter()
+settings = get_settings()
 
 class SynapseRequest(BaseModel):
     message: str
@@ -29,18 +32,21 @@ async def process_synapse(request: SynapseRequest):
         organization_id=request.context.get("organizationId") if request.context else None
     )
 
-    # Process through Brain service
-    answer = await pydantic_brain.process_query(
-        request.message,
-        dependencies=deps,
-        attachments=None # Synapse currently text only via this endpoint
-    )
+    # Process through Brain service, bounded by the per-request budget
+    with request_deadline(settings.REQUEST_DEADLINE) as deadline:
+        answer = await pydantic_brain.process_query(
+            request.message,
+            dependencies=deps,
+            attachments=None # Synapse currently text only via this endpoint
+        )
     
     thought_trace = [
         "Estímulo recibido y decodificado",
         "Procesamiento Agnóstico (Gemini/Mistral/Groq) completado",
         "Respuesta sintetizada para el aliado comercial"
     ]
+    if deadline.skipped:
+        thought_trace.append(f"Etapas omitidas por tiempo: {', '.join(deadline.skipped)}")
     
     return SynapseResponse(
         answer=answer,
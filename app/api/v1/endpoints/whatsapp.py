@@ -2,6 +2,7 @@ from fastapi import APIRouter, Request, HTTPException, Depends
 from loguru import logger
 from app.core.config import get_settings
 from app.services.agent_pydantic import pydantic_brain, AureonDependencies
+from app.utils.deadline import request_deadline
 
 router = APIRouter()
 settings = get_settings()
@@ -53,12 +54,15 @@ async def receive_message(request: Request):
                 context_data={"source": "whatsapp", "user_id": sender_id}
             )
             
-            answer = await pydantic_brain.process_query(
-                text=msg_body,
-                dependencies=deps
-            )
+            with request_deadline(settings.REQUEST_DEADLINE) as deadline:
+                answer = await pydantic_brain.process_query(
+                    text=msg_body,
+                    dependencies=deps
+                )
             
             logger.info(f"BRAIN_RESPONSE: {answer[:100]}...")
+            if deadline.skipped:
+                logger.warning(f"⏱️ WhatsApp {sender_id}: etapas omitidas por deadline: {', '.join(deadline.skipped)}")
             
             # TODO: Implement WhatsAppSenderService to actually reply.
 
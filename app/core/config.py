@@ -17,6 +17,11 @@ class Settings(BaseSettings):
     OPENAI_API_KEY: str | None = None
     MISTRAL_API_KEY: str | None = None
     GROQ_API_KEY: str | None = None
+    # Extra keys per provider (JSON lists) pooled by Hydra alongside the *_API_KEY above
+    MISTRAL_KEY_POOL: str = "[]"
+    GROQ_KEY_POOL: str = "[]"
+    OPENAI_KEY_POOL: str = "[]"
+    DEEPSEEK_KEY_POOL: str = "[]"
     TELEGRAM_BOT_TOKEN: str | None = None
     ALLOWED_TELEGRAM_IDS: list[int] = [851917065] # Mou (CTO). Add others here.
     ALLOWED_PHONE_NUMBERS: list[str] = ["+573204770682", "+17867251511"] # Christian, Andrea
@@ -60,6 +65,50 @@ class Settings(BaseSettings):
     CONTEXT7_API_KEY: str | None = None
     GITHUB_TOKEN: str | None = None
 
+    # Local caches (embeddings, shared key state). Mount as a volume to survive redeploys.
+    CACHE_DIR: str = "/tmp/aureon"
+    EMBEDDING_CACHE_SIZE: int = 5000  # in-memory LRU entries
+    EMBEDDING_DISK_CACHE_SIZE: int = 200000  # SQLite rows (~3 KB each at 768 dims); oldest are dropped
+    # output_dimensionality for text-embedding-004 (None = 768). Must match the
+    # document_chunks.embedding column: changing it means re-ingesting the corpus.
+    EMBEDDING_DIMENSIONS: int | None = None
+
+    # In-process mirror of document_chunks per org (needs numpy). Reloaded after TTL seconds.
+    LOCAL_INDEX_ENABLED: bool = False
+    LOCAL_INDEX_TTL: int = 600
+    LOCAL_INDEX_QUANTIZE: bool = False  # int8 + per-vector scale: ~4x less RAM, ~1.3x slower scan
+    # Seconds a RAG search result is reused for the same (org, query, limit). 0 disables.
+    SEARCH_CACHE_TTL: float = 30.0
+    # Fuse vector results with a local BM25 keyword index (exact names, node types, file names)
+    HYBRID_SEARCH: bool = False
+    # Route keyword-less queries by embedding similarity to per-agent example centroids (needs numpy)
+    SEMANTIC_ROUTING: bool = True
+    SEMANTIC_ROUTING_THRESHOLD: float = 0.72
+    SEMANTIC_ROUTING_MARGIN: float = 0.04
+    # LLM fallback chains: start the next provider in parallel once the current one
+    # is slower than this percentile of its recent latencies (default delay until warmed up)
+    HEDGE_ENABLED: bool = True
+    HEDGE_PERCENTILE: float = 95.0
+    HEDGE_DEFAULT_DELAY: float = 8.0
+    # Per-provider circuit breakers: open when this share of the last BREAKER_WINDOW calls
+    # (at least BREAKER_MIN_CALLS) failed; after BREAKER_OPEN_SECONDS one probe is let through
+    BREAKER_FAILURE_RATE: float = 0.5
+    BREAKER_MIN_CALLS: int = 5
+    BREAKER_WINDOW: int = 20
+    BREAKER_OPEN_SECONDS: float = 30.0
+    # Time budget per incoming message (Telegram, /synapse/process, WhatsApp); every
+    # LLM run, HTTP call and tool call gets at most what is left of it
+    REQUEST_DEADLINE: float = 45.0
+    # Reuse answers to near-duplicate questions (same org/user/agent, cosine ≥ similarity).
+    # Per-intent TTLs live in app/services/response_cache.py; scheduler/Nux/live queries bypass it.
+    RESPONSE_CACHE_ENABLED: bool = True
+    RESPONSE_CACHE_SIMILARITY: float = 0.93
+    # Groq Whisper: transcripts cached per audio hash (LRU entries); notes longer than
+    # CHUNK_SECONDS are cut at silences and the pieces transcribed in parallel (needs pydub + ffmpeg)
+    TRANSCRIPTION_CACHE_SIZE: int = 500
+    TRANSCRIPTION_CHUNK_SECONDS: float = 60.0
+    TRANSCRIPTION_MAX_PARALLEL: int = 4
+
     # Webhook Domain (Cloudflare/VPS IP)
     DOMAIN: str | None = None
     
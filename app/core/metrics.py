@@ -0,0 +1,50 @@
+"""
+Aureon Metrics - Prometheus collectors shared across services.
+Exposed on /metrics by the Instrumentator configured in app.main.
+"""
+from prometheus_client import Counter, Gauge
+
+# Embeddings
+EMBEDDING_CACHE_LOOKUPS = Counter(
+    "aureon_embedding_cache_lookups_total",
+    "Embedding cache lookups by result (memory_hit, disk_hit, miss).",
+    ["result"],
+)
+
+# Hedged LLM requests (app/utils/hedging.py): event = fired | won
+HEDGED_REQUESTS = Counter(
+    "aureon_hedged_requests_total",
+    "Hedged requests launched after the latency percentile (fired) and those that answered first (won).",
+    ["scope", "event"],
+)
+
+# Per-provider circuit breakers (app/utils/circuit_breaker.py)
+CIRCUIT_BREAKER_STATE = Gauge(
+    "aureon_circuit_breaker_state",
+    "Circuit breaker state per provider (0 = closed, 1 = half-open, 2 = open).",
+    ["provider"],
+)
+CIRCUIT_BREAKER_TRANSITIONS = Counter(
+    "aureon_circuit_breaker_transitions_total",
+    "Circuit breaker state changes per provider, by new state.",
+    ["provider", "state"],
+)
+
+# Semantic response cache (app/services/response_cache.py)
+RESPONSE_CACHE_LOOKUPS = Counter(
+    "aureon_response_cache_lookups_total",
+    "Response cache lookups by result (exact_hit, semantic_hit, miss, bypass).",
+    ["cache", "result"],
+)
+RESPONSE_CACHE_HIT_RATIO = Gauge(
+    "aureon_response_cache_hit_ratio",
+    "Hits / (hits + misses) since start, bypassed queries excluded.",
+    ["cache"],
+)
+
+# Groq Whisper transcriptions (app/services/transcription.py)
+TRANSCRIPTIONS = Counter(
+    "aureon_transcriptions_total",
+    "Voice note transcriptions by result (hit, transcribed, failed).",
+    ["result"],
+)
@@ -60,6 +60,18 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         logger.error(f"Error cleaning up MCP: {e}")
 
+    try:
+        from app.services.vector_search import vector_search_service
+        await vector_search_service.close()
+    except Exception as e:
+        logger.error(f"Error closing vector search connections: {e}")
+
+    try:
+        from app.services.transcription import transcription_service
+        await transcription_service.close()
+    except Exception as e:
+        logger.error(f"Error closing transcription connections: {e}")
+
     if app.state.telegram_bot_app:
         await stop_telegram_bot(app.state.telegram_bot_app)
 
@@ -183,7 +195,11 @@ async def health_check():
     """
     Health check for VPS monitoring and Docker.
     """
-    return {"status": "ok", "service": "cortex"}
+    from app.utils.circuit_breaker import breaker_states
+    circuits = breaker_states()
+    # HTTP 200 either way: one provider down is survivable, the fallback chains skip it
+    degraded = [name for name, c in circuits.items() if c["state"] != "closed"]
+    return {"status": "degraded" if degraded else "ok", "service": "cortex", "circuits": circuits}
 
 # Include Routers
 from app.api.v1.api import api_router
@@ -1,11 +1,15 @@
 import os
+import asyncio
 from datetime import datetime
 from typing import Dict, Any, List, Optional
 from pydantic import BaseModel, Field
 from pydantic_ai import Agent, RunContext
 from pydantic_ai.models.gemini import GeminiModel
 from app.core.config import get_settings
-from app.utils.hydra import hydra_pool
+from app.utils.hydra import hydra_pool, get_pool, HydraExhausted
+from app.utils.hedging import LatencyTracker, claim_side_effects, hedged
+from app.utils.circuit_breaker import get_breaker
+from app.utils.deadline import DeadlineExceeded, current_deadline, within
 from supabase import create_client, Client
 from loguru import logger
 import json
@@ -14,6 +18,9 @@ from app.core.identity import aureon_identity
 from app.core.schemas import ThinkingPlan, StrategicPlanStep, MemoryDomain, StrategicMemory
 from app.services.mcp_client import mcp_client
 from app.services.vector_search import vector_search_service
+from app.services.response_cache import SemanticResponseCache, response_scope, ttl_for
+from app.services.transcription import transcription_service
+from app.services.blueprints import find_blueprints, format_blueprints
 from app.services.notion import notion_service
 from app.services.infrastructure import infrastructure_service
 from app.services.n8n import n8n_service
@@ -33,6 +40,15 @@ try:
 except ImportError:
     OpenAIModel = None
 
+GEMINI_MODEL = "gemini-2.0-flash-exp"
+PROVIDER_MODELS = {
+    "gemini": GEMINI_MODEL,
+    "mistral": "mistral-large-latest",
+    "groq": "llama-3.3-70b-versatile",
+    "openai": "gpt-4o",
+    "deepseek": "deepseek-chat",
+}
+
 def get_model(provider: str = "gemini", explicit_key: Optional[str] = None):
     """
     Factory for creating models based on provider.
@@ -43,46 +59,46 @@ def get_model(provider: str = "gemini", explicit_key: Optional[str] = None):
         if key: os.environ["GEMINI_API_KEY"] = key
         # Use simple string if specific class import fails or just standard usage
         try:
-             return GeminiModel(model_name="gemini-2.0-flash-exp")
+             return GeminiModel(model_name=GEMINI_MODEL)
         except Exception as e:
              logger.error(f"❌ GeminiModel initialization error: {e}")
              # Return string-based model name as fallback if the class is tricky
-             return "google:gemini-2.0-flash-exp"
+             return f"google:{GEMINI_MODEL}"
 
     # 2. Mistral (High IQ)
     elif provider == "mistral":
         # Use OpenAI Compatible endpoint for safety if MistralModel is tricky
         if OpenAIModel:
             return OpenAIModel(
-                model_name="mistral-large-latest", 
+                model_name=PROVIDER_MODELS["mistral"], 
                 base_url="https://api.mistral.ai/v1",
-                api_key=settings.MISTRAL_API_KEY
+                api_key=explicit_key or get_pool("mistral").get_active_key()
             )
     
     # 3. Groq (Speed)
     elif provider == "groq":
         if OpenAIModel:
             return OpenAIModel(
-                model_name="llama-3.3-70b-versatile",
+                model_name=PROVIDER_MODELS["groq"],
                 base_url="https://api.groq.com/openai/v1",
-                api_key=settings.GROQ_API_KEY
+                api_key=explicit_key or get_pool("groq").get_active_key()
             )
         
     # 4. OpenAI (Reliability)
     elif provider == "openai":
          if OpenAIModel:
              return OpenAIModel(
-                model_name="gpt-4o",
-                api_key=settings.OPENAI_API_KEY
+                model_name=PROVIDER_MODELS["openai"],
+                api_key=explicit_key or get_pool("openai").get_active_key()
             )
         
     # 5. DeepSeek (Cost/Reasoning)
     elif provider == "deepseek":
         if OpenAIModel:
             return OpenAIModel(
-                model_name="deepseek-chat",
+                model_name=PROVIDER_MODELS["deepseek"],
                 base_url="https://api.deepseek.com",
-                api_key=settings.DEEPSEEK_API_KEY
+                api_key=explicit_key or get_pool("deepseek").get_active_key()
             )
 
     raise ValueError(f"Provider {provider} not supported or dependencies missing.")
@@ -112,7 +128,12 @@ async def execute_mcp_tool(ctx: RunContext[AureonDependencies], server_name: str
         arguments: Dictionary of arguments required by the tool.
     """
     logger.info(f"🔌 MCP Call: {server_name}/{tool_name} with {arguments}")
-    result = await mcp_client.call_tool(server_name, tool_name, arguments)
+    # MCP tools may write: a hedged brain run stops racing before calling one
+    claim_side_effects(f"mcp:{server_name}/{tool_name}")
+    try:
+        result = await within(mcp_client.call_tool(server_name, tool_name, arguments), f"mcp:{server_name}/{tool_name}")
+    except DeadlineExceeded:
+        return f"⏱️ Sin tiempo para ejecutar {server_name}/{tool_name} en esta solicitud."
     return json.dumps(result, indent=2)
 
 
@@ -124,7 +145,10 @@ async def search_knowledge_base(ctx: RunContext[AureonDependencies], query: str)
     """
     org_id = ctx.deps.organization_id or "392ecec2-e769-4db2-810f-ccd5bd09d92a" # Default org
     logger.info(f"🔎 RAG Search: {query} for org {org_id}")
-    results = await vector_search_service.search(query, org_id)
+    try:
+        results = await within(vector_search_service.search(query, org_id), "rag_search")
+    except DeadlineExceeded:
+        return "⏱️ Sin tiempo para consultar la base de conocimiento en esta solicitud."
     if not results:
         return "No se encontró información relevante en la base de conocimiento."
     
@@ -134,6 +158,19 @@ async def search_knowledge_base(ctx: RunContext[AureonDependencies], query: str)
     return formatted
 
 
+@aureon_agent.tool
+async def search_blueprints(ctx: RunContext[AureonDependencies], node_types: List[str], ordered: bool = False) -> str:
+    """
+    Finds n8n workflows (blueprints) by node type, e.g. ["notion", "telegramTrigger"].
+    With ordered=True the nodes must be connected in that order (e.g. ["webhook", "notion"]).
+    Use this instead of the knowledge base for questions about which workflows use which nodes.
+    """
+    org_id = ctx.deps.organization_id or "392ecec2-e769-4db2-810f-ccd5bd09d92a" # Default org
+    logger.info(f"🧩 Blueprint Search: {node_types} (ordered={ordered}) for org {org_id}")
+    results = await find_blueprints(org_id, node_types, ordered=ordered)
+    return format_blueprints(results, node_types)
+
+
 @aureon_agent.tool
 async def manage_notion(ctx: RunContext[AureonDependencies], action: str, title: str, content: Optional[str] = None) -> str:
     """
@@ -141,6 +178,7 @@ async def manage_notion(ctx: RunContext[AureonDependencies], action: str, title:
     Actions: 'create_task', 'search', 'list_databases'.
     """
     if action == "create_task":
+        claim_side_effects("notion:create_task")
         dbs = await notion_service.list_databases()
         if not dbs: return "Error: No se encontraron bases de datos en Notion."
         # Use first DB for now
@@ -164,6 +202,7 @@ async def execute_automation(ctx: RunContext[AureonDependencies], flow_name: str
     Use this for: 'send_whatsapp', 'send_email', 'process_lead', 'generate_report'.
     """
     logger.info(f"🤖 Triggering Flow: {flow_name}")
+    claim_side_effects(f"n8n:{flow_name}")
     res = await n8n_service.trigger_webhook(flow_name, payload)
     return json.dumps(res, indent=2)
 
@@ -190,29 +229,6 @@ async def manage_google_workspace(ctx: RunContext[AureonDependencies], service:
     return "Servicio o acción no soportada."
 
 
-async def transcribe_audio_groq(audio_data: bytes) -> str:
-    """Transcribes audio using Groq Whisper-large-v3."""
-    import httpx
-    import io
-    
-    url = "https://api.groq.com/openai/v1/audio/transcriptions"
-    headers = {"Authorization": f"Bearer {settings.GROQ_API_KEY}"}
-    
-    # Prepare multipart form data
-    # Guessing format as .ogg or .mp3 from Telegram usually, but Whisper handles most.
-    # We'll label it 'voice.ogg' safely.
-    files = {'file': ('voice.ogg', audio_data, 'audio/ogg')}
-    data = {'model': 'whisper-large-v3'}
-    
-    async with httpx.AsyncClient() as client:
-        try:
-            resp = await client.post(url, headers=headers, files=files, data=data, timeout=10.0)
-            resp.raise_for_status()
-            return resp.json().get("text", "")
-        except Exception as e:
-            logger.error(f"🔇 Whisper Transcription Failed: {e}")
-            return ""
-
 class PydanticBrainService:
     FALLBACK_CHAIN = ["gemini", "mistral", "groq", "openai", "deepseek"]
     
@@ -222,15 +238,50 @@ class PydanticBrainService:
         "Inténtalo de nuevo en unos segundos, y estaré listo para guiarte. ✨"
     )
 
+    DEADLINE_MESSAGE = (
+        "⏱️ Esta consulta necesitó más tiempo del que tengo por mensaje. "
+        "¿Puedes dividirla en partes más pequeñas?"
+    )
+
     def __init__(self):
         self.agent = aureon_agent
+        self.latency = LatencyTracker(settings.HEDGE_PERCENTILE, settings.HEDGE_DEFAULT_DELAY)
+        self.response_cache: Optional[SemanticResponseCache] = None
+        if settings.RESPONSE_CACHE_ENABLED:
+            self.response_cache = SemanticResponseCache(
+                "brain",
+                embed=lambda texts: vector_search_service.embed_many(texts, "SEMANTIC_SIMILARITY"),
+                similarity=settings.RESPONSE_CACHE_SIMILARITY,
+            )
 
     async def process_query(self, text: str, dependencies: AureonDependencies, attachments: List[Dict[str, Any]] = None) -> str:
+        # Near-duplicate questions are answered from the response cache (text only)
+        cache = self.response_cache
+        ttl = ttl_for("brain", text) if cache is not None and text and not attachments else 0.0
+        scope = response_scope(dependencies.organization_id, dependencies.context_data.get("user_id"), "brain")
+        if cache is not None:
+            if ttl > 0:
+                cached = await cache.get(text, scope)
+                if cached is not None:
+                    return cached
+            else:
+                cache.bypass()
+
+        deadline = current_deadline()
+        skipped = len(deadline.skipped) if deadline else 0
+        answer = await self._process_query(text, dependencies, attachments)
+        if ttl > 0 and answer not in (self.FALLBACK_MESSAGE, self.DEADLINE_MESSAGE) \
+                and not (deadline and len(deadline.skipped) > skipped):
+            await cache.put(text, scope, answer, ttl)
+        return answer
+
+    async def _process_query(self, text: str, dependencies: AureonDependencies, attachments: List[Dict[str, Any]] = None) -> str:
         last_error = None
         
         # Build message parts for multimodal (Gemini)
         gemini_parts = [text] if text else []
         audio_content = None # Store audio execution for fallback
+        audio_mime = "audio/ogg"
         
         if attachments:
             from pydantic_ai.messages import BinaryContentPart
@@ -242,83 +293,92 @@ class PydanticBrainService:
                 # Detect audio for fallback transcription
                 if att["mime_type"].startswith("audio/") or att["mime_type"] == "application/ogg":
                     audio_content = att["data"]
+                    audio_mime = att["mime_type"]
         
-        # Fallback Loop
-        for provider in self.FALLBACK_CHAIN:
-            try:
-                # Check for keys presence
-                if provider == "gemini" and not (hydra_pool.get_active_key() or settings.GEMINI_API_KEY):
-                    logger.warning("⏭️ Skipping GEMINI: No API Key available.")
-                    continue
-                if provider == "mistral" and not settings.MISTRAL_API_KEY:
-                    logger.warning("⏭️ Skipping MISTRAL: No API Key available.")
-                    continue
-                if provider == "groq" and not settings.GROQ_API_KEY:
-                    logger.warning("⏭️ Skipping GROQ: No API Key available.")
-                    continue
-                if provider == "openai" and not settings.OPENAI_API_KEY:
-                    logger.warning("⏭️ Skipping OPENAI: No API Key available.")
-                    continue
-                if provider == "deepseek" and not settings.DEEPSEEK_API_KEY:
-                    logger.warning("⏭️ Skipping DEEPSEEK: No API Key available.")
-                    continue
-                
-                logger.info(f"🧠 [AUREON] Thinking with Provider: {provider.upper()}...")
-                
-                # Special handling for Gemini Pool
-                if provider == "gemini":
-                    success = False
-                    for attempt in range(3):
-                        key = hydra_pool.get_active_key()
-                        if not key: break 
-                        try:
-                            self.agent.model = get_model("gemini", explicit_key=key)
-                            # Gemini handles multimodal natively
-                            if attachments:
-                                result = await self.agent.run(gemini_parts, deps=dependencies)
-                            else:
-                                result = await self.agent.run(text, deps=dependencies)
-                            return result.data
-                        except Exception as e:
-                            logger.warning(f"⚠️ Gemini Attempt {attempt+1} failed: {e}")
-                            hydra_pool.report_failure(key)
-                            last_error = e
-                    # If we exit loop without returning, Gemini failed completely.
-                    logger.warning("❌ All Gemini keys exhausted or failed. Switching to Fallback...")
-                    continue 
-
-                # Non-Gemini Providers (Text Only usually, via OpenAI interface)
+        transcript: Optional[asyncio.Task] = None
+
+        async def fallback_prompt() -> str:
+            """Text-only prompt for non-Gemini providers (audio transcribed once, shared by hedges)."""
+            nonlocal transcript
+            final_prompt = text
+
+            # Audio Fallback: Transcribe if we have audio and provider isn't Gemini
+            # Note: GPT-4o input audio via API is specific, here we use text interface for broad compatibility
+            if audio_content:
+                if transcript is None:
+                    logger.info("🎙️ Transcribing audio for fallback provider...")
+                    transcript = asyncio.ensure_future(transcription_service.transcribe(audio_content, audio_mime))
+                transcription = await asyncio.shield(transcript)
+                if transcription:
+                    logger.info(f"📝 Transcription: {transcription}")
+                    final_prompt = f"{text or ''}\n[Audio Transcription]: {transcription}".strip()
                 else:
-                    self.agent.model = get_model(provider)
-                    
-                    final_prompt = text
-                    
-                    # Audio Fallback: Transcribe if we have audio and provider isn't Gemini
-                    # Note: GPT-4o input audio via API is specific, here we use text interface for broad compatibility
-                    if audio_content:
-                        logger.info("🎙️ Transcribing audio for fallback provider...")
-                        transcription = await transcribe_audio_groq(audio_content)
-                        if transcription:
-                            logger.info(f"📝 Transcription: {transcription}")
-                            final_prompt = f"{text or ''}\n[Audio Transcription]: {transcription}".strip()
-                        else:
-                            logger.warning("⚠️ Transcription failed or empty. Proceeding with text only.")
-                    
-                    # Image Fallback: Warn if images are present (not supported in text fallback/standard interface yet)
-                    if attachments and not audio_content: # Assume image if not audio
-                        final_prompt = f"[SYSTEM: User sent an image/file but Gemini failed. Process this context based on text only.] {final_prompt}"
-
-                    # Execute
-                    result = await self.agent.run(final_prompt, deps=dependencies)
+                    logger.warning("⚠️ Transcription failed or empty. Proceeding with text only.")
+
+            # Image Fallback: Warn if images are present (not supported in text fallback/standard interface yet)
+            if attachments and not audio_content: # Assume image if not audio
+                final_prompt = f"[SYSTEM: User sent an image/file but Gemini failed. Process this context based on text only.] {final_prompt}"
+            return final_prompt
+
+        async def run_gemini():
+            pool = get_pool("gemini")
+            last_error = None
+            for attempt in range(3):
+                try:
+                    async with pool.lease(fallback_key=settings.GEMINI_API_KEY, model=GEMINI_MODEL) as key:
+                        model = get_model("gemini", explicit_key=key)
+                        # Gemini handles multimodal natively
+                        prompt = gemini_parts if attachments else text
+                        result = await within(self.agent.run(prompt, deps=dependencies, model=model), "gemini")
                     return result.data
+                except DeadlineExceeded:
+                    raise
+                except HydraExhausted as e:
+                    logger.warning(f"⚠️ {e}")
+                    last_error = e
+                    break
+                except Exception as e:
+                    # The lease already reported the failure class to Hydra
+                    logger.warning(f"⚠️ Gemini Attempt {attempt+1} failed: {e}")
+                    last_error = e
+            logger.warning("❌ All Gemini keys exhausted or failed. Switching to Fallback...")
+            raise last_error or RuntimeError("Gemini failed")
 
-            except Exception as e:
-                import traceback
-                error_trace = traceback.format_exc()
-                logger.error(f"❌ Provider {provider.upper()} failed: {e}\n{error_trace}")
-                last_error = e
-                continue # Try next
-        
+        def run_provider(provider: str):
+            # Non-Gemini Providers (Text Only usually, via OpenAI interface)
+            async def run():
+                final_prompt = await fallback_prompt()
+                # Execute with a key leased from the provider's pool
+                async with get_pool(provider).lease(model=PROVIDER_MODELS[provider]) as key:
+                    result = await within(self.agent.run(final_prompt, deps=dependencies, model=get_model(provider, explicit_key=key)), provider)
+                return result.data
+            return run
+
+        # Fallback chain (providers with keys), hedged: a slow provider is raced by the next one
+        attempts = []
+        for provider in self.FALLBACK_CHAIN:
+            if not get_pool(provider).keys:
+                logger.warning(f"⏭️ Skipping {provider.upper()}: No API Key available.")
+                continue
+            if get_breaker(provider).is_open():
+                logger.warning(f"⏭️ Skipping {provider.upper()}: circuit open.")
+                continue
+            attempts.append((provider, run_gemini if provider == "gemini" else run_provider(provider)))
+
+        try:
+            if attempts:
+                logger.info(f"🧠 [AUREON] Thinking with Providers: {' → '.join(p.upper() for p, _ in attempts)}...")
+                return await hedged(attempts, self.latency, scope="brain", enabled=settings.HEDGE_ENABLED)
+        except Exception as e:
+            last_error = e
+        finally:
+            if transcript is not None and not transcript.done():
+                transcript.cancel()
+
+        deadline = current_deadline()
+        if deadline is not None and deadline.expired():
+            logger.error(f"⏱️ Request deadline reached. Skipped: {deadline.skipped}")
+            return self.DEADLINE_MESSAGE
         logger.critical(f"💀 TOTAL SYSTEM FAILURE. All providers failed. Last error: {last_error}")
         return self.FALLBACK_MESSAGE
 
@@ -0,0 +1,298 @@
+"""
+n8n Blueprints - parsing of exported workflows for the knowledge base.
+
+`summarize_blueprint` is a plain top-level function over raw bytes so it can
+run in a ProcessPoolExecutor (JSON parsing of big exports is CPU-bound).
+
+`BlueprintIndex` is the structural side: node-type inverted lists and the
+connection graph of every workflow, persisted in SQLite and queried from
+memory ("which workflows use Notion and a Telegram trigger", "does any
+workflow go webhook → notion") without touching the embedding model.
+The structure also travels in document_chunks metadata, so a process that
+did not run the ingestion (the deployed API) rebuilds its local index from
+Supabase the first time an org is queried (`find_blueprints`).
+"""
+import os
+import json
+import asyncio
+import sqlite3
+import threading
+from collections import deque
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+from loguru import logger
+from app.utils.singleflight import SingleFlight
+
+NODE_PREFIX = "n8n-nodes-base."
+MAX_LISTED_NODES = 20  # raw JSON is too token-expensive: embed a structural summary
+
+
+def summarize_blueprint(file_name: str, raw: bytes) -> Optional[Dict[str, Any]]:
+    """Document ({"content", "metadata"}) for one workflow JSON, or None if it isn't an n8n workflow."""
+    try:
+        data = json.loads(raw)
+    except (ValueError, UnicodeDecodeError):
+        return None
+    if not isinstance(data, dict):
+        return None
+
+    nodes = data.get("nodes") or []
+    connections = data.get("connections") or {}
+    if not nodes:
+        return None
+
+    # Exports repeat names across folders: the member path is the id, the basename is for display
+    path = "/".join(part for part in file_name.replace("\\", "/").split("/") if part not in ("", "."))
+    file_name = os.path.basename(path)
+    node_types = [n.get("type", "unknown").replace(NODE_PREFIX, "") for n in nodes]
+
+    summary = f"Workflow n8n: {file_name}\n"
+    summary += f"Nodos: {', '.join(sorted(set(node_types)))}\n"
+    summary += f"Estructura: {len(nodes)} nodos, {len(connections)} conexiones.\n"
+
+    structure = workflow_structure(data)
+    content = f"BLUEPRINT: {file_name}\nTYPE: n8n_workflow\n\nLOGIC:\n{summary}\n\nNODES:\n"
+    for n in nodes[:MAX_LISTED_NODES]:
+        content += f"- {n.get('name')} ({n.get('type')})\n"
+
+    return {
+        "content": content,
+        "metadata": {
+            "file_name": file_name,
+            "source": path,
+            "type": "n8n_blueprint",
+            "node_count": len(nodes),
+            "raw_json_snippet": raw[:500].decode("utf-8", errors="ignore"),  # snippet para referencia
+            "structure": structure,  # rebuilds BlueprintIndex where the ingestion didn't run
+        },
+        "structure": structure,
+    }
+
+
+def normalize_type(node_type: str) -> str:
+    """'n8n-nodes-base.telegramTrigger' / '@n8n/n8n-nodes-langchain.agent' → 'telegramtrigger' / 'agent'."""
+    return node_type.rsplit(".", 1)[-1].casefold()
+
+
+def workflow_structure(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Nodes as [name, type] and connections as [source, target] node-name pairs."""
+    nodes = [[n.get("name", ""), n.get("type", "unknown")] for n in data.get("nodes") or []]
+    edges = []
+    for source, outputs in (data.get("connections") or {}).items():
+        if not isinstance(outputs, dict):
+            continue
+        for branches in outputs.values():  # "main", "ai_tool", ...
+            for branch in branches or []:
+                for link in branch or []:
+                    if isinstance(link, dict) and link.get("node"):
+                        edges.append([source, link["node"]])
+    return {"name": data.get("name", ""), "nodes": nodes, "edges": edges}
+
+
+class _Workflow:
+    __slots__ = ("file_name", "name", "types", "node_types", "adjacency")
+
+    def __init__(self, file_name: str, name: str, nodes: List[List[str]], edges: List[List[str]]):
+        self.file_name = file_name
+        self.name = name
+        self.node_types: Dict[str, str] = {n: normalize_type(t) for n, t in nodes}
+        self.types: Set[str] = set(self.node_types.values())
+        self.adjacency: Dict[str, List[str]] = {}
+        for source, target in edges:
+            self.adjacency.setdefault(source, []).append(target)
+
+    def nodes_of(self, node_type: Set[str]) -> Set[str]:
+        return {n for n, t in self.node_types.items() if t in node_type}
+
+    def reachable(self, start: Set[str]) -> Set[str]:
+        """Nodes reachable from `start` through one or more connections."""
+        seen: Set[str] = set()
+        queue = deque(start)
+        while queue:
+            for nxt in self.adjacency.get(queue.popleft(), ()):
+                if nxt not in seen:
+                    seen.add(nxt)
+                    queue.append(nxt)
+        return seen
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "file_name": self.file_name,
+            "name": self.name,
+            "node_count": len(self.node_types),
+            "node_types": sorted(self.types),
+        }
+
+
+class BlueprintIndex:
+    """
+    Structural index of n8n workflows per organization.
+    SQLite is the source of truth (written by ingestion, possibly from another
+    process); queries run on in-memory inverted lists that are rebuilt when the
+    file changes (PRAGMA data_version).
+    """
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=5.0, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS blueprints ("
+            " organization_id TEXT NOT NULL,"
+            " file_name TEXT NOT NULL,"
+            " name TEXT,"
+            " structure TEXT NOT NULL,"
+            " PRIMARY KEY (organization_id, file_name))"
+        )
+        self._conn.commit()
+        self._data_version: Optional[int] = None
+        self._dirty = True
+        # org -> workflows / normalized node type -> workflow ids
+        self._workflows: Dict[str, Dict[str, _Workflow]] = {}
+        self._by_type: Dict[str, Dict[str, Set[str]]] = {}
+
+    def add_many(self, organization_id: str, items: Iterable[Tuple[str, Dict[str, Any]]]):
+        """Upsert (path, structure) pairs in one transaction; `path` is the member path in the export (metadata.source)."""
+        rows = [
+            (organization_id, file_name, structure.get("name", ""), json.dumps(structure))
+            for file_name, structure in items
+        ]
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO blueprints (organization_id, file_name, name, structure) VALUES (?, ?, ?, ?)",
+                rows,
+            )
+            self._dirty = True
+
+    def _refresh(self):
+        version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        if not self._dirty and version == self._data_version:
+            return
+        workflows: Dict[str, Dict[str, _Workflow]] = {}
+        by_type: Dict[str, Dict[str, Set[str]]] = {}
+        for org, file_name, name, structure in self._conn.execute(
+            "SELECT organization_id, file_name, name, structure FROM blueprints"
+        ):
+            s = json.loads(structure)
+            wf = _Workflow(file_name, name or "", s.get("nodes", []), s.get("edges", []))
+            workflows.setdefault(org, {})[file_name] = wf
+            for t in wf.types:
+                by_type.setdefault(org, {}).setdefault(t, set()).add(file_name)
+        self._workflows, self._by_type = workflows, by_type
+        self._data_version, self._dirty = version, False
+        logger.info(f"🧩 Blueprint index: {sum(len(w) for w in workflows.values())} workflows cargados")
+
+    def _resolve(self, organization_id: str, node_type: str) -> Set[str]:
+        """Indexed types matching a query term: exact normalized type, else substring ('telegram' → telegram, telegramtrigger)."""
+        term = normalize_type(node_type.replace(" ", ""))
+        vocabulary = self._by_type.get(organization_id, {})
+        if term in vocabulary:
+            return {term}
+        return {t for t in vocabulary if term in t}
+
+    def find(
+        self,
+        organization_id: str,
+        node_types: List[str],
+        ordered: bool = False,
+        limit: int = 20,
+    ) -> List[Dict[str, Any]]:
+        """
+        Workflows containing every node type in `node_types`.
+        ordered=True additionally requires a connection path visiting them in that order.
+        """
+        with self._lock:
+            self._refresh()
+            workflows = self._workflows.get(organization_id, {})
+            if not node_types:
+                return []
+            resolved = [self._resolve(organization_id, t) for t in node_types]
+            postings = []
+            for types in resolved:
+                ids: Set[str] = set()
+                for t in types:
+                    ids |= self._by_type[organization_id][t]
+                postings.append(ids)
+            postings.sort(key=len)
+            candidates = set.intersection(*postings) if postings else set()
+
+            results = []
+            for file_name in sorted(candidates):
+                wf = workflows[file_name]
+                if ordered and not self._has_path(wf, resolved):
+                    continue
+                results.append(wf.as_dict())
+                if len(results) >= limit:
+                    break
+            return results
+
+    @staticmethod
+    def _has_path(wf: _Workflow, resolved: List[Set[str]]) -> bool:
+        frontier = wf.nodes_of(resolved[0])
+        for types in resolved[1:]:
+            frontier = wf.reachable(frontier) & wf.nodes_of(types)
+            if not frontier:
+                return False
+        return True
+
+    def stats(self, organization_id: str) -> Dict[str, Any]:
+        with self._lock:
+            self._refresh()
+            return {
+                "workflows": len(self._workflows.get(organization_id, {})),
+                "node_types": len(self._by_type.get(organization_id, {})),
+            }
+
+
+_index: Optional[BlueprintIndex] = None
+
+
+def get_blueprint_index() -> BlueprintIndex:
+    """Process-wide index at CACHE_DIR/blueprints.sqlite3."""
+    global _index
+    if _index is None:
+        from app.core.config import get_settings
+        _index = BlueprintIndex(os.path.join(get_settings().CACHE_DIR, "blueprints.sqlite3"))
+    return _index
+
+
+_loaded: Set[str] = set()
+_loading = SingleFlight()
+
+
+async def _load_from_supabase(organization_id: str) -> int:
+    from app.services.vector_search import vector_search_service
+    items = await vector_search_service.blueprint_structures(organization_id)
+    if items:
+        await asyncio.to_thread(get_blueprint_index().add_many, organization_id, items)
+    logger.info(f"🧩 Blueprint index: {len(items)} workflows de Supabase para {organization_id}")
+    return len(items)
+
+
+async def find_blueprints(
+    organization_id: str,
+    node_types: List[str],
+    ordered: bool = False,
+    limit: int = 20,
+) -> List[Dict[str, Any]]:
+    """BlueprintIndex.find, loading the org's workflows from document_chunks once per process."""
+    if organization_id not in _loaded:
+        try:
+            await _loading.do(organization_id, lambda: _load_from_supabase(organization_id))
+            _loaded.add(organization_id)
+        except Exception as e:
+            # Answer from whatever is local; retry the load on the next query
+            logger.warning(f"⚠️ No se pudieron cargar blueprints de Supabase: {e}")
+    # find() may rebuild the in-memory lists from SQLite: not on the event loop
+    return await asyncio.to_thread(get_blueprint_index().find, organization_id, node_types, ordered, limit)
+
+
+def format_blueprints(results: List[Dict[str, Any]], node_types: List[str]) -> str:
+    """Tool-friendly text for agents."""
+    if not results:
+        return f"No hay workflows con los nodos: {', '.join(node_types)}."
+    lines = [f"Workflows n8n con {', '.join(node_types)} ({len(results)}):"]
+    for r in results:
+        lines.append(f"- {r['file_name']} ({r['name'] or 'sin nombre'}, {r['node_count']} nodos): {', '.join(r['node_types'])}")
+    return "\n".join(lines)
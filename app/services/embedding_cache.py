@@ -0,0 +1,190 @@
+"""
+Embedding Cache - two tiers in front of the Gemini embedding API.
+
+1. In-memory LRU (bounded, per process)
+2. On-disk SQLite store (survives restarts, shared by workers on the host),
+   capped at EMBEDDING_DISK_CACHE_SIZE rows; async callers reach it through
+   asyncio.to_thread so a busy disk never stalls the event loop
+
+Keys are SHA-256 of (model, task_type, normalized text), so the same question
+asked with different spacing/casing reuses one embedding.
+"""
+import os
+import re
+import time
+import asyncio
+import sqlite3
+import hashlib
+import threading
+import unicodedata
+from array import array
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+from loguru import logger
+from app.core.metrics import EMBEDDING_CACHE_LOOKUPS
+
+_WHITESPACE = re.compile(r"\s+")
+SQL_BATCH = 500  # keys per IN (...) lookup, under SQLite's variable limit
+
+
+def normalize_text(text: str) -> str:
+    """NFC, collapsed whitespace, case-folded."""
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFC", text)).strip().casefold()
+
+
+class EmbeddingCache:
+    """Bounded LRU backed by an optional SQLite file (capped at `max_disk_items`, oldest rows go first)."""
+
+    def __init__(self, path: Optional[str] = None, max_items: int = 5000, max_disk_items: int = 200_000):
+        self.max_items = max_items
+        self.max_disk_items = max_disk_items
+        self._lru: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        # The disk tier has its own lock: a slow write in a worker thread must not block memory hits
+        self._disk_lock = threading.Lock()
+        self._stats: Dict[str, int] = {"memory_hit": 0, "disk_hit": 0, "miss": 0}
+        self._conn: Optional[sqlite3.Connection] = None
+        self._disk_rows = 0
+        if path:
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+                self._conn = sqlite3.connect(path, timeout=2.0, check_same_thread=False)
+                self._conn.execute("PRAGMA journal_mode=WAL")
+                self._conn.execute("PRAGMA synchronous=NORMAL")
+                self._conn.execute(
+                    "CREATE TABLE IF NOT EXISTS embeddings ("
+                    " key TEXT PRIMARY KEY,"
+                    " vector BLOB NOT NULL,"
+                    " created REAL NOT NULL)"
+                )
+                self._conn.execute("CREATE INDEX IF NOT EXISTS embeddings_created ON embeddings (created)")
+                self._conn.commit()
+                self._disk_rows = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            except Exception as e:
+                logger.error(f"⚠️ Embedding cache: disk tier disabled ({path}): {e}")
+                self._conn = None
+
+    @staticmethod
+    def make_key(model: str, task_type: str, text: str) -> str:
+        payload = f"{model}\x00{task_type}\x00{normalize_text(text)}"
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _record(self, result: str, count: int = 1):
+        if count:
+            self._stats[result] += count
+            EMBEDDING_CACHE_LOOKUPS.labels(result=result).inc(count)
+
+    def _remember(self, key: str, vector: List[float]):
+        self._lru[key] = vector
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.max_items:
+            self._lru.popitem(last=False)
+
+    def _memory_get(self, keys: Iterable[str]) -> Dict[str, List[float]]:
+        found = {}
+        with self._lock:
+            for key in keys:
+                vector = self._lru.get(key)
+                if vector is not None:
+                    self._lru.move_to_end(key)
+                    found[key] = vector
+            self._record("memory_hit", len(found))
+        return found
+
+    def _disk_get(self, keys: List[str]) -> Dict[str, List[float]]:
+        found = {}
+        if self._conn is not None:
+            with self._disk_lock:
+                for i in range(0, len(keys), SQL_BATCH):
+                    batch = keys[i:i + SQL_BATCH]
+                    rows = self._conn.execute(
+                        f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(batch))})", batch
+                    ).fetchall()
+                    found.update((key, array("f", blob).tolist()) for key, blob in rows)
+        with self._lock:
+            for key, vector in found.items():
+                self._remember(key, vector)
+            self._record("disk_hit", len(found))
+            self._record("miss", len(keys) - len(found))
+        return found
+
+    def _disk_put(self, items: List[Tuple[str, List[float]]]):
+        if self._conn is None or not items:
+            return
+        now = time.time()
+        with self._disk_lock:
+            try:
+                with self._conn:
+                    self._conn.executemany(
+                        "INSERT OR REPLACE INTO embeddings (key, vector, created) VALUES (?, ?, ?)",
+                        [(key, array("f", vector).tobytes(), now) for key, vector in items],
+                    )
+                self._disk_rows += len(items)
+                if self._disk_rows > self.max_disk_items:
+                    self._prune()
+            except sqlite3.Error as e:
+                logger.warning(f"⚠️ Embedding cache write failed: {e}")
+
+    def _prune(self):
+        """Drop the oldest rows down to 90% of the cap (other workers write too: recount first)."""
+        rows = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        excess = rows - int(self.max_disk_items * 0.9)
+        if rows > self.max_disk_items and excess > 0:
+            with self._conn:
+                self._conn.execute(
+                    "DELETE FROM embeddings WHERE key IN (SELECT key FROM embeddings ORDER BY created, rowid LIMIT ?)",
+                    (excess,),
+                )
+            rows -= excess
+            logger.info(f"🧹 Embedding cache: {excess} embeddings antiguos eliminados del disco")
+        self._disk_rows = rows
+
+    def get_many(self, keys: List[str]) -> Dict[str, List[float]]:
+        found = self._memory_get(keys)
+        missing = [k for k in keys if k not in found]
+        if missing:
+            found.update(self._disk_get(missing))
+        return found
+
+    async def aget_many(self, keys: List[str]) -> Dict[str, List[float]]:
+        """get_many with the SQLite lookup in a worker thread."""
+        found = self._memory_get(keys)
+        missing = [k for k in keys if k not in found]
+        if missing:
+            if self._conn is None:
+                found.update(self._disk_get(missing))
+            else:
+                found.update(await asyncio.to_thread(self._disk_get, missing))
+        return found
+
+    def get(self, key: str) -> Optional[List[float]]:
+        return self.get_many([key]).get(key)
+
+    def _memory_put(self, items: List[Tuple[str, List[float]]]) -> List[Tuple[str, List[float]]]:
+        items = [(key, list(vector)) for key, vector in items]
+        with self._lock:
+            for key, vector in items:
+                self._remember(key, vector)
+        return items
+
+    def put_many(self, items: List[Tuple[str, List[float]]]):
+        self._disk_put(self._memory_put(items))
+
+    async def aput_many(self, items: List[Tuple[str, List[float]]]):
+        """put_many with the SQLite write in a worker thread."""
+        items = self._memory_put(items)
+        if self._conn is not None and items:
+            await asyncio.to_thread(self._disk_put, items)
+
+    def put(self, key: str, vector: List[float]):
+        self.put_many([(key, vector)])
+
+    def stats(self) -> Dict[str, float]:
+        lookups = sum(self._stats.values())
+        hits = self._stats["memory_hit"] + self._stats["disk_hit"]
+        return {
+            **self._stats,
+            "size": len(self._lru),
+            "disk_size": self._disk_rows,
+            "hit_ratio": round(hits / lookups, 3) if lookups else 0.0,
+        }
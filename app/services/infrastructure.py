@@ -2,6 +2,7 @@ import httpx
 from typing import Dict, Any
 from app.core.config import get_settings
 from loguru import logger
+from app.utils.deadline import timeout_for
 
 settings = get_settings()
 
@@ -23,7 +24,7 @@ class HostingerService:
                         "Authorization": f"Bearer {self.api_key}",
                         "Accept": "application/json"
                     },
-                    timeout=10.0
+                    timeout=timeout_for(10.0, "infrastructure")
                 )
                 
                 if response.status_code == 200:
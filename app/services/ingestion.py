@@ -0,0 +1,357 @@
+"""
+RAG Ingestion - files → chunks → batched embeddings → document_chunks.
+
+- Streams files one at a time (never the whole corpus in memory)
+- Content-addressed: every chunk is keyed by SHA-256 of its text, chunks
+  already ingested for the org are skipped
+- Batches go through VectorSearchService.store_documents (batchEmbedContents
+  + bulk insert), several in flight at once
+- Progress is checkpointed in a local SQLite file after every batch, so an
+  interrupted run resumes where it stopped
+- sync()/watch(): per-file incremental re-indexing. Chunk hashes are diffed
+  against what is stored for the file; only new chunks are embedded and
+  vanished ones deleted, in one transaction per file (sync_document_chunks)
+"""
+import os
+import time
+import sqlite3
+import asyncio
+import hashlib
+import fnmatch
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from loguru import logger
+from app.utils.chunker import MarkdownChunker
+
+DEFAULT_PATTERNS = ("*.md", "*.txt")
+
+
+def chunk_hash(content: str) -> str:
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def iter_files(paths: Iterable[str], patterns: Iterable[str] = DEFAULT_PATTERNS) -> Iterator[str]:
+    """Files matching `patterns` under each path (files are yielded as given), sorted per directory."""
+    patterns = tuple(patterns)
+    for path in paths:
+        if os.path.isfile(path):
+            yield path
+            continue
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for name in sorted(files):
+                if any(fnmatch.fnmatch(name, p) for p in patterns):
+                    yield os.path.join(root, name)
+
+
+def source_for(path: str, roots: Iterable[str]) -> str:
+    """
+    Stable id of a file in metadata.source: '<root folder name>/<relative path>'
+    under a folder root, else the file's path relative to the working directory.
+    """
+    path = os.path.abspath(path)
+    for root in roots:
+        root = os.path.abspath(root)
+        if os.path.isdir(root) and path.startswith(os.path.join(root, "")):
+            rel = os.path.relpath(path, root)
+            return "/".join([os.path.basename(root), *rel.split(os.sep)])
+    rel = os.path.relpath(path)
+    if rel.startswith(os.pardir):
+        rel = path
+    return "/".join(rel.split(os.sep))
+
+
+def path_for(source: str, roots: Iterable[str]) -> Optional[str]:
+    """Inverse of source_for: where a stored source lives under `roots` (None if outside them)."""
+    name, _, rel = source.partition("/")
+    for root in roots:
+        if os.path.isdir(root):
+            root = os.path.abspath(root)
+            if rel and name == os.path.basename(root):
+                return os.path.join(root, *rel.split("/"))
+        elif source == source_for(root, ()):
+            return os.path.abspath(root)
+    return None
+
+
+def check_roots(roots: Iterable[str]):
+    """Two folder roots with the same name would share source ids."""
+    names: Dict[str, str] = {}
+    for root in roots:
+        if os.path.isdir(root):
+            name = os.path.basename(os.path.abspath(root))
+            if name in names and os.path.abspath(names[name]) != os.path.abspath(root):
+                raise ValueError(f"Carpetas con el mismo nombre: {names[name]} y {root}")
+            names[name] = root
+
+
+class IngestionCheckpoint:
+    """Local record of chunk hashes already stored per org (SQLite, survives crashes)."""
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self._conn = sqlite3.connect(path, timeout=5.0)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS ingested_chunks ("
+            " organization_id TEXT NOT NULL,"
+            " chunk_hash TEXT NOT NULL,"
+            " source TEXT,"
+            " ingested_at REAL NOT NULL,"
+            " PRIMARY KEY (organization_id, chunk_hash))"
+        )
+        self._conn.commit()
+
+    def known(self, organization_id: str) -> Set[str]:
+        rows = self._conn.execute(
+            "SELECT chunk_hash FROM ingested_chunks WHERE organization_id = ?", (organization_id,)
+        ).fetchall()
+        return {r[0] for r in rows}
+
+    def mark(self, organization_id: str, chunks: List[Dict[str, Any]]):
+        now = time.time()
+        self._conn.executemany(
+            "INSERT OR IGNORE INTO ingested_chunks (organization_id, chunk_hash, source, ingested_at) VALUES (?, ?, ?, ?)",
+            [(organization_id, c["metadata"]["chunk_hash"], c["metadata"].get("source"), now) for c in chunks],
+        )
+        self._conn.commit()
+
+    def replace_source(self, organization_id: str, source: str, chunks: List[Dict[str, Any]]):
+        """After a sync: the hashes recorded for `source` become exactly those of `chunks`."""
+        now = time.time()
+        with self._conn:
+            self._conn.execute(
+                "DELETE FROM ingested_chunks WHERE organization_id = ? AND source = ?", (organization_id, source)
+            )
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO ingested_chunks (organization_id, chunk_hash, source, ingested_at) VALUES (?, ?, ?, ?)",
+                [(organization_id, c["metadata"]["chunk_hash"], source, now) for c in chunks],
+            )
+
+    def sources(self, organization_id: str) -> Set[str]:
+        rows = self._conn.execute(
+            "SELECT DISTINCT source FROM ingested_chunks WHERE organization_id = ?", (organization_id,)
+        ).fetchall()
+        return {r[0] for r in rows if r[0]}
+
+    def reset(self, organization_id: str):
+        self._conn.execute("DELETE FROM ingested_chunks WHERE organization_id = ?", (organization_id,))
+        self._conn.commit()
+
+    def close(self):
+        self._conn.close()
+
+
+@dataclass
+class IngestionReport:
+    files: int = 0
+    chunks: int = 0
+    skipped: int = 0
+    stored: int = 0
+    deleted: int = 0
+    failed: int = 0
+    seconds: float = 0.0
+    errors: List[str] = field(default_factory=list)
+
+    def __str__(self) -> str:
+        return (
+            f"{self.files} files, {self.chunks} chunks: {self.stored} stored, {self.deleted} deleted, "
+            f"{self.skipped} unchanged, {self.failed} failed in {self.seconds:.1f}s"
+        )
+
+
+class RAGIngestor:
+    """
+    Streams files into document_chunks for one organization.
+    `service` is a VectorSearchService (anything with async store_documents(docs, org) -> int).
+    """
+
+    def __init__(
+        self,
+        service,
+        organization_id: str,
+        checkpoint: IngestionCheckpoint,
+        batch_size: int = 100,
+        concurrency: int = 4,
+        chunker: Optional[MarkdownChunker] = None,
+    ):
+        self.service = service
+        self.organization_id = organization_id
+        self.checkpoint = checkpoint
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.chunker = chunker or MarkdownChunker()
+
+    def chunks_for(self, path: str, source: Optional[str] = None) -> List[Dict[str, Any]]:
+        with open(path, "r", encoding="utf-8") as f:
+            text = f.read()
+        source = source or source_for(path, ())
+        return [
+            {
+                "content": chunk.text,
+                "metadata": {
+                    "file_name": os.path.basename(path),
+                    "source": source,
+                    "index": i,
+                    "heading_path": chunk.heading_path,
+                    "tokens": chunk.tokens,
+                    "chunk_hash": chunk_hash(chunk.text),
+                    "type": "rag_document",
+                },
+            }
+            for i, chunk in enumerate(self.chunker.chunk(text))
+        ]
+
+    async def ingest(self, paths: Iterable[str], patterns: Iterable[str] = DEFAULT_PATTERNS) -> IngestionReport:
+        paths = list(paths)
+        check_roots(paths)
+        report = IngestionReport()
+        started = time.perf_counter()
+        seen = self.checkpoint.known(self.organization_id)
+        semaphore = asyncio.Semaphore(max(1, self.concurrency))
+        tasks: Set[asyncio.Task] = set()
+
+        async def flush(batch: List[Dict[str, Any]]):
+            try:
+                stored = await self.service.store_documents(batch, self.organization_id)
+            except Exception as e:
+                logger.error(f"❌ Error guardando lote de {len(batch)} chunks: {e}")
+                stored = 0
+            finally:
+                semaphore.release()
+            if stored == len(batch):
+                self.checkpoint.mark(self.organization_id, batch)
+                report.stored += stored
+                logger.info(f"✅ Ingesta: {report.stored} chunks guardados")
+            else:
+                # Not checkpointed: the next run retries these chunks
+                report.failed += len(batch)
+                for c in batch:
+                    seen.discard(c["metadata"]["chunk_hash"])
+
+        async def submit(batch: List[Dict[str, Any]]):
+            await semaphore.acquire()  # backpressure: at most `concurrency` batches in flight
+            task = asyncio.create_task(flush(batch))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+
+        buffer: List[Dict[str, Any]] = []
+        for path in iter_files(paths, patterns):
+            try:
+                chunks = self.chunks_for(path, source_for(path, paths))
+            except Exception as e:
+                report.errors.append(f"{path}: {e}")
+                logger.error(f"❌ Error leyendo {path}: {e}")
+                continue
+            report.files += 1
+            report.chunks += len(chunks)
+            for chunk in chunks:
+                h = chunk["metadata"]["chunk_hash"]
+                if h in seen:
+                    report.skipped += 1
+                    continue
+                seen.add(h)
+                buffer.append(chunk)
+                if len(buffer) >= self.batch_size:
+                    await submit(buffer)
+                    buffer = []
+        if buffer:
+            await submit(buffer)
+        if tasks:
+            await asyncio.gather(*tasks)
+
+        report.seconds = time.perf_counter() - started
+        logger.info(f"📚 Ingesta completa: {report}")
+        return report
+
+    async def sync_file(self, path: str, roots: Iterable[str]) -> Dict[str, int]:
+        """Re-index one file (a missing file deletes its chunks)."""
+        source = source_for(path, roots)
+        chunks = self.chunks_for(path, source) if os.path.isfile(path) else []
+        result = await self.service.sync_source(source, chunks, self.organization_id)
+        self.checkpoint.replace_source(self.organization_id, source, chunks)
+        return result
+
+    async def sync(self, paths: Iterable[str], patterns: Iterable[str] = DEFAULT_PATTERNS) -> IngestionReport:
+        """Incremental sync of every file under `paths`, including files deleted since the last run."""
+        paths = list(paths)
+        check_roots(paths)
+        report = IngestionReport()
+        started = time.perf_counter()
+        files = list(iter_files(paths, patterns))
+
+        # Sources we ingested before under these roots that no longer exist on disk
+        present = {source_for(f, paths) for f in files}
+        gone = sorted(
+            filter(None, (path_for(s, paths) for s in self.checkpoint.sources(self.organization_id) if s not in present))
+        )
+        targets = files + gone
+
+        await self._sync_files(targets, paths, report)
+        report.seconds = time.perf_counter() - started
+        logger.info(f"🔄 Sync completo: {report}")
+        return report
+
+    async def _sync_files(self, files: Iterable[str], roots: List[str], report: IngestionReport):
+        semaphore = asyncio.Semaphore(max(1, self.concurrency))
+
+        async def one(path: str):
+            async with semaphore:
+                try:
+                    result = await self.sync_file(path, roots)
+                except Exception as e:
+                    report.errors.append(f"{path}: {e}")
+                    logger.error(f"❌ Error sincronizando {path}: {e}")
+                    return
+            report.files += 1
+            report.stored += result.get("inserted", 0)
+            report.deleted += result.get("deleted", 0)
+
+        await asyncio.gather(*(one(f) for f in files))
+
+    async def watch(self, paths: Iterable[str], patterns: Iterable[str] = DEFAULT_PATTERNS, interval: float = 2.0):
+        """
+        Initial sync, then keep syncing files as they change.
+        Uses watchfiles (inotify/FSEvents) when installed, else polls mtimes every `interval` seconds.
+        """
+        paths = list(paths)
+        patterns = tuple(patterns)
+        await self.sync(paths, patterns)
+
+        def relevant(path: str) -> bool:
+            return any(fnmatch.fnmatch(os.path.basename(path), p) for p in patterns)
+
+        try:
+            from watchfiles import awatch
+        except ImportError:
+            awatch = None
+
+        if awatch is not None:
+            logger.info(f"👀 Watching {', '.join(paths)} (watchfiles)")
+            async for changes in awatch(*paths, debounce=int(interval * 1000)):
+                changed = sorted({p for _, p in changes if relevant(p)})
+                if changed:
+                    await self._sync_files(changed, paths, IngestionReport())
+            return
+
+        logger.info(f"👀 Watching {', '.join(paths)} (polling every {interval:.0f}s)")
+        snapshot = self._snapshot(paths, patterns)
+        while True:
+            await asyncio.sleep(interval)
+            current = self._snapshot(paths, patterns)
+            changed = sorted(p for p in current.keys() | snapshot.keys() if current.get(p) != snapshot.get(p))
+            snapshot = current
+            if changed:
+                await self._sync_files(changed, paths, IngestionReport())
+
+    @staticmethod
+    def _snapshot(paths: List[str], patterns: Iterable[str]) -> Dict[str, Tuple[float, int]]:
+        snapshot = {}
+        for path in iter_files(paths, patterns):
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            snapshot[path] = (st.st_mtime, st.st_size)
+        return snapshot
@@ -0,0 +1,106 @@
+"""
+Keyword Index - BM25 over chunk content + reciprocal rank fusion.
+
+Cosine similarity alone misses exact identifiers (client names, n8n node types
+like `httpRequest`, workflow file names). BM25 catches them; RRF merges the
+keyword ranking with the vector ranking without having to calibrate scores.
+"""
+import re
+import math
+import unicodedata
+from collections import Counter
+from typing import Dict, Hashable, List, Sequence, Tuple
+
+_CAMEL = re.compile(r"[a-z]+|[A-Z][a-z]*|[0-9]+")
+
+# Function words that would otherwise match every chunk (accent-folded)
+STOPWORDS = frozenset(
+    "a al algo como con de del el en es esta este hay la las lo los mas me mi "
+    "no o para por que se si sin sobre su sus te tu un una uno y ya "
+    "an and are as at be by do for from how i in is it of on or the this to what "
+    "when where which who with you".split()
+)
+
+
+def fold(text: str) -> str:
+    """Strip accents (á → a, ñ → n) so 'reunión' matches 'reunion'."""
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Accent-folded lowercase words. camelCase identifiers also emit their parts,
+    so 'httpRequest' matches both 'httprequest' and 'http request'.
+    """
+    folded = fold(text)
+    tokens: List[str] = []
+    for raw in re.findall(r"[A-Za-z0-9]+", folded):
+        lower = raw.lower()
+        if lower in STOPWORDS:
+            continue
+        tokens.append(lower)
+        parts = _CAMEL.findall(raw)
+        if len(parts) > 1:
+            tokens.extend(p.lower() for p in parts)
+    return tokens
+
+
+class BM25Index:
+    """Append-only inverted index. Documents are numbered in insertion order."""
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, Dict[int, int]] = {}
+        self.doc_len: List[int] = []
+        self._total_len = 0
+
+    def __len__(self) -> int:
+        return len(self.doc_len)
+
+    def add(self, text: str) -> int:
+        doc = len(self.doc_len)
+        terms = Counter(tokenize(text))
+        for term, tf in terms.items():
+            self.postings.setdefault(term, {})[doc] = tf
+        length = sum(terms.values())
+        self.doc_len.append(length)
+        self._total_len += length
+        return doc
+
+    def search(self, query: str, limit: int = 10) -> List[Tuple[int, float]]:
+        """(doc, score) pairs, best first. Only documents sharing a term with the query."""
+        n = len(self.doc_len)
+        if n == 0 or limit <= 0:
+            return []
+        avg_len = self._total_len / n or 1.0
+        scores: Dict[int, float] = {}
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            df = len(postings)
+            idf = math.log(1.0 + (n - df + 0.5) / (df + 0.5))
+            for doc, tf in postings.items():
+                norm = self.k1 * (1.0 - self.b + self.b * self.doc_len[doc] / avg_len)
+                scores[doc] = scores.get(doc, 0.0) + idf * tf * (self.k1 + 1.0) / (tf + norm)
+        return sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:limit]
+
+
+def reciprocal_rank_fusion(
+    rankings: Sequence[Sequence[Hashable]],
+    weights: Sequence[float],
+    k: int = 60,
+) -> List[Tuple[Hashable, float]]:
+    """
+    Weighted RRF: score(d) = Σ weight_i / (k + rank_i(d)), ranks starting at 1.
+    Returns (id, score) best first; ties keep first-seen order.
+    """
+    scores: Dict[Hashable, float] = {}
+    for ranking, weight in zip(rankings, weights):
+        if weight <= 0:
+            continue
+        for rank, item in enumerate(ranking, 1):
+            scores[item] = scores.get(item, 0.0) + weight / (k + rank)
+    return sorted(scores.items(), key=lambda item: -item[1])
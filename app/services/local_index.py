@@ -0,0 +1,209 @@
+"""
+Local Vector Index - in-process mirror of `document_chunks`, one per organization.
+
+Brute-force cosine over a normalized float32 matrix (NumPy). A per-org corpus
+of a few thousand chunks answers in well under a millisecond, without the
+`match_documents` round trip. Semantics match the RPC:
+
+    similarity = 1 - cosine_distance(embedding, query)
+    WHERE similarity > match_threshold ORDER BY similarity DESC LIMIT match_count
+
+Each org also gets a BM25 keyword index over chunk content (hybrid search).
+With quantize=True vectors are kept as int8 with one float32 scale per row
+(~4x less memory). Scores are the int8 rows dotted straight with the float32
+query, times the row scale: no dequantized copy of the matrix, ~1.3x the
+float32 scan instead of ~2.5x.
+"""
+import json
+import time
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from loguru import logger
+from app.services.keyword_index import BM25Index
+
+try:
+    import numpy as np
+except ImportError:  # optional: the service falls back to the RPC
+    np = None
+
+# Rows as returned by PostgREST: id, content, metadata, embedding
+Row = Dict[str, Any]
+# (organization_id, with_embeddings) -> rows
+Loader = Callable[[str, bool], Awaitable[List[Row]]]
+
+
+def parse_embedding(value: Any) -> List[float]:
+    """pgvector columns come back from PostgREST as '[0.1,0.2,...]' strings."""
+    if isinstance(value, str):
+        return json.loads(value)
+    return list(value)
+
+
+def quantize_int8(vectors):
+    """Symmetric per-row int8: row ≈ q * scale, with scale = max|row| / 127."""
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    scales = np.maximum(scales, 1e-12).astype(np.float32)
+    q = np.rint(vectors / scales[:, None]).astype(np.int8)
+    return q, scales
+
+
+class OrgIndex:
+    """Chunks of one organization: parallel row lists + an (n, dim) unit-norm matrix + BM25."""
+
+    def __init__(self, vectors: bool = True, quantize: bool = False, dim: Optional[int] = None):
+        self.vectors = vectors
+        self.quantize = quantize
+        self.dim = dim
+        self.ids: List[Any] = []
+        self.contents: List[str] = []
+        self.metadatas: List[Dict[str, Any]] = []
+        self.matrix = None
+        self.scales = None  # per-row scale when quantized
+        self.keywords = BM25Index()
+        self.loaded_at = time.monotonic()
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def add(self, rows: List[Row]):
+        if self.vectors:
+            rows = [r for r in rows if r.get("embedding") is not None]
+        if not rows:
+            return
+        if self.vectors:
+            parsed = [parse_embedding(r["embedding"]) for r in rows]
+            dim = self.dim or len(parsed[0])
+            mismatched = sum(1 for v in parsed if len(v) != dim)
+            if mismatched:
+                # Chunks embedded with another output_dimensionality can't be compared with our queries
+                logger.warning(f"⚠️ Local index: skipping {mismatched} rows whose dim != {dim}")
+                rows = [r for r, v in zip(rows, parsed) if len(v) == dim]
+                parsed = [v for v in parsed if len(v) == dim]
+                if not rows:
+                    return
+            self.dim = dim
+            vectors = np.asarray(parsed, dtype=np.float32)
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            vectors /= np.maximum(norms, 1e-12)
+            if self.quantize:
+                vectors, scales = quantize_int8(vectors)
+                self.scales = scales if self.scales is None else np.concatenate([self.scales, scales])
+            self.matrix = vectors if self.matrix is None else np.vstack([self.matrix, vectors])
+        for r in rows:
+            self.ids.append(r.get("id"))
+            self.contents.append(r.get("content", ""))
+            self.metadatas.append(r.get("metadata") or {})
+            self.keywords.add(r.get("content", ""))
+
+    def row(self, i: int) -> Dict[str, Any]:
+        return {"id": self.ids[i], "content": self.contents[i], "metadata": self.metadatas[i]}
+
+    def keyword_search(self, query: str, limit: int) -> List[Dict[str, Any]]:
+        """BM25 ranking over chunk content, best first."""
+        return [dict(self.row(i), bm25=score) for i, score in self.keywords.search(query, limit)]
+
+    def search(self, embedding: List[float], match_threshold: float, match_count: int) -> List[Dict[str, Any]]:
+        if not self.vectors:
+            raise RuntimeError("local index holds keywords only")
+        if self.matrix is None or match_count <= 0:
+            return []
+        query = np.asarray(embedding, dtype=np.float32)
+        if query.shape[0] != self.dim:
+            raise ValueError(f"query dim {query.shape[0]} != index dim {self.dim}")
+        query /= max(float(np.linalg.norm(query)), 1e-12)
+        scores = self._scores(query)
+        candidates = np.flatnonzero(scores > match_threshold)
+        if candidates.size > match_count:
+            top = np.argpartition(-scores[candidates], match_count - 1)[:match_count]
+            candidates = candidates[top]
+        order = candidates[np.argsort(-scores[candidates], kind="stable")]
+        return [dict(self.row(i), similarity=float(scores[i])) for i in order]
+
+    def _scores(self, query):
+        if self.scales is None:
+            return self.matrix @ query
+        # matmul would upcast the whole int8 matrix first; einsum casts element by element
+        return np.einsum("ij,j->i", self.matrix, query, dtype=np.float32) * self.scales
+
+    def nbytes(self) -> int:
+        """Memory held by the vector side."""
+        if self.matrix is None:
+            return 0
+        return self.matrix.nbytes + (self.scales.nbytes if self.scales is not None else 0)
+
+
+class LocalVectorIndex:
+    """
+    Per-org OrgIndex registry, bootstrapped lazily and refreshed after `ttl` seconds.
+    With vectors=False only the keyword side is kept (no numpy, no embeddings loaded).
+    """
+
+    def __init__(
+        self,
+        loader: Loader,
+        ttl: float = 600.0,
+        vectors: bool = True,
+        quantize: bool = False,
+        dim: Optional[int] = None,
+    ):
+        self.loader = loader
+        self.ttl = ttl
+        self.vectors = vectors
+        self.quantize = quantize
+        self.dim = dim
+        self._orgs: Dict[str, OrgIndex] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    @staticmethod
+    def available() -> bool:
+        return np is not None
+
+    def _fresh(self, organization_id: str) -> Optional[OrgIndex]:
+        index = self._orgs.get(organization_id)
+        if index is not None and time.monotonic() - index.loaded_at < self.ttl:
+            return index
+        return None
+
+    async def ensure(self, organization_id: str) -> OrgIndex:
+        """Return the org index, loading every chunk of the org on first use or after ttl."""
+        index = self._fresh(organization_id)
+        if index is not None:
+            return index
+        lock = self._locks.setdefault(organization_id, asyncio.Lock())
+        async with lock:
+            index = self._fresh(organization_id)
+            if index is not None:
+                return index
+            started = time.perf_counter()
+            rows = await self.loader(organization_id, self.vectors)
+            index = OrgIndex(vectors=self.vectors, quantize=self.quantize, dim=self.dim)
+            index.add(rows)
+            self._orgs[organization_id] = index
+            logger.info(f"🧭 Local index: {len(index)} chunks for org {organization_id} in {(time.perf_counter() - started) * 1000:.0f}ms")
+            return index
+
+    def add(self, organization_id: str, rows: List[Row]):
+        """Incremental update after an insert. Orgs not loaded yet pick the rows up on bootstrap."""
+        index = self._orgs.get(organization_id)
+        if index is not None:
+            index.add(rows)
+
+    async def search(
+        self,
+        embedding: List[float],
+        organization_id: str,
+        match_threshold: float = 0.5,
+        match_count: int = 5,
+    ) -> List[Dict[str, Any]]:
+        index = await self.ensure(organization_id)
+        return index.search(embedding, match_threshold, match_count)
+
+    async def keyword_search(self, query: str, organization_id: str, limit: int = 20) -> List[Dict[str, Any]]:
+        index = await self.ensure(organization_id)
+        return index.keyword_search(query, limit)
+
+    def invalidate(self, organization_id: Optional[str] = None):
+        if organization_id is None:
+            self._orgs.clear()
+        else:
+            self._orgs.pop(organization_id, None)
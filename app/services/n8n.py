@@ -2,6 +2,7 @@ import httpx
 from typing import Dict, Any, Optional
 from app.core.config import get_settings
 from loguru import logger
+from app.utils.deadline import timeout_for
 
 settings = get_settings()
 
@@ -40,7 +41,7 @@ class N8nService:
                 response = await client.post(
                     self.base_url,
                     json=full_payload,
-                    timeout=10.0
+                    timeout=timeout_for(10.0, "n8n")
                 )
                 
                 if response.status_code >= 200 and response.status_code < 300:
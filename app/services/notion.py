@@ -2,6 +2,7 @@ import httpx
 from typing import List, Dict, Any, Optional
 from app.core.config import get_settings
 from loguru import logger
+from app.utils.deadline import timeout_for
 
 settings = get_settings()
 
@@ -33,7 +34,7 @@ class NotionService:
                     f"{NOTION_API_BASE}/search",
                     headers=self.headers,
                     json=payload,
-                    timeout=10.0
+                    timeout=timeout_for(10.0, "notion")
                 )
                 response.raise_for_status()
                 data = response.json()
@@ -52,7 +53,7 @@ class NotionService:
                 response = await client.get(
                     f"{NOTION_API_BASE}/pages/{page_id}",
                     headers=self.headers,
-                    timeout=10.0
+                    timeout=timeout_for(10.0, "notion")
                 )
                 response.raise_for_status()
                 return response.json()
@@ -75,7 +76,7 @@ class NotionService:
                     f"{NOTION_API_BASE}/databases/{database_id}/query",
                     headers=self.headers,
                     json=payload,
-                    timeout=10.0
+                    timeout=timeout_for(10.0, "notion")
                 )
                 response.raise_for_status()
                 data = response.json()
@@ -160,7 +161,7 @@ class NotionService:
                     f"{NOTION_API_BASE}/pages",
                     headers=self.headers,
                     json=payload,
-                    timeout=10.0
+                    timeout=timeout_for(10.0, "notion")
                 )
                 if response.status_code != 200:
                     # Try adapting title property name if "Name" fails? 
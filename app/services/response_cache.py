@@ -0,0 +1,195 @@
+"""
+Semantic Response Cache - reuse answers to near-duplicate questions.
+
+Scoped by (organization, user, agent): an answer is only reused for the same
+person talking to the same agent. Lookup order:
+
+1. Exact match on the normalized text (no embedding call at all)
+2. Cosine similarity ≥ threshold against the scope's cached queries (NumPy).
+   The query embedding comes from the embedding cache, so asking again
+   costs no provider quota either.
+
+TTLs are per intent. Time-sensitive answers (scheduler, live state such as
+"hoy" or "servidor") only live LIVE_TTL seconds, which still absorbs bursts
+of the same question. Anything with side effects bypasses the cache: the Nux
+agent (outreach, Notion tasks) and any query asking for an action ("crea",
+"envía", "sincroniza", correo...). Failed or degraded answers are never stored.
+"""
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+from loguru import logger
+
+from app.core.metrics import RESPONSE_CACHE_HIT_RATIO, RESPONSE_CACHE_LOOKUPS
+from app.services.embedding_cache import normalize_text
+
+try:
+    import numpy as np
+except ImportError:  # optional: exact-text hits only
+    np = None
+
+# texts -> vectors (vector_search_service.embed_many with a fixed task type)
+Embedder = Callable[[List[str]], Awaitable[List[List[float]]]]
+# (organization_id, user_id, agent)
+Scope = Tuple[str, str, str]
+
+# Seconds an answer stays valid per agent/intent; 0 = never cached
+INTENT_TTLS: Dict[str, float] = {
+    "lumina": 3600.0,    # analysis and strategy age slowly
+    "memoris": 900.0,    # knowledge base changes with ingestion
+    "vox": 600.0,
+    "brain": 600.0,      # PydanticBrainService (synapse, WhatsApp)
+    "nux": 0.0,          # triggers outreach / creates Notion tasks
+    "scheduler": 60.0,   # live calendar and tasks (writes are caught by the action keywords)
+    "infrastructure": 60.0,
+}
+DEFAULT_TTL = 300.0
+LIVE_TTL = 60.0
+MAX_PER_SCOPE = 100
+
+# "action" queries always reach the agents; "live" ones are capped at LIVE_TTL
+BYPASS_KEYWORDS = {
+    "action": [
+        "crea*", "agenda*", "programa*", "anota", "apunta", "envía*", "manda*", "contacta*", "ejecuta*",
+        "activa*", "dispara*", "sincroniza*", "borra*", "elimina*", "actualiza*", "publica*",
+        "correo*", "email*", "gmail",  # Scheduler.sync_emails turns emails into Notion tasks
+    ],
+    "live": [
+        "hoy", "mañana", "ahora", "ayer", "esta semana", "pendientes", "calendario",
+        "servidor", "vps", "cpu", "ram", "infraestructura", "uptime", "caído",
+    ],
+}
+_bypass = None
+
+# Fallback/error replies (agents return them as plain strings)
+UNCACHEABLE_PREFIXES = ("❌", "⚠️", "🔧", "🔥", "⏱️", "🌙", "🎙️ Vox está reconectando", "💡 Lumina está reconectando", "Error")
+
+
+def ttl_for(intent: str, query: str) -> float:
+    """TTL for caching this query's answer under `intent` (0 = bypass)."""
+    global _bypass
+    if _bypass is None:
+        # Imported here: app.agentes imports the router, which imports this module
+        from app.agentes.intent import IntentMatcher
+        _bypass = IntentMatcher(BYPASS_KEYWORDS)
+    ttl = INTENT_TTLS.get(intent, DEFAULT_TTL)
+    if ttl <= 0:
+        return 0.0
+    kinds = {m.intent for m in _bypass.scores(query)}
+    if "action" in kinds:
+        return 0.0
+    return min(ttl, LIVE_TTL) if "live" in kinds else ttl
+
+
+def response_scope(organization_id: Optional[str], user_id: Optional[object], agent: str) -> Scope:
+    return (organization_id or "", str(user_id or ""), agent)
+
+
+def cacheable(answer: Optional[str]) -> bool:
+    return bool(answer and answer.strip()) and not answer.lstrip().startswith(UNCACHEABLE_PREFIXES)
+
+
+@dataclass
+class _Entry:
+    query: str
+    answer: str
+    expires_at: float
+    vector: Optional[object] = None  # unit-norm float32 row
+
+
+class SemanticResponseCache:
+    def __init__(
+        self,
+        name: str,
+        embed: Optional[Embedder] = None,
+        similarity: float = 0.93,
+        max_scopes: int = 1000,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.name = name
+        self.embed = embed if np is not None else None
+        self.similarity = similarity
+        self.max_scopes = max_scopes
+        self._clock = clock
+        # scope -> entries (oldest first); scopes in LRU order
+        self._scopes: "OrderedDict[Scope, List[_Entry]]" = OrderedDict()
+        self._stats: Dict[str, int] = {"exact_hit": 0, "semantic_hit": 0, "miss": 0, "bypass": 0}
+
+    def _record(self, result: str):
+        self._stats[result] += 1
+        RESPONSE_CACHE_LOOKUPS.labels(cache=self.name, result=result).inc()
+        hits = self._stats["exact_hit"] + self._stats["semantic_hit"]
+        total = hits + self._stats["miss"]
+        RESPONSE_CACHE_HIT_RATIO.labels(cache=self.name).set(hits / total if total else 0.0)
+
+    def bypass(self):
+        """Count a lookup skipped because the query/intent isn't cacheable."""
+        self._record("bypass")
+
+    def _alive(self, scope: Scope) -> List[_Entry]:
+        entries = self._scopes.get(scope)
+        if not entries:
+            return []
+        now = self._clock()
+        alive = [e for e in entries if e.expires_at > now]
+        if len(alive) != len(entries):
+            if alive:
+                self._scopes[scope] = alive
+            else:
+                del self._scopes[scope]
+        return alive
+
+    async def _vector(self, text: str):
+        try:
+            vector = np.asarray((await self.embed([text]))[0], dtype=np.float32)
+        except Exception as e:
+            logger.debug(f"Response cache [{self.name}]: embedding failed ({e})")
+            return None
+        norm = float(np.linalg.norm(vector))
+        return vector / norm if norm > 0 else None
+
+    async def get(self, query: str, scope: Scope) -> Optional[str]:
+        entries = self._alive(scope)
+        normalized = normalize_text(query)
+        for entry in entries:
+            if entry.query == normalized:
+                self._scopes.move_to_end(scope)
+                self._record("exact_hit")
+                return entry.answer
+
+        if entries and self.embed is not None:
+            candidates = [e for e in entries if e.vector is not None]
+            vector = await self._vector(query) if candidates else None
+            if vector is not None:
+                scores = np.stack([e.vector for e in candidates]) @ vector
+                best = int(np.argmax(scores))
+                if float(scores[best]) >= self.similarity:
+                    self._scopes.move_to_end(scope)
+                    self._record("semantic_hit")
+                    logger.info(f"💾 Response cache [{self.name}]: '{query[:40]}' ≈ '{candidates[best].query[:40]}' ({float(scores[best]):.3f})")
+                    return candidates[best].answer
+
+        self._record("miss")
+        return None
+
+    async def put(self, query: str, scope: Scope, answer: str, ttl: float):
+        if ttl <= 0 or not cacheable(answer):
+            return
+        vector = await self._vector(query) if self.embed is not None else None
+        entries = self._alive(scope)
+        entries.append(_Entry(normalize_text(query), answer, self._clock() + ttl, vector))
+        self._scopes[scope] = entries[-MAX_PER_SCOPE:]
+        self._scopes.move_to_end(scope)
+        while len(self._scopes) > self.max_scopes:
+            self._scopes.popitem(last=False)
+
+    def stats(self) -> Dict[str, float]:
+        hits = self._stats["exact_hit"] + self._stats["semantic_hit"]
+        total = hits + self._stats["miss"]
+        return {
+            **self._stats,
+            "hit_ratio": round(hits / total, 3) if total else 0.0,
+            "scopes": len(self._scopes),
+            "entries": sum(len(e) for e in self._scopes.values()),
+        }
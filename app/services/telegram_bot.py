@@ -13,6 +13,7 @@ from telegram.ext import (
 from typing import Optional
 from loguru import logger
 from app.core.config import get_settings
+from app.utils.deadline import request_deadline
 import edge_tts
 
 settings = get_settings()
@@ -256,8 +257,11 @@ async def handle_multimodal(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
         ctx = {"userName": username, "source": "telegram", "user_id": user_id}
         
-        # Route through Aureon Cortex
-        answer_text = await aureon_cortex.route(text, context=ctx, attachments=attachments)
+        # Route through Aureon Cortex, bounded by the per-message budget
+        with request_deadline(settings.REQUEST_DEADLINE) as deadline:
+            answer_text = await aureon_cortex.route(text, context=ctx, attachments=attachments)
+        if deadline.skipped:
+            logger.warning(f"⏱️ Telegram {user_id}: etapas omitidas por deadline: {', '.join(deadline.skipped)}")
 
         # 4. Delete status message and reply with actual response
         if status_msg:
@@ -0,0 +1,237 @@
+"""
+Transcription Service - Groq Whisper over one pooled async HTTP client.
+
+- Voice notes are keyed by the SHA-256 of their bytes: the same note is
+  transcribed once (LRU) and concurrent requests for it share one upload
+  (SingleFlight), e.g. the router and the brain hedges asking at once.
+- Notes longer than TRANSCRIPTION_CHUNK_SECONDS are cut at silences (pydub)
+  and the pieces are transcribed in parallel, then stitched in order.
+  Without pydub/ffmpeg, or if decoding fails, the note goes up in one piece.
+- Every upload leases a Groq key from Hydra's "groq_whisper" pool (own
+  budget and breaker: voice notes must not starve or trip Groq chat) and is
+  capped by the request deadline.
+
+Failures return "" so text-only agents can still answer without the audio.
+"""
+import asyncio
+import hashlib
+import io
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+from loguru import logger
+
+from app.core.config import get_settings
+from app.core.metrics import TRANSCRIPTIONS
+from app.utils.hydra import get_pool
+from app.utils.deadline import timeout_for
+from app.utils.singleflight import SingleFlight
+
+try:
+    from pydub import AudioSegment
+    from pydub.silence import detect_silence
+except ImportError:  # optional: without it long notes are sent whole
+    AudioSegment = None
+    detect_silence = None
+
+settings = get_settings()
+
+GROQ_API_URL = "https://api.groq.com/openai/v1"
+WHISPER_MODEL = "whisper-large-v3"
+HTTP_TIMEOUT = httpx.Timeout(30.0, connect=5.0)
+HTTP_LIMITS = httpx.Limits(max_connections=10, max_keepalive_connections=5)
+
+# Silence detection: pauses of at least SILENCE_MS, SILENCE_DB below the note's loudness
+SILENCE_MS = 400
+SILENCE_DB = 16.0
+# Pieces shorter than this fraction of the target are not worth a cut
+MIN_CHUNK_FRACTION = 0.5
+# Notes smaller than chunk length at this bitrate (bytes/s) are sent without decoding them;
+# Telegram/WhatsApp voice notes are Opus at 16-32 kbps
+MIN_BYTES_PER_SECOND = 2000
+
+EXTENSIONS = {
+    "audio/ogg": "ogg",
+    "application/ogg": "ogg",
+    "audio/mpeg": "mp3",
+    "audio/mp4": "m4a",
+    "audio/x-m4a": "m4a",
+    "audio/wav": "wav",
+    "audio/x-wav": "wav",
+    "audio/webm": "webm",
+}
+
+
+def audio_key(audio: bytes) -> str:
+    return hashlib.sha256(audio).hexdigest()
+
+
+def _read_file(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def plan_chunks(
+    duration_ms: int,
+    silences: List[Tuple[int, int]],
+    chunk_ms: int,
+    min_chunk_ms: int,
+) -> List[Tuple[int, int]]:
+    """
+    (start, end) pieces of at most `chunk_ms`, cut in the middle of the last
+    silence that leaves at least `min_chunk_ms` behind; hard cut if there is none.
+    """
+    cuts = sorted((start + end) // 2 for start, end in silences)
+    pieces, start = [], 0
+    while duration_ms - start > chunk_ms:
+        limit = start + chunk_ms
+        end = limit
+        for cut in reversed(cuts):
+            if cut <= limit:
+                if cut - start >= min_chunk_ms:
+                    end = cut
+                break
+        pieces.append((start, end))
+        start = end
+    pieces.append((start, duration_ms))
+    return pieces
+
+
+def _split_audio(audio: bytes, fmt: str, chunk_ms: int) -> List[bytes]:
+    """Long note → list of encoded pieces (one element when it is short). CPU-bound: run in a thread."""
+    segment = AudioSegment.from_file(io.BytesIO(audio), format=fmt)
+    if len(segment) <= chunk_ms * 1.5:
+        return [audio]
+    silences = detect_silence(segment, min_silence_len=SILENCE_MS, silence_thresh=segment.dBFS - SILENCE_DB)
+    pieces = []
+    for start, end in plan_chunks(len(segment), silences, chunk_ms, int(chunk_ms * MIN_CHUNK_FRACTION)):
+        buffer = io.BytesIO()
+        segment[start:end].export(buffer, format="mp3", bitrate="64k")
+        pieces.append(buffer.getvalue())
+    return pieces
+
+
+class TranscriptionService:
+    def __init__(
+        self,
+        cache_size: int = 500,
+        chunk_seconds: float = 60.0,
+        max_parallel: int = 4,
+    ):
+        self.cache_size = cache_size
+        self.chunk_ms = int(chunk_seconds * 1000)
+        self.max_parallel = max_parallel
+        self._cache: "OrderedDict[str, str]" = OrderedDict()
+        self._flight = SingleFlight()
+        self._http: Optional[httpx.AsyncClient] = None
+        self._http_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._transport: Optional[httpx.AsyncBaseTransport] = None
+        self._stats: Dict[str, int] = {"hit": 0, "transcribed": 0, "failed": 0}
+
+    def _client(self) -> httpx.AsyncClient:
+        """Pooled AsyncClient for the Groq API, created per event loop."""
+        loop = asyncio.get_running_loop()
+        if self._http is None or self._http.is_closed or self._http_loop is not loop:
+            self._http = httpx.AsyncClient(
+                base_url=GROQ_API_URL,
+                timeout=HTTP_TIMEOUT,
+                limits=HTTP_LIMITS,
+                transport=self._transport,
+            )
+            self._http_loop = loop
+        return self._http
+
+    async def close(self):
+        """Release pooled connections (called on app shutdown)."""
+        if self._http is not None and not self._http.is_closed:
+            await self._http.aclose()
+        self._http = None
+
+    def _record(self, result: str):
+        self._stats[result] += 1
+        TRANSCRIPTIONS.labels(result=result).inc()
+
+    def stats(self) -> Dict[str, int]:
+        return {**self._stats, "size": len(self._cache)}
+
+    async def transcribe(self, audio: bytes, mime_type: str = "audio/ogg") -> str:
+        """Text of a voice note ("" if it could not be transcribed)."""
+        if not audio:
+            return ""
+        key = audio_key(audio)
+        text = self._cache.get(key)
+        if text is not None:
+            self._cache.move_to_end(key)
+            self._record("hit")
+            return text
+        return await self._flight.do(key, lambda: self._transcribe_new(key, audio, mime_type))
+
+    async def transcribe_file(self, path: str, mime_type: str = "audio/ogg") -> str:
+        try:
+            audio = await asyncio.to_thread(_read_file, path)
+        except OSError as e:
+            logger.error(f"❌ No se pudo leer el audio {path}: {e}")
+            return ""
+        return await self.transcribe(audio, mime_type)
+
+    async def _transcribe_new(self, key: str, audio: bytes, mime_type: str) -> str:
+        fmt = EXTENSIONS.get(mime_type.split(";")[0].strip(), "ogg")
+        pieces = [(audio, fmt)]
+        if AudioSegment is not None and len(audio) > self.chunk_ms * 1.5 / 1000 * MIN_BYTES_PER_SECOND:
+            try:
+                encoded = await asyncio.to_thread(_split_audio, audio, fmt, self.chunk_ms)
+                if len(encoded) > 1:
+                    pieces = [(piece, "mp3") for piece in encoded]
+            except Exception as e:
+                logger.warning(f"⚠️ No se pudo dividir el audio, se envía completo: {e}")
+
+        if len(pieces) > 1:
+            logger.info(f"✂️ Nota de voz larga: {len(pieces)} fragmentos en paralelo")
+        semaphore = asyncio.Semaphore(self.max_parallel)
+
+        async def run(piece: bytes, piece_fmt: str) -> Optional[str]:
+            async with semaphore:
+                return await self._upload(piece, piece_fmt)
+
+        texts = await asyncio.gather(*(run(piece, piece_fmt) for piece, piece_fmt in pieces))
+        if any(t is None for t in texts):
+            self._record("failed")
+            # Partial transcripts are better than nothing but must not be cached
+            return " ".join(t for t in texts if t)
+
+        text = " ".join(t for t in texts if t)
+        self._record("transcribed")
+        self._cache[key] = text
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        logger.info(f"👂 Audio Transcrito (Groq): {text[:50]}...")
+        return text
+
+    async def _upload(self, audio: bytes, fmt: str) -> Optional[str]:
+        """One Whisper call; None on failure."""
+        pool = get_pool("groq_whisper")
+        if not pool.keys:
+            logger.warning("🚫 Groq API Key missing for transcription.")
+            return None
+        try:
+            async with pool.lease(model=WHISPER_MODEL) as api_key:
+                response = await self._client().post(
+                    "/audio/transcriptions",
+                    headers={"Authorization": f"Bearer {api_key}"},
+                    files={"file": (f"voice.{fmt}", audio)},
+                    data={"model": WHISPER_MODEL, "response_format": "text"},
+                    timeout=timeout_for(HTTP_TIMEOUT.read, "whisper"),
+                )
+                response.raise_for_status()
+            return response.text.strip()
+        except Exception as e:
+            logger.error(f"❌ Error transcribiendo audio con Groq: {e}")
+            return None
+
+
+transcription_service = TranscriptionService(
+    cache_size=settings.TRANSCRIPTION_CACHE_SIZE,
+    chunk_seconds=settings.TRANSCRIPTION_CHUNK_SECONDS,
+    max_parallel=settings.TRANSCRIPTION_MAX_PARALLEL,
+)
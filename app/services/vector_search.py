@@ -1,91 +1,439 @@
-from typing import List, Dict, Any, Optional
-from supabase import create_client, Client
+from typing import List, Dict, Any, Optional, Set, Tuple
 from app.core.config import get_settings
-from app.utils.hydra import hydra_pool
+from app.utils.hydra import get_pool
+from app.utils.singleflight import SingleFlight
+from app.services.embedding_cache import EmbeddingCache, normalize_text
+from app.services.local_index import LocalVectorIndex
+from app.services.keyword_index import reciprocal_rank_fusion
 from google import genai
 from google.genai import types
 from loguru import logger
 import asyncio
+import httpx
+import time
+import os
 
 settings = get_settings()
 
+EMBEDDING_MODEL = "text-embedding-004"
+# Queries and documents must share one output_dimensionality (None = model default, 768)
+EMBEDDING_DIMENSIONS: Optional[int] = settings.EMBEDDING_DIMENSIONS
+EMBEDDING_CACHE_MODEL = f"{EMBEDDING_MODEL}@{EMBEDDING_DIMENSIONS}" if EMBEDDING_DIMENSIONS else EMBEDDING_MODEL
+EMBED_BATCH_SIZE = 100  # batchEmbedContents request limit
+EMBED_CONCURRENCY = 4
+EMBED_RETRIES = 3
+# Pooled PostgREST connections shared by every search/insert
+REST_TIMEOUT = httpx.Timeout(10.0, connect=5.0)
+REST_LIMITS = httpx.Limits(max_connections=20, max_keepalive_connections=10)
+REST_PAGE_SIZE = 1000  # PostgREST max-rows default
+MATCH_THRESHOLD = 0.5
+SEARCH_CACHE_MAX = 1000
+HYBRID_CANDIDATES = 20  # per ranking, before fusion
+RRF_K = 60
+
 class VectorSearchService:
     def __init__(self):
-        self.supabase: Client = create_client(settings.SUPABASE_URL, settings.SUPABASE_SERVICE_ROLE_KEY)
-        self._client: Optional[genai.Client] = None
-        self._current_key: Optional[str] = None
-
-    def _get_client(self) -> genai.Client:
-        """Get or create genai Client from hydra pool."""
-        active_key = hydra_pool.get_active_key() or settings.GEMINI_API_KEY
-        if not active_key:
-            raise ValueError("No GEMINI_API_KEY available for embeddings.")
-            
-        if self._client is None or self._current_key != active_key:
-            self._client = genai.Client(api_key=active_key)
-            self._current_key = active_key
-        return self._client
+        # Async PostgREST access (the sync supabase client would block the event loop)
+        self._http: Optional[httpx.AsyncClient] = None
+        self._http_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._transport: Optional[httpx.AsyncBaseTransport] = None
+        self._clients: Dict[str, genai.Client] = {}
+        self.embedding_cache = EmbeddingCache(
+            path=os.path.join(settings.CACHE_DIR, "embeddings.sqlite3"),
+            max_items=settings.EMBEDDING_CACHE_SIZE,
+            max_disk_items=settings.EMBEDDING_DISK_CACHE_SIZE,
+        )
+        # Identical concurrent searches share one call; repeats within the TTL are served from memory
+        self._search_flight = SingleFlight()
+        self._search_cache: Dict[Tuple, Tuple[float, List[Dict[str, Any]]]] = {}
+        self._org_generation: Dict[str, int] = {}
+        # Local mirror per org: BM25 always (loaded on first hybrid search), vectors only when enabled
+        vectors = settings.LOCAL_INDEX_ENABLED and LocalVectorIndex.available()
+        if settings.LOCAL_INDEX_ENABLED and not vectors:
+            logger.warning("⚠️ LOCAL_INDEX_ENABLED but numpy is not installed. Using match_documents RPC.")
+        self.local_index = LocalVectorIndex(
+            self._load_org_chunks,
+            ttl=settings.LOCAL_INDEX_TTL,
+            vectors=vectors,
+            quantize=settings.LOCAL_INDEX_QUANTIZE,
+            dim=EMBEDDING_DIMENSIONS,
+        )
 
-    async def get_embedding(self, text: str) -> List[float]:
-        """Generate embedding for the query string using Gemini 2.0 (text-embedding-004)."""
-        try:
-            client = self._get_client()
-            # Run in thread pool as google-genai is sync
-            loop = asyncio.get_event_loop()
-            result = await loop.run_in_executor(
-                None,
-                lambda: client.models.embed_content(
-                    model="text-embedding-004",
-                    contents=text,
-                    config=types.EmbedContentConfig(task_type="RETRIEVAL_QUERY")
-                )
+    def _client_for(self, key: str) -> genai.Client:
+        """Get or create the genai Client bound to a leased Hydra key."""
+        client = self._clients.get(key)
+        if client is None:
+            client = genai.Client(api_key=key)
+            self._clients[key] = client
+        return client
+
+    def _rest(self) -> httpx.AsyncClient:
+        """Pooled AsyncClient for Supabase PostgREST, created per event loop (scripts use asyncio.run)."""
+        loop = asyncio.get_running_loop()
+        if self._http is None or self._http.is_closed or self._http_loop is not loop:
+            key = settings.SUPABASE_SERVICE_ROLE_KEY
+            self._http = httpx.AsyncClient(
+                base_url=f"{settings.SUPABASE_URL.rstrip('/')}/rest/v1",
+                headers={
+                    "apikey": key,
+                    "Authorization": f"Bearer {key}",
+                    "Content-Type": "application/json",
+                },
+                timeout=REST_TIMEOUT,
+                limits=REST_LIMITS,
+                transport=self._transport,
             )
-            return result.embeddings[0].values
-        except Exception as e:
-            logger.error(f"❌ Error generating embedding: {e}")
-            # Try rotating key on failure
-            hydra_pool.rotate_key()
-            raise
+            self._http_loop = loop
+        return self._http
 
-    async def search(self, query: str, organization_id: str, limit: int = 5) -> List[Dict[str, Any]]:
-        """Perform vector search in Supabase document_chunks."""
-        try:
-            embedding = await self.get_embedding(query)
-            
-            # Call the match_documents RPC in Supabase
-            response = self.supabase.rpc(
-                'match_documents',
-                {
-                    'query_embedding': embedding,
-                    'match_threshold': 0.5,
-                    'match_count': limit,
-                    'filter_organization_id': organization_id
+    async def close(self):
+        """Release pooled connections (called on app shutdown)."""
+        if self._http is not None and not self._http.is_closed:
+            await self._http.aclose()
+        self._http = None
+
+    async def _embed_batch(self, texts: List[str], task_type: str) -> List[List[float]]:
+        """One Gemini call for up to EMBED_BATCH_SIZE texts (batchEmbedContents), retried on a fresh key."""
+        tokens = sum(len(t) for t in texts) // 4 + 1
+        for attempt in range(EMBED_RETRIES):
+            try:
+                async with get_pool("gemini_embedding").lease(tokens=tokens, fallback_key=settings.GEMINI_API_KEY, model=EMBEDDING_MODEL) as key:
+                    client = self._client_for(key)
+                    # Run in thread pool as google-genai is sync
+                    loop = asyncio.get_running_loop()
+                    result = await loop.run_in_executor(
+                        None,
+                        lambda: client.models.embed_content(
+                            model=EMBEDDING_MODEL,
+                            contents=texts,
+                            config=types.EmbedContentConfig(
+                                task_type=task_type,
+                                output_dimensionality=EMBEDDING_DIMENSIONS
+                            )
+                        )
+                    )
+                vectors = [list(e.values) for e in result.embeddings]
+            except Exception as e:
+                # The lease already reported the failure to Hydra; next attempt gets another key
+                logger.error(f"❌ Error generating embeddings ({len(texts)} texts, attempt {attempt + 1}): {e}")
+                if attempt == EMBED_RETRIES - 1:
+                    raise
+                continue
+            if len(vectors) != len(texts):
+                raise ValueError(f"Gemini returned {len(vectors)} embeddings for {len(texts)} texts")
+            if EMBEDDING_DIMENSIONS and any(len(v) != EMBEDDING_DIMENSIONS for v in vectors):
+                raise ValueError(f"Embedding dim {len(vectors[0])} != EMBEDDING_DIMENSIONS {EMBEDDING_DIMENSIONS}")
+            return vectors
+
+    async def embed_many(
+        self,
+        texts: List[str],
+        task_type: str = "RETRIEVAL_DOCUMENT",
+        concurrency: int = EMBED_CONCURRENCY,
+    ) -> List[List[float]]:
+        """
+        Embed many texts, returning vectors in input order.
+        Cached texts are skipped, duplicates are embedded once, and the rest are
+        packed into batches of EMBED_BATCH_SIZE run concurrently (bounded by `concurrency`).
+        """
+        results: List[Optional[List[float]]] = [None] * len(texts)
+        positions: Dict[str, List[int]] = {}
+        for i, text in enumerate(texts):
+            positions.setdefault(self.embedding_cache.make_key(EMBEDDING_CACHE_MODEL, task_type, text), []).append(i)
+        cached = await self.embedding_cache.aget_many(list(positions))
+        pending: Dict[str, List[int]] = {}
+        for cache_key, indexes in positions.items():
+            vector = cached.get(cache_key)
+            if vector is None:
+                pending[cache_key] = indexes
+                continue
+            for i in indexes:
+                results[i] = vector
+
+        keys = list(pending)
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+
+        async def run(batch: List[str]):
+            async with semaphore:
+                vectors = await self._embed_batch([texts[pending[k][0]] for k in batch], task_type)
+            await self.embedding_cache.aput_many(list(zip(batch, vectors)))
+            for cache_key, vector in zip(batch, vectors):
+                for i in pending[cache_key]:
+                    results[i] = vector
+
+        await asyncio.gather(*(run(keys[i:i + EMBED_BATCH_SIZE]) for i in range(0, len(keys), EMBED_BATCH_SIZE)))
+        if len(keys) > EMBED_BATCH_SIZE:
+            logger.info(f"🧮 Embedded {len(keys)} texts in {-(-len(keys) // EMBED_BATCH_SIZE)} batches ({len(texts) - len(keys)} cached)")
+        return results
+
+    async def get_embedding(self, text: str, task_type: str = "RETRIEVAL_QUERY") -> List[float]:
+        """
+        Generate embedding for the query string using Gemini 2.0 (text-embedding-004).
+        Served from the embedding cache when the same (model, task, text) was seen before.
+        """
+        return (await self.embed_many([text], task_type))[0]
+
+    async def _load_org_chunks(self, organization_id: str, with_embeddings: bool = True) -> List[Dict[str, Any]]:
+        """Every chunk of an org, paged through PostgREST. Bootstraps the local index."""
+        rows: List[Dict[str, Any]] = []
+        while True:
+            response = await self._rest().get(
+                "/document_chunks",
+                params={
+                    "select": "id,content,metadata,embedding" if with_embeddings else "id,content,metadata",
+                    "organization_id": f"eq.{organization_id}",
+                    "order": "id",
+                    "limit": REST_PAGE_SIZE,
+                    "offset": len(rows),
                 }
-            ).execute()
+            )
+            response.raise_for_status()
+            page = response.json() or []
+            rows.extend(page)
+            if len(page) < REST_PAGE_SIZE:
+                return rows
+
+    async def search(
+        self,
+        query: str,
+        organization_id: str,
+        limit: int = 5,
+        hybrid: Optional[bool] = None,
+        vector_weight: float = 1.0,
+        keyword_weight: float = 1.0,
+    ) -> List[Dict[str, Any]]:
+        """
+        Search document_chunks (local index when enabled, else the RPC).
+        hybrid=True fuses the vector ranking with a BM25 keyword ranking (RRF),
+        weighted by vector_weight / keyword_weight. Defaults to HYBRID_SEARCH.
+        """
+        hybrid = settings.HYBRID_SEARCH if hybrid is None else hybrid
+        key = (organization_id, normalize_text(query), limit, hybrid) + ((vector_weight, keyword_weight) if hybrid else ())
+        cached = self._search_cache.get(key)
+        if cached is not None:
+            expires, results = cached
+            if time.monotonic() < expires:
+                logger.info(f"🔎 V-Search (cached): {len(results)} chunks for org {organization_id}")
+                return list(results)
+            del self._search_cache[key]
+
+        if hybrid:
+            fn = lambda: self._hybrid_search(query, organization_id, limit, vector_weight, keyword_weight)
+        else:
+            fn = lambda: self._search(query, organization_id, limit)
 
-            results = response.data or []
-            logger.info(f"🔎 V-Search: Found {len(results)} chunks for org {organization_id}")
-            return results
+        generation = self._org_generation.get(organization_id, 0)
+        try:
+            results = await self._search_flight.do((key, generation), fn)
         except Exception as e:
             logger.error(f"❌ Error in vector search: {e}")
             return []
 
+        # Skip caching if a store_document for this org landed while we were searching
+        if settings.SEARCH_CACHE_TTL > 0 and self._org_generation.get(organization_id, 0) == generation:
+            self._prune_search_cache()
+            self._search_cache[key] = (time.monotonic() + settings.SEARCH_CACHE_TTL, results)
+        return list(results)
+
+    async def _search(self, query: str, organization_id: str, limit: int) -> List[Dict[str, Any]]:
+        embedding = await self.get_embedding(query)
+
+        if self.local_index.vectors:
+            try:
+                results = await self.local_index.search(embedding, organization_id, MATCH_THRESHOLD, limit)
+                logger.info(f"🔎 V-Search (local): Found {len(results)} chunks for org {organization_id}")
+                return results
+            except Exception as e:
+                logger.warning(f"⚠️ Local index unavailable, falling back to RPC: {e}")
+        
+        # Call the match_documents RPC in Supabase
+        response = await self._rest().post(
+            '/rpc/match_documents',
+            json={
+                'query_embedding': embedding,
+                'match_threshold': MATCH_THRESHOLD,
+                'match_count': limit,
+                'filter_organization_id': organization_id
+            }
+        )
+        response.raise_for_status()
+
+        results = response.json() or []
+        logger.info(f"🔎 V-Search: Found {len(results)} chunks for org {organization_id}")
+        return results
+
+    async def _hybrid_search(
+        self,
+        query: str,
+        organization_id: str,
+        limit: int,
+        vector_weight: float,
+        keyword_weight: float,
+    ) -> List[Dict[str, Any]]:
+        """Vector + BM25 candidates (HYBRID_CANDIDATES each), fused with reciprocal rank fusion."""
+        depth = max(limit, HYBRID_CANDIDATES)
+        vector_results, keyword_results = await asyncio.gather(
+            self._search(query, organization_id, depth),
+            self.local_index.keyword_search(query, organization_id, depth),
+        )
+
+        def identity(row: Dict[str, Any]):
+            return row.get("id") if row.get("id") is not None else row.get("content")
+
+        rows: Dict[Any, Dict[str, Any]] = {}
+        for row in keyword_results + vector_results:
+            rows[identity(row)] = {**rows.get(identity(row), {}), **row}
+        fused = reciprocal_rank_fusion(
+            [[identity(r) for r in vector_results], [identity(r) for r in keyword_results]],
+            [vector_weight, keyword_weight],
+            k=RRF_K,
+        )
+        results = [dict(rows[item], score=score) for item, score in fused[:limit]]
+        logger.info(
+            f"🔎 H-Search: {len(results)} chunks for org {organization_id} "
+            f"(vector {len(vector_results)}, keyword {len(keyword_results)})"
+        )
+        return results
+
+    def _prune_search_cache(self):
+        if len(self._search_cache) < SEARCH_CACHE_MAX:
+            return
+        now = time.monotonic()
+        for key in [k for k, (expires, _) in self._search_cache.items() if expires <= now]:
+            del self._search_cache[key]
+        while len(self._search_cache) >= SEARCH_CACHE_MAX:
+            # dicts keep insertion order: drop the oldest entry
+            del self._search_cache[next(iter(self._search_cache))]
+
+    def invalidate_search_cache(self, organization_id: str):
+        """Drop cached results for an org (its corpus changed)."""
+        self._org_generation[organization_id] = self._org_generation.get(organization_id, 0) + 1
+        for key in [k for k in self._search_cache if k[0] == organization_id]:
+            del self._search_cache[key]
+
     async def store_document(self, content: str, metadata: Dict[str, Any], organization_id: str) -> bool:
         """Store a document chunk with embedding."""
+        return await self.store_documents([{"content": content, "metadata": metadata}], organization_id) == 1
+
+    async def store_documents(self, documents: List[Dict[str, Any]], organization_id: str) -> int:
+        """
+        Embed (batched) and bulk-insert chunks given as {"content", "metadata"} dicts.
+        Returns the number of rows stored.
+        """
+        if not documents:
+            return 0
         try:
-            embedding = await self.get_embedding(content)
+            embeddings = await self.embed_many([d["content"] for d in documents], "RETRIEVAL_DOCUMENT")
             
-            data = {
-                "organization_id": organization_id,
-                "content": content,
-                "metadata": metadata,
-                "embedding": embedding
-            }
+            rows = [
+                {
+                    "organization_id": organization_id,
+                    "content": d["content"],
+                    "metadata": d.get("metadata", {}),
+                    "embedding": embedding
+                }
+                for d, embedding in zip(documents, embeddings)
+            ]
             
-            self.supabase.table("document_chunks").insert(data).execute()
-            return True
+            response = await self._rest().post(
+                "/document_chunks",
+                params={"select": "id"},
+                json=rows,
+                headers={"Prefer": "return=representation"}
+            )
+            response.raise_for_status()
+            self.invalidate_search_cache(organization_id)
+
+            # Keep the local mirror fresh with the ids Postgres assigned
+            for row, inserted in zip(rows, response.json() or []):
+                row["id"] = inserted.get("id")
+            self.local_index.add(organization_id, rows)
+            return len(rows)
         except Exception as e:
-            logger.error(f"❌ Error storing document: {e}")
-            return False
+            logger.error(f"❌ Error storing {len(documents)} documents: {e}")
+            return 0
+
+    async def source_hashes(self, source: str, organization_id: str) -> Set[str]:
+        """chunk_hash of every stored chunk that came from `source` (metadata.source)."""
+        hashes: Set[str] = set()
+        offset = 0
+        while True:
+            response = await self._rest().get(
+                "/document_chunks",
+                params={
+                    "select": "id,chunk_hash:metadata->>chunk_hash",
+                    "organization_id": f"eq.{organization_id}",
+                    "metadata->>source": f"eq.{source}",
+                    "order": "id",
+                    "limit": REST_PAGE_SIZE,
+                    "offset": offset,
+                }
+            )
+            response.raise_for_status()
+            page = response.json() or []
+            hashes.update(r["chunk_hash"] for r in page if r.get("chunk_hash"))
+            offset += len(page)
+            if len(page) < REST_PAGE_SIZE:
+                return hashes
+
+    async def blueprint_structures(self, organization_id: str) -> List[Tuple[str, Dict[str, Any]]]:
+        """(path, structure) of every n8n blueprint stored for an org (metadata.source / metadata.structure)."""
+        items: List[Tuple[str, Dict[str, Any]]] = []
+        offset = 0
+        while True:
+            response = await self._rest().get(
+                "/document_chunks",
+                params={
+                    "select": "id,source:metadata->>source,structure:metadata->structure",
+                    "organization_id": f"eq.{organization_id}",
+                    "metadata->>type": "eq.n8n_blueprint",
+                    "order": "id",
+                    "limit": REST_PAGE_SIZE,
+                    "offset": offset,
+                }
+            )
+            response.raise_for_status()
+            page = response.json() or []
+            items.extend((r["source"], r["structure"]) for r in page if r.get("source") and r.get("structure"))
+            offset += len(page)
+            if len(page) < REST_PAGE_SIZE:
+                return items
+
+    async def sync_source(self, source: str, documents: List[Dict[str, Any]], organization_id: str) -> Dict[str, int]:
+        """
+        Make the stored chunks of one source file equal `documents` (each with metadata.chunk_hash).
+        Only new chunks are embedded; new rows are inserted and vanished ones deleted in one
+        transaction by the sync_document_chunks RPC. An empty list removes the file.
+        """
+        stored = await self.source_hashes(source, organization_id)
+        current: Dict[str, Dict[str, Any]] = {}
+        for d in documents:
+            current.setdefault(d["metadata"]["chunk_hash"], d)
+        new_docs = [d for h, d in current.items() if h not in stored]
+        stale = stored - current.keys()
+        if not new_docs and not stale:
+            return {"inserted": 0, "deleted": 0}
+
+        embeddings = await self.embed_many([d["content"] for d in new_docs], "RETRIEVAL_DOCUMENT")
+        response = await self._rest().post(
+            "/rpc/sync_document_chunks",
+            json={
+                "p_organization_id": organization_id,
+                "p_source": source,
+                "p_keep_hashes": list(current),
+                "p_rows": [
+                    {"content": d["content"], "metadata": d["metadata"], "embedding": embedding}
+                    for d, embedding in zip(new_docs, embeddings)
+                ],
+            }
+        )
+        response.raise_for_status()
+        result = response.json() or {}
+
+        # Deletions can't be applied to the local mirror incrementally: reload it on next search
+        self.invalidate_search_cache(organization_id)
+        self.local_index.invalidate(organization_id)
+        logger.info(f"🔄 Sync {source}: +{result.get('inserted', 0)} / -{result.get('deleted', 0)} chunks")
+        return {"inserted": result.get("inserted", 0), "deleted": result.get("deleted", 0)}
 
 vector_search_service = VectorSearchService()
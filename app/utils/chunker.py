@@ -0,0 +1,214 @@
+"""
+Markdown Chunker - token-budgeted chunks that follow the heading hierarchy.
+
+1. The document is split into sections at markdown headings (code fences are
+   respected); every section knows its heading path, e.g.
+   ["ElevateOS", "Agentes", "Vox"].
+2. Small neighbouring sections are merged while they fit the budget, so we
+   don't embed one-line fragments.
+3. Oversized sections are cut at the best boundary before the budget
+   (paragraph > line > sentence > word), found with vectorized NumPy scans
+   over the code points instead of Python loops (str.rfind scans per piece
+   when NumPy isn't installed), and consecutive pieces share
+   `overlap_tokens` of context.
+
+Tokens are estimated as characters / chars_per_token (≈4 for Gemini on
+Spanish/English prose), which avoids shipping a tokenizer.
+"""
+import re
+from dataclasses import dataclass, field
+from typing import List, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # optional: boundaries are then found with str scans
+    np = None
+
+_HEADING = re.compile(r"^(#{1,6})[ \t]+(.+?)[ \t#]*$")
+_FENCE = re.compile(r"^[ \t]*(```|~~~)")
+
+_NL = ord("\n")
+if np is not None:
+    _SPACE = np.array([ord(c) for c in " \t\n"], dtype=np.uint32)
+    _SENTENCE_END = np.array([ord(c) for c in ".!?;:"], dtype=np.uint32)
+# Same boundaries as the arrays above, for the pure-Python path
+_SENTENCE = re.compile(r"[.!?;:][ \t\n]")
+_WHITESPACE = re.compile(r"[ \t\n]")
+
+
+@dataclass
+class Chunk:
+    text: str
+    heading_path: List[str] = field(default_factory=list)
+    tokens: int = 0
+
+
+@dataclass
+class _Section:
+    heading_path: List[str]
+    text: str
+
+
+def estimate_tokens(text: str, chars_per_token: float = 4.0) -> int:
+    return int(len(text) / chars_per_token + 0.5)
+
+
+def split_sections(text: str) -> List[_Section]:
+    """Sections at every markdown heading, each with the path of headings above it."""
+    sections: List[_Section] = []
+    path: List[Tuple[int, str]] = []
+    current: List[str] = []
+    in_fence = False
+
+    def close():
+        body = "".join(current).strip()
+        if body:
+            sections.append(_Section([title for _, title in path], body))
+
+    for line in text.splitlines(keepends=True):
+        if _FENCE.match(line):
+            in_fence = not in_fence
+        match = None if in_fence else _HEADING.match(line.rstrip("\n"))
+        if match:
+            close()
+            current = []
+            level = len(match.group(1))
+            while path and path[-1][0] >= level:
+                path.pop()
+            path.append((level, match.group(2).strip()))
+        current.append(line)
+    close()
+    return sections
+
+
+def _common_prefix(a: List[str], b: List[str]) -> List[str]:
+    prefix = []
+    for x, y in zip(a, b):
+        if x != y:
+            break
+        prefix.append(x)
+    return prefix
+
+
+class MarkdownChunker:
+    def __init__(self, max_tokens: int = 350, overlap_tokens: int = 40, chars_per_token: float = 4.0):
+        if overlap_tokens >= max_tokens:
+            raise ValueError("overlap_tokens must be smaller than max_tokens")
+        self.max_tokens = max_tokens
+        self.overlap_tokens = overlap_tokens
+        self.chars_per_token = chars_per_token
+        self.max_chars = int(max_tokens * chars_per_token)
+        self.overlap_chars = int(overlap_tokens * chars_per_token)
+
+    def chunk(self, text: str) -> List[Chunk]:
+        chunks: List[Chunk] = []
+        pending: List[_Section] = []
+        pending_len = 0
+
+        def flush():
+            nonlocal pending, pending_len
+            if pending:
+                path = pending[0].heading_path
+                for s in pending[1:]:
+                    path = _common_prefix(path, s.heading_path)
+                chunks.append(self._make("\n\n".join(s.text for s in pending), path))
+            pending, pending_len = [], 0
+
+        for section in split_sections(text):
+            size = len(section.text)
+            if size > self.max_chars:
+                flush()
+                chunks.extend(self._make(piece, section.heading_path) for piece in self._split(section.text))
+                continue
+            if pending_len + size + 2 > self.max_chars:
+                flush()
+            pending.append(section)
+            pending_len += size + 2
+        flush()
+        return chunks
+
+    def _make(self, text: str, heading_path: List[str]) -> Chunk:
+        return Chunk(text=text, heading_path=list(heading_path), tokens=estimate_tokens(text, self.chars_per_token))
+
+    def _split(self, text: str) -> List[str]:
+        """Cut an oversized section at the best boundary ≤ max_chars, with overlap."""
+        if np is None:
+            return self._split_plain(text)
+        codes = np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32)
+        n = len(codes)
+        newline = codes == _NL
+        space = np.isin(codes, _SPACE)
+        # Boundaries are positions where a new piece may start
+        paragraph = np.flatnonzero(newline[:-1] & newline[1:]) + 2
+        line = np.flatnonzero(newline) + 1
+        sentence = np.flatnonzero(np.isin(codes[:-1], _SENTENCE_END) & space[1:]) + 2
+        word = np.flatnonzero(space) + 1
+        tiers = [paragraph, line, sentence, word]
+        # Don't accept cuts that leave a piece under a third of the budget
+        min_chars = self.max_chars // 3
+
+        pieces: List[str] = []
+        start = 0
+        while start < n:
+            limit = start + self.max_chars
+            if limit >= n:
+                end = n
+            else:
+                end = limit  # hard cut if no boundary is usable
+                for tier in tiers:
+                    i = np.searchsorted(tier, limit, side="right") - 1
+                    if i >= 0 and tier[i] - start >= min_chars:
+                        end = int(tier[i])
+                        break
+            piece = text[start:end].strip()
+            if piece:
+                pieces.append(piece)
+            if end >= n:
+                break
+            # Next piece starts overlap_chars earlier, snapped forward to a word start
+            back = max(end - self.overlap_chars, start + 1)
+            i = np.searchsorted(word, back, side="left")
+            start = int(word[i]) if i < len(word) and word[i] < end else end
+        return pieces
+
+    def _split_plain(self, text: str) -> List[str]:
+        """_split without NumPy: the last boundary of each tier is searched backwards per piece."""
+        n = len(text)
+        min_chars = self.max_chars // 3
+
+        def after(found: int, width: int) -> int:
+            return found + width if found >= 0 else -1
+
+        def last_sentence(start: int, limit: int) -> int:
+            ends = [m.end() for m in _SENTENCE.finditer(text, start, limit)]
+            return ends[-1] if ends else -1
+
+        def last_word(start: int, limit: int) -> int:
+            return after(max(text.rfind(c, start, limit) for c in " \t\n"), 1)
+
+        pieces: List[str] = []
+        start = 0
+        while start < n:
+            limit = start + self.max_chars
+            if limit >= n:
+                end = n
+            else:
+                end = limit
+                for boundary in (
+                    after(text.rfind("\n\n", start, limit), 2),
+                    after(text.rfind("\n", start, limit), 1),
+                    last_sentence(start, limit),
+                    last_word(start, limit),
+                ):
+                    if boundary >= 0 and boundary - start >= min_chars:
+                        end = boundary
+                        break
+            piece = text[start:end].strip()
+            if piece:
+                pieces.append(piece)
+            if end >= n:
+                break
+            back = max(end - self.overlap_chars, start + 1)
+            space = _WHITESPACE.search(text, back - 1, end - 1)
+            start = space.end() if space else end
+        return pieces
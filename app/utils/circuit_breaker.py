@@ -0,0 +1,151 @@
+"""
+Circuit Breaker - stop calling a provider that is down.
+
+    closed ──(failure rate ≥ threshold over the last `window` calls)──▶ open
+    open ──(open_seconds elapsed: one probe let through)──▶ half_open
+    half_open ──probe ok──▶ closed  /  ──probe failed──▶ open (timer restarts)
+
+Every admitted call gets a ticket from `admit()` and hands it back to
+`record()`/`release()`. In half_open only the probe's ticket decides: a call
+that started before the circuit opened and finishes late is ignored.
+
+Hydra's provider pools check the breaker on every `lease()`, so every LLM
+call is counted, and the fallback chains skip open providers up front
+instead of waiting out their timeouts. Only provider-health failures count
+(5xx, timeouts, connection errors); rate limits and auth problems are
+per-key and stay Hydra's business.
+"""
+import os
+import time
+import itertools
+import threading
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Optional
+from loguru import logger
+
+from app.core.metrics import CIRCUIT_BREAKER_STATE, CIRCUIT_BREAKER_TRANSITIONS
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a provider whose circuit is open."""
+
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        name: str,
+        failure_rate: float = 0.5,
+        min_calls: int = 5,
+        window: int = 20,
+        open_seconds: float = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.open_seconds = open_seconds
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._outcomes: Deque[bool] = deque(maxlen=window)  # True = failure
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self._tickets = itertools.count(1)
+        self._probe: Optional[int] = None  # ticket of the half-open probe in flight
+        CIRCUIT_BREAKER_STATE.labels(provider=name).set(STATE_VALUES[CLOSED])
+
+    def _transition(self, state: str):
+        if state == self.state:
+            return
+        logger.warning(f"🔌 Circuito {self.name.upper()}: {self.state} → {state}")
+        self.state = state
+        if state == OPEN:
+            self.opened_at = self._clock()
+        if state == CLOSED:
+            self._outcomes.clear()
+        CIRCUIT_BREAKER_STATE.labels(provider=self.name).set(STATE_VALUES[state])
+        CIRCUIT_BREAKER_TRANSITIONS.labels(provider=self.name, state=state).inc()
+
+    def is_open(self) -> bool:
+        """True while calls are refused (open and not yet due for a probe, or a probe is in flight)."""
+        with self._lock:
+            if self.state == OPEN:
+                return self._clock() - self.opened_at < self.open_seconds
+            return self.state == HALF_OPEN and self._probe is not None
+
+    def admit(self) -> Optional[int]:
+        """Ticket for a call that may go through now, None if refused. In half-open only one probe at a time."""
+        with self._lock:
+            if self.state == CLOSED:
+                return next(self._tickets)
+            if self.state == OPEN:
+                if self._clock() - self.opened_at < self.open_seconds:
+                    return None
+                self._transition(HALF_OPEN)
+            if self._probe is not None:
+                return None
+            self._probe = next(self._tickets)
+            return self._probe
+
+    def record(self, failure: bool, ticket: Optional[int] = None):
+        with self._lock:
+            if self.state == HALF_OPEN:
+                if ticket is None or ticket != self._probe:
+                    return  # a straggler admitted before the circuit opened
+                self._probe = None
+                self._transition(OPEN if failure else CLOSED)
+                return
+            self._outcomes.append(failure)
+            if self.state == CLOSED and len(self._outcomes) >= self.min_calls:
+                if sum(self._outcomes) / len(self._outcomes) >= self.failure_rate:
+                    self._transition(OPEN)
+
+    def release(self, ticket: Optional[int] = None):
+        """The call ended without saying anything about provider health (cancelled, 4xx, 429)."""
+        with self._lock:
+            if ticket is not None and ticket == self._probe:
+                self._probe = None
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            failures = sum(self._outcomes)
+            snapshot = {
+                "state": self.state,
+                "recent_calls": len(self._outcomes),
+                "failure_rate": round(failures / len(self._outcomes), 3) if self._outcomes else 0.0,
+            }
+            if self.state == OPEN:
+                snapshot["retry_in_s"] = max(0, round(self.opened_at + self.open_seconds - self._clock(), 1))
+            return snapshot
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+
+
+def _config(name: str, default):
+    """Settings value; raw environment/default when Settings can't load (scripts, tests)."""
+    try:
+        from app.core.config import get_settings
+        return getattr(get_settings(), name)
+    except Exception:
+        return type(default)(os.getenv(name, default))
+
+
+def get_breaker(name: str) -> CircuitBreaker:
+    """Process-wide breaker for a provider (BREAKER_* settings)."""
+    breaker = _breakers.get(name)
+    if breaker is None:
+        breaker = _breakers.setdefault(name, CircuitBreaker(
+            name,
+            failure_rate=_config("BREAKER_FAILURE_RATE", 0.5),
+            min_calls=_config("BREAKER_MIN_CALLS", 5),
+            window=_config("BREAKER_WINDOW", 20),
+            open_seconds=_config("BREAKER_OPEN_SECONDS", 30.0),
+        ))
+    return breaker
+
+
+def breaker_states() -> Dict[str, Dict[str, Any]]:
+    return {name: b.snapshot() for name, b in sorted(_breakers.items())}
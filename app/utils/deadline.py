@@ -0,0 +1,118 @@
+"""
+Request Deadline - one time budget per incoming message, visible everywhere.
+
+The ingress (Telegram handler, /synapse/process, WhatsApp webhook) opens a
+scope; the deadline lives in a contextvar, so every coroutine and task
+spawned for the request sees it without threading it through arguments:
+
+    with request_deadline(45.0) as deadline:
+        answer = await aureon_cortex.route(...)
+    deadline.skipped  # stages dropped because the budget ran out
+
+Downstream code never invents its own worst case any more:
+
+    timeout=timeout_for(30.0)                      # httpx: min(30s, what's left)
+    await within(agent.run(...), "vox:gemini")     # LLM run / tool call bounded by the budget
+
+Without an active scope both behave exactly like the old fixed timeouts.
+"""
+import time
+import asyncio
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Awaitable, Iterator, List, Optional, TypeVar
+from loguru import logger
+
+T = TypeVar("T")
+
+# Don't start a network call with less than this left; it would only time out
+MIN_TIMEOUT = 0.25
+
+
+class DeadlineExceeded(Exception):
+    """The request budget ran out before (or while) running a stage."""
+
+
+class Deadline:
+    def __init__(self, seconds: float):
+        self.budget = seconds
+        self.expires_at = time.monotonic() + seconds
+        self.skipped: List[str] = []
+
+    def remaining(self) -> float:
+        return self.expires_at - time.monotonic()
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def skip(self, stage: str):
+        if stage not in self.skipped:
+            self.skipped.append(stage)
+            logger.warning(f"⏱️ Deadline: '{stage}' omitido ({max(0.0, self.remaining()):.1f}s restantes)")
+
+
+_current: ContextVar[Optional[Deadline]] = ContextVar("aureon_deadline", default=None)
+
+
+@contextmanager
+def request_deadline(seconds: float) -> Iterator[Deadline]:
+    """Budget for everything awaited inside the block (nested scopes can only shrink it)."""
+    deadline = Deadline(seconds)
+    outer = _current.get()
+    if outer is not None and outer.expires_at < deadline.expires_at:
+        deadline.expires_at = outer.expires_at
+    token = _current.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current.reset(token)
+        if outer is not None:
+            outer.skipped.extend(s for s in deadline.skipped if s not in outer.skipped)
+
+
+def current_deadline() -> Optional[Deadline]:
+    return _current.get()
+
+
+def remaining(default: Optional[float] = None) -> Optional[float]:
+    """Seconds left in the request budget, or `default` outside a request."""
+    deadline = _current.get()
+    return deadline.remaining() if deadline is not None else default
+
+
+def timeout_for(cap: float, stage: Optional[str] = None) -> float:
+    """Timeout for one call: min(cap, budget left). Raises if there's no usable time left."""
+    deadline = _current.get()
+    if deadline is None:
+        return cap
+    left = deadline.remaining()
+    if left < MIN_TIMEOUT:
+        if stage:
+            deadline.skip(stage)
+        raise DeadlineExceeded(f"{stage or 'call'}: request deadline exhausted")
+    return min(cap, left)
+
+
+async def within(aw: Awaitable[T], stage: str, cap: Optional[float] = None) -> T:
+    """
+    Await `aw` bounded by the remaining budget (and `cap`, if given).
+    A stage that can't start or is cut by the budget is recorded as skipped
+    and raises DeadlineExceeded; hitting `cap` raises the usual TimeoutError.
+    """
+    deadline = _current.get()
+    left = deadline.remaining() if deadline is not None else None
+    if left is not None and left < MIN_TIMEOUT:
+        if asyncio.iscoroutine(aw):
+            aw.close()  # never started: avoid "coroutine was never awaited"
+        deadline.skip(stage)
+        raise DeadlineExceeded(f"{stage}: request deadline exhausted")
+    if left is None and cap is None:
+        return await aw
+    budget_bound = cap is None or (left is not None and left < cap)
+    try:
+        return await asyncio.wait_for(aw, timeout=left if budget_bound else cap)
+    except asyncio.TimeoutError:
+        if not budget_bound:
+            raise
+        deadline.skip(stage)
+        raise DeadlineExceeded(f"{stage}: cut by the request deadline") from None
@@ -0,0 +1,199 @@
+"""
+Hedged requests - race the next provider when the current one is slow.
+
+`hedged` walks a fallback chain like the old sequential loops did, with one
+difference: if the newest attempt hasn't answered after its provider's
+latency percentile (LatencyTracker), the next provider starts in parallel.
+The first success wins and the rest are cancelled. A failure starts the next
+provider immediately, exactly like a plain fallback. Under a request
+deadline (app/utils/deadline.py) the whole chain stops when the budget runs
+out; attempts that never got to start are reported as skipped.
+
+Hedging duplicates work only for the slowest ~(100 - percentile)% of calls,
+and only work without side effects: code that writes (Notion pages, n8n
+webhooks, MCP tools) calls `claim_side_effects()` first. The first attempt to
+claim owns the race: the other attempts in flight are cancelled and from then
+on the chain is sequential (no hedges), so a write never runs in two attempts
+at once. If the owner then fails, the next provider runs alone, as in the old
+fallback loop.
+"""
+import time
+import asyncio
+from collections import deque
+from contextvars import ContextVar
+from typing import Awaitable, Callable, Deque, Dict, List, Optional, Sequence, Tuple, TypeVar
+from loguru import logger
+
+from app.core.metrics import HEDGED_REQUESTS
+from app.utils.deadline import DeadlineExceeded, current_deadline
+
+T = TypeVar("T")
+
+# (name, zero-arg coroutine factory); name keys the latency history
+Attempt = Tuple[str, Callable[[], Awaitable[T]]]
+
+LATENCY_WINDOW = 200  # successful latencies kept per name
+MIN_SAMPLES = 20  # below this the default delay is used
+
+
+class HedgeConflict(RuntimeError):
+    """Another attempt of the same hedged() call already ran a side effect."""
+
+
+class _Race:
+    """State shared by the attempts of one hedged() call."""
+
+    def __init__(self, scope: str, pending: Dict[asyncio.Task, Tuple[str, bool, float]]):
+        self.scope = scope
+        self.pending = pending
+        self.owner: Optional[str] = None  # attempt running side effects now
+        self.acted = False  # some attempt wrote: no more hedges
+
+
+# (race, attempt name) seen by the code an attempt runs (tasks copy the context)
+_current: ContextVar[Optional[Tuple[_Race, str]]] = ContextVar("hedge_attempt", default=None)
+
+
+def claim_side_effects(action: str):
+    """
+    Call right before a write. Inside a hedged() attempt the first caller
+    owns the race and the other attempts are cancelled; a no-op elsewhere.
+    Raises HedgeConflict if another attempt owns it.
+    """
+    current = _current.get()
+    if current is None:
+        return
+    race, name = current
+    if race.owner == name:
+        return
+    if race.owner is not None:
+        raise HedgeConflict(f"[{race.scope}] {race.owner.upper()} ya está ejecutando acciones")
+    race.owner = name
+    race.acted = True
+    for task, (other, _, _) in race.pending.items():
+        if other != name:
+            task.cancel()
+    logger.info(f"✍️ Hedge [{race.scope}]: {name.upper()} ejecuta '{action}', la cadena sigue en secuencia")
+
+
+class LatencyTracker:
+    """Rolling window of successful latencies per name; hedge delay = a percentile of it."""
+
+    def __init__(
+        self,
+        percentile: float = 95.0,
+        default_delay: float = 8.0,
+        min_delay: float = 0.5,
+        max_delay: float = 30.0,
+    ):
+        self.percentile = percentile
+        self.default_delay = default_delay
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self._samples: Dict[str, Deque[float]] = {}
+
+    def observe(self, name: str, latency: float):
+        self._samples.setdefault(name, deque(maxlen=LATENCY_WINDOW)).append(latency)
+
+    def delay(self, name: str) -> float:
+        samples = self._samples.get(name)
+        if not samples or len(samples) < MIN_SAMPLES:
+            return self.default_delay
+        ordered = sorted(samples)
+        value = ordered[min(len(ordered) - 1, int(len(ordered) * self.percentile / 100.0))]
+        return min(self.max_delay, max(self.min_delay, value))
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        return {name: {"samples": len(s), "hedge_delay_s": round(self.delay(name), 3)} for name, s in self._samples.items()}
+
+
+async def hedged(
+    attempts: Sequence[Attempt],
+    tracker: LatencyTracker,
+    scope: str,
+    max_inflight: int = 2,
+    enabled: bool = True,
+) -> T:
+    """
+    Result of the first attempt to succeed. Raises the last error if all fail.
+    enabled=False degrades to the plain sequential fallback.
+    """
+    if not attempts:
+        raise ValueError("hedged() needs at least one attempt")
+    pending: Dict[asyncio.Task, Tuple[str, bool, float]] = {}
+    race = _Race(scope, pending)
+    next_index = 0
+    last_error: Optional[BaseException] = None
+    newest: Tuple[str, float] = ("", 0.0)
+
+    def launch(hedge: bool):
+        nonlocal next_index, newest
+        name, factory = attempts[next_index]
+        next_index += 1
+        started = time.monotonic()
+        token = _current.set((race, name))
+        try:
+            pending[asyncio.ensure_future(factory())] = (name, hedge, started)
+        finally:
+            _current.reset(token)
+        newest = (name, started)
+        if hedge:
+            HEDGED_REQUESTS.labels(scope=scope, event="fired").inc()
+            logger.info(f"🏁 Hedge [{scope}]: {name.upper()} arranca en paralelo")
+
+    deadline = current_deadline()
+    try:
+        launch(hedge=False)
+        while pending:
+            timeout = None
+            if enabled and not race.acted and next_index < len(attempts) and len(pending) < max_inflight:
+                timeout = max(0.0, newest[1] + tracker.delay(newest[0]) - time.monotonic())
+            if deadline is not None:
+                left = max(0.0, deadline.remaining())
+                timeout = left if timeout is None else min(timeout, left)
+            done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                if deadline is not None and deadline.expired():
+                    for name, _, _ in pending.values():
+                        deadline.skip(name)
+                    for name, _ in attempts[next_index:]:
+                        deadline.skip(name)
+                    raise DeadlineExceeded(f"[{scope}] request deadline reached")
+                # Woke up on the deadline timeout without it having expired yet: only
+                # hedge when nothing wrote yet and there is an attempt left and room for it
+                if enabled and not race.acted and next_index < len(attempts) and len(pending) < max_inflight:
+                    launch(hedge=True)
+                continue
+            failed: List[str] = []
+            for task in done:
+                name, hedge, started = pending.pop(task)
+                if race.owner == name:
+                    race.owner = None
+                if task.cancelled():
+                    failed.append(name)
+                    continue
+                error = task.exception()
+                if error is None:
+                    tracker.observe(name, time.monotonic() - started)
+                    if hedge:
+                        HEDGED_REQUESTS.labels(scope=scope, event="won").inc()
+                        logger.info(f"🏆 Hedge [{scope}]: {name.upper()} ganó la carrera")
+                    return task.result()
+                last_error = error
+                failed.append(name)
+                logger.warning(f"⚠️ [{scope}] {name.upper()} falló: {error}")
+            # A failure moves down the chain right away (plain fallback)
+            while failed and next_index < len(attempts) and len(pending) < (1 if race.acted else max(1, max_inflight)):
+                failed.pop()
+                if deadline is not None and deadline.expired():
+                    break
+                launch(hedge=False)
+        if deadline is not None and deadline.expired():
+            for name, _ in attempts[next_index:]:
+                deadline.skip(name)
+        raise last_error or RuntimeError(f"[{scope}] all attempts failed")
+    finally:
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
@@ -1,117 +1,696 @@
 """
-Hydra Pool v2.0 - Intelligent API Key Management
-Exponential backoff, fail tracking, emergency reset
+Hydra Pool v3.0 - Intelligent API Key Management
+One pool per provider (Gemini, Mistral, Groq, OpenAI, DeepSeek).
+Token-bucket quotas per key, heap-based O(log n) selection,
+async key leases with in-flight limits, EWMA latency/error scoring
+per key and per model, exponential backoff, fail tracking
+(optionally shared across workers), emergency reset
 """
 import os
 import json
 import time
-from typing import List, Optional
+import heapq
+import random
+import asyncio
+import itertools
+import threading
+from collections import deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Deque, List, Optional, Dict, Set, Tuple
 from loguru import logger
+from app.utils.hydra_state import StateBusy, key_id, make_state_backend
+from app.utils.circuit_breaker import CircuitBreaker, CircuitOpenError, get_breaker
+from app.utils.deadline import DeadlineExceeded, remaining
+
+
+# Per-key budgets (Gemini free tier defaults). Override via env.
+KEY_RPM = float(os.getenv("HYDRA_KEY_RPM", "15"))
+KEY_TPM = float(os.getenv("HYDRA_KEY_TPM", "1000000"))
+
+# provider -> (pool setting, primary key setting)
+PROVIDER_KEYS = {
+    "gemini": ("VITE_GEMINI_KEY_POOL", "GEMINI_API_KEY"),
+    "mistral": ("MISTRAL_KEY_POOL", "MISTRAL_API_KEY"),
+    "groq": ("GROQ_KEY_POOL", "GROQ_API_KEY"),
+    "openai": ("OPENAI_KEY_POOL", "OPENAI_API_KEY"),
+    "deepseek": ("DEEPSEEK_KEY_POOL", "DEEPSEEK_API_KEY"),
+}
+# Pools that reuse another provider's keys under their own quota. Gemini limits
+# are per model, so embeddings must not drain the Flash bucket (and a 429 on one
+# says nothing about the other: their cooldowns are tracked apart too).
+SHARED_KEY_POOLS = {"gemini_embedding": "gemini", "groq_whisper": "groq"}
+# Default (RPM, TPM) per key for non-Gemini providers. Override with HYDRA_<PROVIDER>_RPM/_TPM.
+PROVIDER_BUDGETS = {
+    "mistral": (60, 500000),
+    "groq": (30, 12000),
+    "openai": (500, 200000),
+    "deepseek": (60, 1000000),
+    "gemini_embedding": (1500, 1000000),  # text-embedding-004 free tier
+    "groq_whisper": (20, 1000000),  # whisper-large-v3 free tier: limited by requests, not tokens
+}
+# Token estimate charged per request when the caller doesn't know better.
+REQUEST_TOKENS = int(os.getenv("HYDRA_REQUEST_TOKENS", "1000"))
+# Concurrent leases allowed per key and how long a lease may wait for one.
+KEY_MAX_INFLIGHT = int(os.getenv("HYDRA_KEY_MAX_INFLIGHT", "4"))
+LEASE_TIMEOUT = float(os.getenv("HYDRA_LEASE_TIMEOUT", "10"))
+# Latency/error scoring: EWMA smoothing, share of picks spent exploring
+# non-best keys/models, and how much an error rate of 1.0 inflates latency.
+EWMA_ALPHA = float(os.getenv("HYDRA_EWMA_ALPHA", "0.2"))
+EXPLORE_RATE = float(os.getenv("HYDRA_EXPLORE_RATE", "0.05"))
+ERROR_PENALTY = float(os.getenv("HYDRA_ERROR_PENALTY", "4"))
+
+# Failure classes that say something about the key vs. about the model.
+KEY_FAULTS = {"rate_limit", "auth", "server", "timeout", "error"}
+MODEL_FAULTS = {"client", "server", "timeout", "error"}
+# ...and the ones that say the provider itself is unhealthy (circuit breaker)
+PROVIDER_FAULTS = {"server", "timeout", "error"}
+# Outcomes that say nothing about key, model or provider (caller gave up)
+NEUTRAL_OUTCOMES = {"cancelled", "deadline"}
+# Backoff between attempts to publish a health update the shared backend was too busy to take
+STATE_RETRY_DELAYS = (0.05, 0.25, 1.0)
+
+
+def _setting(name: str) -> Optional[str]:
+    """Read from Settings (env + .env.cortex), falling back to the raw environment."""
+    try:
+        from app.core.config import get_settings
+        value = getattr(get_settings(), name, None)
+    except Exception:
+        value = None
+    return value if value else os.getenv(name)
+
+
+def provider_budget(provider: str) -> Tuple[float, float]:
+    rpm, tpm = PROVIDER_BUDGETS.get(provider, (KEY_RPM, KEY_TPM))
+    prefix = f"HYDRA_{provider.upper()}"
+    return float(os.getenv(f"{prefix}_RPM", rpm)), float(os.getenv(f"{prefix}_TPM", tpm))
+
+
+class HydraExhausted(RuntimeError):
+    """No key could be leased before the timeout (every key saturated or pool empty)."""
+
+
+def classify_failure(exc: BaseException) -> Tuple[str, int]:
+    """Map a provider exception to (failure_class, status_code)."""
+    if isinstance(exc, asyncio.CancelledError):
+        return "cancelled", 499
+    if isinstance(exc, DeadlineExceeded):
+        return "deadline", 504
+
+    status = getattr(exc, "status_code", None)
+    if not isinstance(status, int):
+        status = getattr(exc, "code", None)
+    if not isinstance(status, int):
+        status = getattr(getattr(exc, "response", None), "status_code", None)
+
+    text = str(exc)
+    if status == 429 or "429" in text or "RESOURCE_EXHAUSTED" in text:
+        return "rate_limit", 429
+    if isinstance(exc, (asyncio.TimeoutError, TimeoutError)) or "Timeout" in type(exc).__name__:
+        return "timeout", 504
+    if isinstance(status, int):
+        if status in (401, 403):
+            return "auth", status
+        if 400 <= status < 500:
+            return "client", status
+        if status >= 500:
+            return "server", status
+    return "error", 500
+
+
+@dataclass
+class TokenBucket:
+    """Classic token bucket. `level` may go negative when a key is borrowed past its budget."""
+    capacity: float
+    rate: float  # tokens per second
+    level: float
+    stamp: float
+
+    @classmethod
+    def per_minute(cls, limit: float, now: float) -> "TokenBucket":
+        return cls(capacity=limit, rate=limit / 60.0, level=limit, stamp=now)
+
+    def _refill(self, now: float):
+        if now > self.stamp:
+            self.level = min(self.capacity, self.level + (now - self.stamp) * self.rate)
+            self.stamp = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until `amount` tokens are available (0 if available now)."""
+        self._refill(now)
+        deficit = min(amount, self.capacity) - self.level
+        if deficit <= 0 or self.rate <= 0:
+            return 0.0
+        return deficit / self.rate
+
+    def consume(self, amount: float, now: float):
+        self._refill(now)
+        self.level -= amount
+
+
+@dataclass
+class Ewma:
+    """Exponentially weighted moving average of latency (s) and error rate (0..1)."""
+    latency: float = 0.0
+    error_rate: float = 0.0
+    samples: int = 0
+
+    def observe(self, latency: Optional[float], error: bool):
+        if latency is not None:
+            self.latency = latency if self.samples == 0 else self.latency + EWMA_ALPHA * (latency - self.latency)
+        self.error_rate += EWMA_ALPHA * ((1.0 if error else 0.0) - self.error_rate)
+        self.samples += 1
+
+    def cost(self) -> float:
+        """Expected latency inflated by error rate. Unseen entries cost 0 so they get tried first."""
+        return self.latency * (1.0 + ERROR_PENALTY * self.error_rate)
+
+
+@dataclass
+class KeyState:
+    """Runtime state of a single API key."""
+    key: str
+    key_id: str
+    rpm: TokenBucket
+    tpm: TokenBucket
+    cooldown: float = 0.0
+    fails: int = 0
+    version: int = 0
+    inflight: int = 0
+    successes: int = 0
+    failures: Dict[str, int] = field(default_factory=dict)
+    stats: Ewma = field(default_factory=Ewma)
+
+    def ready_at(self, now: float, tokens: int = REQUEST_TOKENS) -> float:
+        """Earliest moment this key can serve a request without tripping its quota."""
+        budget_wait = max(self.rpm.wait_time(1, now), self.tpm.wait_time(tokens, now))
+        return max(self.cooldown, now + budget_wait)
+
+    def score(self) -> Tuple:
+        """Ordering among keys that are ready right now: healthy first, then fastest."""
+        return (self.fails, self.stats.cost())
 
 
 class HydraPool:
     """
-    Gestor inteligente de llaves API con rotación agresiva 
+    Gestor inteligente de llaves API con rotación agresiva
     ante errores 429 (Rate Limit).
+
+    Cada llave tiene un presupuesto RPM/TPM (token bucket). Las llaves viven en
+    dos heaps: `_ready` (ordenado por score de fallos) y `_waiting` (ordenado por
+    el instante en que vuelven a tener cuota). Elegir una llave es O(log n) y
+    evita el 429 en lugar de reaccionar a él.
+
+    Uso recomendado:
+        async with hydra_pool.lease() as key:
+            ...
+    El lease limita las peticiones simultáneas por llave, espera en orden FIFO
+    cuando todas están saturadas y registra éxito, tipo de fallo y latencia.
+
+    Entre las llaves listas gana la más sana y rápida (EWMA de latencia y tasa
+    de error); un pequeño porcentaje de selecciones explora otras llaves para
+    que las recuperadas vuelvan a recibir tráfico. `rank_models()` aplica el
+    mismo criterio a la cadena de modelos.
+
+    Cooldowns y fallos pasan por un backend de estado (memoria por defecto,
+    SQLite WAL compartido entre workers con HYDRA_STATE_BACKEND=sqlite).
+    Los token buckets siguen siendo locales a cada proceso.
     """
-    _instance = None
+    _pools: Dict[str, "HydraPool"] = {}
+
+    def __init__(
+        self,
+        keys: Optional[List[str]] = None,
+        backend=None,
+        provider: str = "gemini",
+        breaker: Optional[CircuitBreaker] = None,
+    ):
+        self.provider = provider
+        self.breaker = breaker
+        self.keys: List[KeyState] = []
+        self._by_key: Dict[str, KeyState] = {}
+        self._by_id: Dict[str, KeyState] = {}
+        self._backend = backend or make_state_backend()
+        self._ready: List[tuple] = []
+        self._waiting: List[tuple] = []
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self._waiters: Deque[asyncio.Event] = deque()
+        self._models: Dict[str, Ewma] = {}
+        self._publishing: Set[asyncio.Task] = set()
+        if keys is None:
+            self._load_keys()
+        else:
+            self._set_keys(keys)
 
-    def __init__(self):
-        self.keys: List[dict] = []
-        self._load_keys()
-    
     def _load_keys(self):
-        """Load keys from environment."""
-        pool_json = os.getenv("VITE_GEMINI_KEY_POOL", "[]")
-        
+        """Load keys for this provider from settings/environment."""
+        pool_name, primary_name = PROVIDER_KEYS.get(
+            SHARED_KEY_POOLS.get(self.provider, self.provider), (f"{self.provider.upper()}_KEY_POOL", f"{self.provider.upper()}_API_KEY")
+        )
+        label = self.provider.upper()
+        pool_json = (_setting(pool_name) or "[]").strip()
+
         # Clean up potential quoting issues from .env files
         if pool_json.startswith("'") and pool_json.endswith("'"):
             pool_json = pool_json[1:-1]
         elif pool_json.startswith('"') and pool_json.endswith('"'):
             pool_json = pool_json[1:-1]
-            
+
+        raw_keys: List[str] = []
         try:
-            raw_keys = json.loads(pool_json)
-            self.keys = [{"key": k, "cooldown": 0, "fails": 0} for k in raw_keys]
-            logger.info(f"✅ Hydra: Loaded {len(self.keys)} keys from pool.")
+            raw_keys = list(json.loads(pool_json))
+            if raw_keys:
+                logger.info(f"✅ Hydra[{label}]: Loaded {len(raw_keys)} keys from pool.")
         except Exception as e:
-            logger.error(f"Hydra: Error parsing GEMINI_KEY_POOL: {e}. Raw: {pool_json[:20]}...")
-            self.keys = []
-        
+            logger.error(f"Hydra[{label}]: Error parsing {pool_name}: {e}. Raw: {pool_json[:20]}...")
+
         # Add the primary key if not in pool
-        primary_key = os.getenv("GEMINI_API_KEY")
+        primary_key = _setting(primary_name)
         if primary_key:
             primary_key = primary_key.strip("'").strip('"')
-            if not any(k["key"] == primary_key for k in self.keys):
-                self.keys.insert(0, {"key": primary_key, "cooldown": 0, "fails": 0})
-                logger.info("🔑 Hydra: Added primary GEMINI_API_KEY to pool.")
-            
+            if primary_key not in raw_keys:
+                raw_keys.insert(0, primary_key)
+                logger.info(f"🔑 Hydra[{label}]: Added primary {primary_name} to pool.")
+
+        self._set_keys(raw_keys)
         if not self.keys:
-            logger.warning("Hydra: No API keys found in pool or GEMINI_API_KEY!")
+            logger.warning(f"Hydra[{label}]: No API keys found in {pool_name} or {primary_name}!")
+
+    def _set_keys(self, raw_keys: List[str]):
+        now = time.time()
+        rpm, tpm = provider_budget(self.provider)
+        self.keys = []
+        self._by_key = {}
+        self._by_id = {}
+        for k in raw_keys:
+            if not k or k in self._by_key:
+                continue
+            state = KeyState(
+                key=k,
+                key_id=key_id(f"{self.provider}:{k}" if self.provider in SHARED_KEY_POOLS else k),
+                rpm=TokenBucket.per_minute(rpm, now),
+                tpm=TokenBucket.per_minute(tpm, now),
+            )
+            self.keys.append(state)
+            self._by_key[k] = state
+            self._by_id[state.key_id] = state
+        self._sync()
+        self._rebuild(now)
+
+    @classmethod
+    def for_provider(cls, provider: str) -> "HydraPool":
+        """Process-wide pool for a provider (created on first use)."""
+        pool = cls._pools.get(provider)
+        if pool is None:
+            pool = cls._pools[provider] = HydraPool(provider=provider, breaker=get_breaker(provider))
+        return pool
 
     @classmethod
     def get_instance(cls):
-        if cls._instance is None:
-            cls._instance = HydraPool()
-        return cls._instance
+        return cls.for_provider("gemini")
 
-    def get_active_key(self) -> Optional[str]:
-        """Returns the next available key that is not in cooldown."""
-        if not self.keys:
+    # --- Heap bookkeeping (call with self._lock held) ---
+
+    def _schedule(self, state: KeyState, now: float):
+        """(Re)insert a key in the right heap. Older entries become stale via `version`."""
+        state.version += 1
+        if state.inflight >= KEY_MAX_INFLIGHT:
+            # Saturated keys stay out of both heaps until a lease is released.
+            return
+        ready_at = state.ready_at(now)
+        if ready_at <= now:
+            heapq.heappush(self._ready, (state.score(), next(self._seq), state.version, state))
+        else:
+            heapq.heappush(self._waiting, (ready_at, next(self._seq), state.version, state))
+
+        # Lazy deletion leaves stale entries behind; compact when they pile up.
+        if len(self._ready) + len(self._waiting) > 4 * len(self.keys) + 16:
+            self._rebuild(now)
+
+    def _rebuild(self, now: float):
+        self._ready, self._waiting = [], []
+        for state in self.keys:
+            state.version += 1
+            if state.inflight >= KEY_MAX_INFLIGHT:
+                continue
+            ready_at = state.ready_at(now)
+            if ready_at <= now:
+                self._ready.append((state.score(), next(self._seq), state.version, state))
+            else:
+                self._waiting.append((ready_at, next(self._seq), state.version, state))
+        heapq.heapify(self._ready)
+        heapq.heapify(self._waiting)
+
+    def _promote(self, now: float):
+        """Move keys whose quota/cooldown has expired from `_waiting` to `_ready`."""
+        while self._waiting and self._waiting[0][0] <= now:
+            _, _, version, state = heapq.heappop(self._waiting)
+            if version == state.version:
+                heapq.heappush(self._ready, (state.score(), next(self._seq), state.version, state))
+
+    @staticmethod
+    def _pop_valid(heap: List[tuple]) -> Optional[KeyState]:
+        while heap:
+            _, _, version, state = heapq.heappop(heap)
+            if version == state.version:
+                return state
+        return None
+
+    @staticmethod
+    def _peek_valid(heap: List[tuple]) -> Optional[tuple]:
+        while heap and heap[0][2] != heap[0][3].version:
+            heapq.heappop(heap)
+        return heap[0] if heap else None
+
+    def _pop_explore(self) -> Optional[KeyState]:
+        """A random ready key instead of the best one. Its heap entry goes stale on reschedule."""
+        if len(self._ready) < 2:
             return None
-        
+        _, _, version, state = random.choice(self._ready)
+        return state if version == state.version else None
+
+    def _sync(self):
+        """Adopt cooldowns/fails that other workers published to the shared backend."""
+        snapshot = self._backend.poll()
+        if not snapshot:
+            return
         now = time.time()
-        
-        # Filter keys that are not in cooldown
-        available = [k for k in self.keys if k["cooldown"] < now]
-        
-        if not available:
-            # Emergency reset - all keys in cooldown
-            logger.error("🚨 Hydra: All keys are in cooldown! Emergency reset initiated.")
-            for k in self.keys:
-                k["cooldown"] = 0
-                k["fails"] = max(0, k["fails"] - 1)  # Reduce penalty
-            available = self.keys
+        for kid, (fails, cooldown) in snapshot.items():
+            state = self._by_id.get(kid)
+            if state is not None and (state.fails, state.cooldown) != (fails, cooldown):
+                state.fails, state.cooldown = fails, cooldown
+                self._schedule(state, now)
 
-        # Prioritize keys with fewer failures
-        available.sort(key=lambda x: x["fails"])
-        selected = available[0]["key"]
-        return selected
+    def _update_health(self, k: KeyState, mutate):
+        before = (k.fails, k.cooldown)
+        try:
+            k.fails, k.cooldown = self._backend.transact(k.key_id, before, mutate)
+        except StateBusy:
+            # Another worker is writing: act on it here now, publish it without blocking the loop
+            k.fails, k.cooldown = mutate(*before)
+            self._publish_later(k, before, mutate)
 
-    def report_failure(self, key: str, status_code: int = 429):
-        """Marks a key as failed with exponential backoff."""
+    def _publish_later(self, k: KeyState, before: Tuple[int, float], mutate):
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            logger.warning(f"⚠️ Hydra: estado compartido ocupado, {k.key[:8]}... solo se actualiza localmente")
+            return
+        task = loop.create_task(self._publish(k, before, mutate))
+        self._publishing.add(task)
+        task.add_done_callback(self._publishing.discard)
+
+    async def _publish(self, k: KeyState, before: Tuple[int, float], mutate):
+        for delay in STATE_RETRY_DELAYS:
+            await asyncio.sleep(delay)
+            with self._lock:
+                try:
+                    k.fails, k.cooldown = self._backend.transact(k.key_id, before, mutate)
+                except StateBusy:
+                    continue
+                self._schedule(k, time.time())
+                return
+        logger.warning(f"⚠️ Hydra: no se pudo publicar el estado de {k.key[:8]}... (SQLite ocupado)")
+
+    def _emergency_reset(self, now: float):
+        logger.error("🚨 Hydra: All keys are in cooldown! Emergency reset initiated.")
         for k in self.keys:
-            if k["key"] == key:
-                k["fails"] += 1
-                
-                if status_code == 429:
-                    # Exponential backoff: 30s, 60s, 90s, etc. (reduced for faster rotation)
-                    wait_time = 30 * k["fails"]
-                    k["cooldown"] = time.time() + wait_time
-                    logger.warning(f"⚠️ Hydra: Key {key[:8]}... 429 error. Cooldown for {wait_time}s")
+            # Reduce penalty
+            self._update_health(k, lambda fails, cooldown: (max(0, fails - 1), 0.0))
+        self._rebuild(now)
+
+    def _take(self, now: float, tokens: int, borrow: bool, lease: bool) -> Tuple[Optional[KeyState], Optional[float]]:
+        """
+        Pick a key and charge its buckets. Returns (state, None) on success or
+        (None, seconds_until_quota) when nothing is ready and `borrow` is False.
+        A (None, None) result means every key is saturated by in-flight leases.
+        """
+        self._sync()
+        self._promote(now)
+        state = self._pop_explore() if random.random() < EXPLORE_RATE else None
+        state = state or self._pop_valid(self._ready)
+
+        if state is None:
+            head = self._peek_valid(self._waiting)
+            if head is None:
+                if lease or not self.keys:
+                    return None, None
+                # Plain get_active_key callers are never blocked by leases.
+                state = min(self.keys, key=lambda k: (k.inflight, k.fails))
+            elif not borrow:
+                return None, head[0] - now
+            else:
+                state = self._pop_valid(self._waiting)
+                if state.cooldown > now:
+                    self._emergency_reset(now)
+                    state = self._pop_valid(self._ready) or self._pop_valid(self._waiting)
                 else:
-                    # Other errors get shorter cooldown
-                    k["cooldown"] = time.time() + 30
-                    logger.warning(f"⚠️ Hydra: Key {key[:8]}... error {status_code}. Cooldown for 30s")
-                
-                break
+                    # Budget exhausted everywhere: borrow from the key that refills first.
+                    wait = state.ready_at(now, tokens) - now
+                    logger.warning(f"⏳ Hydra: All keys at quota. Borrowing {state.key[:8]}... (ready in {wait:.1f}s)")
+
+        state.rpm.consume(1, now)
+        state.tpm.consume(tokens, now)
+        if lease:
+            state.inflight += 1
+        self._schedule(state, now)
+        return state, None
+
+    def _penalize(self, k: KeyState, status_code: int):
+        now = time.time()
+
+        def backoff(fails: int, cooldown: float):
+            fails += 1
+            if status_code == 429:
+                # Exponential backoff: 30s, 60s, 90s, etc. (reduced for faster rotation)
+                return fails, now + 30 * fails
+            if status_code in (401, 403):
+                # Revoked/invalid keys won't heal quickly
+                return fails, now + 600
+            # Other errors get shorter cooldown
+            return fails, now + 30
+
+        self._update_health(k, backoff)
+        wait_time = int(k.cooldown - now)
+        if status_code == 429:
+            logger.warning(f"⚠️ Hydra: Key {k.key[:8]}... 429 error. Cooldown for {wait_time}s")
+        else:
+            logger.warning(f"⚠️ Hydra: Key {k.key[:8]}... error {status_code}. Cooldown for {wait_time}s")
+
+    def _release(
+        self,
+        state: KeyState,
+        model: Optional[str],
+        failure_class: Optional[str],
+        status_code: int,
+        latency: float,
+    ):
+        with self._lock:
+            state.inflight -= 1
+            if failure_class not in NEUTRAL_OUTCOMES:
+                # Only successes and timeouts say something about latency.
+                timed = latency if failure_class in (None, "timeout") else None
+                state.stats.observe(timed, failure_class in KEY_FAULTS)
+                if model:
+                    self._models.setdefault(model, Ewma()).observe(timed, failure_class in MODEL_FAULTS)
+
+            if failure_class is None:
+                state.successes += 1
+                if state.fails:
+                    self._update_health(state, lambda fails, cooldown: (max(0, fails - 1), cooldown))
+            elif failure_class not in NEUTRAL_OUTCOMES:
+                state.failures[failure_class] = state.failures.get(failure_class, 0) + 1
+                if failure_class != "client":
+                    self._penalize(state, status_code)
+            self._schedule(state, time.time())
+        self._wake_next()
+
+    def _wake_next(self):
+        if self._waiters:
+            self._waiters[0].set()
+
+    async def _acquire(self, tokens: int, timeout: float) -> KeyState:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        waiter: Optional[asyncio.Event] = None
+        try:
+            while True:
+                hint: Optional[float] = None
+                # FIFO: newcomers queue behind existing waiters; only the head competes.
+                if not self._waiters or self._waiters[0] is waiter:
+                    left = deadline - loop.time()
+                    with self._lock:
+                        now = time.time()
+                        state, hint = self._take(now, tokens, borrow=False, lease=True)
+                        if state is None and hint is not None and hint >= left:
+                            # Quota won't refill in time: borrow rather than fail the request.
+                            state, hint = self._take(now, tokens, borrow=True, lease=True)
+                    if state is not None:
+                        if waiter is not None:
+                            self._waiters.popleft()
+                            waiter = None
+                            self._wake_next()
+                        return state
+
+                if waiter is None:
+                    waiter = asyncio.Event()
+                    self._waiters.append(waiter)
+
+                left = deadline - loop.time()
+                if left <= 0:
+                    raise HydraExhausted(f"Hydra: no key available within {timeout:.0f}s ({len(self.keys)} keys saturated)")
+                waiter.clear()
+                try:
+                    await asyncio.wait_for(waiter.wait(), timeout=min(hint, left) if hint is not None else left)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            if waiter is not None:
+                was_head = self._waiters and self._waiters[0] is waiter
+                self._waiters.remove(waiter)
+                if was_head:
+                    self._wake_next()
+
+    # --- Public API ---
+
+    @asynccontextmanager
+    async def lease(
+        self,
+        tokens: int = REQUEST_TOKENS,
+        timeout: float = LEASE_TIMEOUT,
+        fallback_key: Optional[str] = None,
+        model: Optional[str] = None,
+    ) -> AsyncIterator[str]:
+        """
+        Lease a key for one provider call:
+
+            async with hydra_pool.lease(model="gemini-2.0-flash") as key:
+                ...
+
+        Success, failure class and latency are recorded when the block exits,
+        for the key and (if given) for the model.
+        `fallback_key` is yielded untracked when the pool has no keys at all.
+        Raises CircuitOpenError right away while the provider's circuit is open.
+        """
+        async with self._circuit():
+            if not self.keys:
+                if not fallback_key:
+                    raise HydraExhausted("Hydra: No API keys configured.")
+                yield fallback_key
+                return
+
+            # Waiting for a key counts against the request deadline too
+            state = await self._acquire(tokens, min(timeout, max(0.0, remaining(timeout))))
+            started = time.monotonic()
+            try:
+                yield state.key
+            except BaseException as e:
+                failure_class, status_code = classify_failure(e)
+                self._release(state, model, failure_class, status_code, time.monotonic() - started)
+                raise
+            else:
+                self._release(state, model, None, 200, time.monotonic() - started)
+
+    @asynccontextmanager
+    async def _circuit(self) -> AsyncIterator[None]:
+        """Report the outcome of one provider call to the breaker (if this pool has one)."""
+        breaker = self.breaker
+        if breaker is None:
+            yield
+            return
+        ticket = breaker.admit()
+        if ticket is None:
+            raise CircuitOpenError(f"Hydra[{self.provider.upper()}]: circuito abierto, proveedor omitido")
+        try:
+            yield
+        except BaseException as e:
+            # Saturated or missing keys say nothing about the provider's health
+            failure_class = "cancelled" if isinstance(e, HydraExhausted) else classify_failure(e)[0]
+            if failure_class in PROVIDER_FAULTS:
+                breaker.record(failure=True, ticket=ticket)
+            else:
+                breaker.release(ticket)
+            raise
+        else:
+            breaker.record(failure=False, ticket=ticket)
+
+    def rank_models(self, models: List[str]) -> List[str]:
+        """
+        Order a model chain by EWMA cost (fastest healthy first). Unseen models
+        keep their chain position ahead of measured ones so each gets tried;
+        with EXPLORE_RATE probability a random fallback is promoted to the front.
+        """
+        with self._lock:
+            costs = {m: self._models[m].cost() if m in self._models else 0.0 for m in models}
+        ranked = sorted(models, key=lambda m: (costs[m], models.index(m)))
+        if len(ranked) > 1 and random.random() < EXPLORE_RATE:
+            ranked.insert(0, ranked.pop(random.randrange(1, len(ranked))))
+        return ranked
+
+    def get_active_key(self, tokens: int = REQUEST_TOKENS) -> Optional[str]:
+        """
+        Returns the best key with quota available right now and charges the
+        request against its RPM/TPM buckets. Prefer `lease()` for new code.
+        """
+        if not self.keys:
+            return None
+
+        with self._lock:
+            state, _ = self._take(time.time(), tokens, borrow=True, lease=False)
+            return state.key
+
+    def report_failure(self, key: str, status_code: int = 429):
+        """Marks a key as failed with exponential backoff."""
+        with self._lock:
+            k = self._by_key.get(key)
+            if k is None:
+                return
+            self._penalize(k, status_code)
+            self._schedule(k, time.time())
 
     def get_status(self) -> dict:
         now = time.time()
+        with self._lock:
+            for k in self.keys:
+                k.rpm.wait_time(0, now)
+                k.tpm.wait_time(0, now)
         return {
+            "provider": self.provider,
             "total_keys": len(self.keys),
-            "available_keys": len([k for k in self.keys if k["cooldown"] < now]),
-            "blocked_keys": len([k for k in self.keys if k["cooldown"] >= now]),
+            "available_keys": len([k for k in self.keys if k.cooldown < now]),
+            "blocked_keys": len([k for k in self.keys if k.cooldown >= now]),
             "keys_detail": [
                 {
-                    "key_prefix": k["key"][:8] + "...",
-                    "fails": k["fails"],
-                    "in_cooldown": k["cooldown"] >= now,
-                    "cooldown_remaining": max(0, int(k["cooldown"] - now))
+                    "key_prefix": k.key[:8] + "...",
+                    "fails": k.fails,
+                    "in_cooldown": k.cooldown >= now,
+                    "cooldown_remaining": max(0, int(k.cooldown - now)),
+                    "rpm_available": round(max(0.0, k.rpm.level), 2),
+                    "tpm_available": int(max(0.0, k.tpm.level)),
+                    "in_flight": k.inflight,
+                    "successes": k.successes,
+                    "failures": dict(k.failures),
+                    "latency_ewma_ms": int(k.stats.latency * 1000),
+                    "error_rate": round(k.stats.error_rate, 3),
                 }
                 for k in self.keys
-            ]
+            ],
+            "models": {
+                name: {
+                    "latency_ewma_ms": int(m.latency * 1000),
+                    "error_rate": round(m.error_rate, 3),
+                    "samples": m.samples,
+                }
+                for name, m in self._models.items()
+            },
         }
 
 
+def get_pool(provider: str) -> HydraPool:
+    """Key pool for `provider` ("gemini", "gemini_embedding", "mistral", "groq", "groq_whisper", "openai", "deepseek")."""
+    return HydraPool.for_provider(provider)
+
+
 hydra_pool = HydraPool.get_instance()
@@ -0,0 +1,106 @@
+"""
+Hydra State Backends - where key health (cooldowns, fail counts) lives.
+
+- MemoryStateBackend: per-process dict semantics (default, single worker).
+- SQLiteStateBackend: local SQLite in WAL mode shared by every uvicorn worker
+  on the host. Updates are atomic read-modify-write transactions and other
+  workers pick them up on their next key selection via `PRAGMA data_version`.
+  Writes wait at most HYDRA_STATE_BUSY_TIMEOUT for the lock (they run on the
+  event loop); past that they raise StateBusy and HydraPool retries them later.
+"""
+import os
+import time
+import sqlite3
+import hashlib
+from typing import Callable, Dict, Optional, Tuple
+from loguru import logger
+
+# (fails, cooldown_until)
+Health = Tuple[int, float]
+Mutation = Callable[[int, float], Health]
+
+BUSY_TIMEOUT = float(os.getenv("HYDRA_STATE_BUSY_TIMEOUT", "0.05"))
+
+
+class StateBusy(RuntimeError):
+    """Another worker holds the write lock; the update was not applied."""
+
+
+def key_id(key: str) -> str:
+    """Stable identifier for a key that never writes the secret itself to disk."""
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()[:16]
+
+
+class MemoryStateBackend:
+    """Key health kept in-process only. Every worker learns about 429s on its own."""
+
+    def transact(self, kid: str, current: Health, mutate: Mutation) -> Health:
+        return mutate(*current)
+
+    def poll(self) -> Optional[Dict[str, Health]]:
+        """Changes published by other processes since the last poll (never any here)."""
+        return None
+
+
+class SQLiteStateBackend:
+    """Key health shared across processes through a local SQLite WAL database."""
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        # Access is serialized by HydraPool's lock, so one connection is enough.
+        self._conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS key_health ("
+            " key_id TEXT PRIMARY KEY,"
+            " fails INTEGER NOT NULL,"
+            " cooldown REAL NOT NULL,"
+            " updated REAL NOT NULL)"
+        )
+        self._data_version: Optional[int] = None
+        logger.info(f"🗄️ Hydra: Shared key state at {path}")
+
+    def transact(self, kid: str, current: Health, mutate: Mutation) -> Health:
+        """Atomically apply `mutate` to the shared row (falls back to `current` if absent)."""
+        cur = self._conn.cursor()
+        try:
+            cur.execute("BEGIN IMMEDIATE")
+        except sqlite3.OperationalError as e:
+            raise StateBusy(str(e)) from e
+        try:
+            row = cur.execute("SELECT fails, cooldown FROM key_health WHERE key_id = ?", (kid,)).fetchone()
+            fails, cooldown = mutate(*(row if row else current))
+            cur.execute(
+                "INSERT INTO key_health (key_id, fails, cooldown, updated) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(key_id) DO UPDATE SET fails = excluded.fails, "
+                "cooldown = excluded.cooldown, updated = excluded.updated",
+                (kid, fails, cooldown, time.time()),
+            )
+            cur.execute("COMMIT")
+        except Exception:
+            cur.execute("ROLLBACK")
+            raise
+        return fails, cooldown
+
+    def poll(self) -> Optional[Dict[str, Health]]:
+        """Full snapshot if another process committed since the last poll, else None."""
+        version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        if version == self._data_version:
+            return None
+        self._data_version = version
+        rows = self._conn.execute("SELECT key_id, fails, cooldown FROM key_health").fetchall()
+        return {kid: (fails, cooldown) for kid, fails, cooldown in rows}
+
+
+def make_state_backend():
+    """Backend selected by HYDRA_STATE_BACKEND (memory | sqlite)."""
+    kind = os.getenv("HYDRA_STATE_BACKEND", "memory").lower()
+    if kind == "sqlite":
+        path = os.getenv("HYDRA_STATE_PATH", "/tmp/aureon/hydra_state.sqlite3")
+        try:
+            return SQLiteStateBackend(path)
+        except Exception as e:
+            logger.error(f"Hydra: Could not open shared state at {path}: {e}. Using in-memory state.")
+    return MemoryStateBackend()
@@ -0,0 +1,96 @@
+"""
+Benchmark: token-aware MarkdownChunker vs the old character splitter.
+
+Reports throughput and the chunk size distribution (in estimated tokens):
+oversized chunks waste retrieval context, tiny fragments waste embedding calls.
+
+Usage:
+    python scripts/benchmark_chunker.py                 # synthetic ~5 MB markdown
+    python scripts/benchmark_chunker.py RAG/*.md --repeat 200
+"""
+import os
+import sys
+import time
+import random
+import argparse
+from typing import Callable, List
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils.chunker import MarkdownChunker, estimate_tokens
+
+
+def legacy_chunk_text(text: str, max_size: int = 1000) -> List[str]:
+    """The splitter scripts/ingest_rag.py used before: '## ' sections, then paragraphs by char count."""
+    sections = text.split("## ")
+    chunks = []
+    for section in sections:
+        if not section.strip(): continue
+        content = "## " + section if not section.startswith("#") else section
+        if len(content) > max_size:
+            paras = content.split("\n\n")
+            curr = ""
+            for p in paras:
+                if len(curr) + len(p) > max_size:
+                    chunks.append(curr.strip())
+                    curr = p + "\n\n"
+                else: curr += p + "\n\n"
+            if curr: chunks.append(curr.strip())
+        else: chunks.append(content.strip())
+    return chunks
+
+
+def synthetic_markdown(target_chars: int, seed: int = 5) -> str:
+    rng = random.Random(seed)
+    words = ("cliente proyecto automatización flujo n8n factura reunión equipo agente Vox Nux "
+             "despliegue servidor notion telegram estrategia campaña métrica").split()
+    parts, size = [], 0
+    while size < target_chars:
+        level = rng.choice([1, 2, 2, 3, 3, 3])
+        parts.append(f"{'#' * level} {rng.choice(words).title()} {rng.randint(1, 999)}\n\n")
+        for _ in range(rng.choice([0, 1, 1, 2, 4, 12])):
+            sentences = [" ".join(rng.choice(words) for _ in range(rng.randint(6, 20))).capitalize() + "."
+                         for _ in range(rng.randint(1, 8))]
+            parts.append(" ".join(sentences) + "\n\n")
+        size = sum(len(p) for p in parts)
+    return "".join(parts)
+
+
+def report(name: str, fn: Callable[[str], List[str]], text: str, budget: int, repeat: int):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        chunks = fn(text)
+    elapsed = (time.perf_counter() - started) / repeat
+    tokens = np.array([estimate_tokens(c) for c in chunks])
+    print(
+        f"{name:<12}{len(chunks):>8}{elapsed * 1000:>10.1f}ms{len(text) / elapsed / 1e6:>9.1f}MB/s"
+        f"{tokens.mean():>8.0f}{np.percentile(tokens, 95):>7.0f}{tokens.max():>7}"
+        f"{(tokens > budget).mean() * 100:>8.1f}%{(tokens < budget / 4).mean() * 100:>9.1f}%"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("files", nargs="*", help="markdown files (default: synthetic corpus)")
+    parser.add_argument("--size", type=float, default=5.0, help="synthetic size in MB")
+    parser.add_argument("--max-tokens", type=int, default=350)
+    parser.add_argument("--overlap-tokens", type=int, default=40)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.files:
+        text = "\n\n".join(open(f, encoding="utf-8").read() for f in args.files)
+    else:
+        text = synthetic_markdown(int(args.size * 1e6))
+
+    chunker = MarkdownChunker(max_tokens=args.max_tokens, overlap_tokens=args.overlap_tokens)
+    print(f"📄 {len(text) / 1e6:.2f} MB markdown, budget {args.max_tokens} tokens\n")
+    print(f"{'splitter':<12}{'chunks':>8}{'time':>12}{'speed':>11}{'mean':>8}{'p95':>7}{'max':>7}{'>budget':>9}{'<25%':>10}")
+    report("legacy", legacy_chunk_text, text, args.max_tokens, args.repeat)
+    report("markdown", lambda t: [c.text for c in chunker.chunk(t)], text, args.max_tokens, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
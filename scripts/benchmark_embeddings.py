@@ -0,0 +1,110 @@
+"""
+Benchmark: reduced-dimension and int8 embedding storage for the local RAG index.
+
+Ground truth is exact float32 cosine top-k at full dimension. Each variant
+(Matryoshka truncation to fewer dims, int8 per-vector scale, both) reports
+recall@k against it, plus index memory and mean query latency.
+
+text-embedding-004 output_dimensionality returns a truncated prefix of the
+full vector, so truncating stored vectors is what EMBEDDING_DIMENSIONS does.
+
+Usage:
+    python scripts/benchmark_embeddings.py --org <organization_id>   # real corpus
+    python scripts/benchmark_embeddings.py --synthetic 5000          # offline
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+from typing import List
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.local_index import OrgIndex
+
+
+def load_corpus(org_id: str) -> np.ndarray:
+    from app.services.vector_search import vector_search_service
+    from app.services.local_index import parse_embedding
+
+    async def fetch():
+        rows = await vector_search_service._load_org_chunks(org_id, True)
+        await vector_search_service.close()
+        return rows
+
+    rows = asyncio.run(fetch())
+    return np.asarray([parse_embedding(r["embedding"]) for r in rows if r.get("embedding")], dtype=np.float32)
+
+
+def synthetic_corpus(n: int, dim: int, seed: int = 7) -> np.ndarray:
+    """Clustered vectors with decaying per-dimension variance (roughly like MRL embeddings)."""
+    rng = np.random.default_rng(seed)
+    decay = np.linspace(1.0, 0.2, dim, dtype=np.float32)
+    centers = rng.normal(size=(max(n // 50, 1), dim)).astype(np.float32) * decay
+    labels = rng.integers(0, len(centers), size=n)
+    return centers[labels] + 0.35 * rng.normal(size=(n, dim)).astype(np.float32) * decay
+
+
+def build(vectors: np.ndarray, dim: int, quantize: bool) -> OrgIndex:
+    index = OrgIndex(quantize=quantize)
+    index.add([{"id": i, "content": "", "embedding": v[:dim]} for i, v in enumerate(vectors)])
+    return index
+
+
+def top_ids(index: OrgIndex, query: np.ndarray, k: int) -> List[int]:
+    return [r["id"] for r in index.search(query[:index.dim], -1.0, k)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--org", help="organization_id to load from document_chunks")
+    parser.add_argument("--synthetic", type=int, default=0, help="use N synthetic vectors instead")
+    parser.add_argument("--dim", type=int, default=768, help="synthetic dimension")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--dims", default="768,512,256,128", help="dimensions to try")
+    args = parser.parse_args()
+
+    if args.org:
+        corpus = load_corpus(args.org)
+    else:
+        corpus = synthetic_corpus(args.synthetic or 5000, args.dim)
+    if len(corpus) < 2:
+        print("❌ Corpus too small to benchmark.")
+        return
+
+    # Queries: held-out chunks with noise, so the exact neighbour set isn't trivial
+    rng = np.random.default_rng(11)
+    picks = rng.choice(len(corpus), size=min(args.queries, len(corpus)), replace=False)
+    queries = corpus[picks] + 0.1 * rng.normal(size=(len(picks), corpus.shape[1])).astype(np.float32)
+
+    full_dim = corpus.shape[1]
+    reference = build(corpus, full_dim, quantize=False)
+    truth = [set(top_ids(reference, q, args.k)) for q in queries]
+
+    print(f"📊 {len(corpus)} vectors x {full_dim} dims, {len(queries)} queries, recall@{args.k}\n")
+    print(f"{'variant':<18}{'recall':>8}{'memory':>12}{'mem x':>8}{'latency':>12}{'speed x':>9}")
+
+    baseline_ms = None
+    for dim in [int(d) for d in args.dims.split(",") if int(d) <= full_dim]:
+        for quantize in (False, True):
+            index = build(corpus, dim, quantize)
+            hits = 0
+            started = time.perf_counter()
+            for q, expected in zip(queries, truth):
+                hits += len(expected & set(top_ids(index, q, args.k)))
+            ms = (time.perf_counter() - started) * 1000 / len(queries)
+            if baseline_ms is None:
+                baseline_ms = ms
+            label = f"{dim}d {'int8' if quantize else 'f32'}"
+            print(
+                f"{label:<18}{hits / (args.k * len(queries)):>8.3f}{index.nbytes() / 1e6:>10.2f}MB"
+                f"{reference.nbytes() / index.nbytes():>7.1f}x{ms:>10.3f}ms{baseline_ms / ms:>8.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,102 +1,147 @@
+"""
+Ingests n8n blueprints from a ZIP export into the vector database.
+
+Streaming pipeline, memory stays flat whatever the size of the export:
+    ZIP members (read one by one, never extracted to disk)
+      → ProcessPoolExecutor (JSON parse + structural summary)
+      → bounded asyncio.Queue
+      → batched embed + bulk insert (VectorSearchService.store_documents)
+                + structural index (node types / connections, BlueprintIndex;
+                  also kept in metadata.structure for other processes)
+"""
 import os
-import json
-import zipfile
+import sys
 import asyncio
-from typing import List, Dict, Any
-from app.services.vector_search import vector_search_service
+import zipfile
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.blueprints import summarize_blueprint, get_blueprint_index
 from app.core.config import get_settings
 from loguru import logger
 
 settings = get_settings()
 
-API_KEY = settings.SUPABASE_SERVICE_ROLE_KEY
-URL = settings.SUPABASE_URL
+DEFAULT_ORG_ID = "392ecec2-e769-4db2-810f-ccd5bd09d92a"
 
-async def ingest_blueprints(zip_path: str, org_id: str = "392ecec2-e769-4db2-810f-ccd5bd09d92a"):
+
+async def ingest_blueprints(
+    zip_path: str,
+    org_id: str = DEFAULT_ORG_ID,
+    batch_size: int = 100,
+    workers: Optional[int] = None,
+    concurrency: int = 4,
+    queue_size: int = 500,
+):
     """
     Ingests n8n blueprints from a ZIP file into the vector database.
     Agrupa los nodos para entender la lógica del flujo.
     """
-    extracted_path = "/tmp/n8n_blueprints"
-    os.makedirs(extracted_path, exist_ok=True)
-    
-    logger.info(f"📂 Descomprimiendo {zip_path}...")
-    with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-        zip_ref.extractall(extracted_path)
-        
-    blueprints = []
-    
-    # Recorrer archivos
-    for root, dirs, files in os.walk(extracted_path):
-        for file in files:
-            if file.endswith(".json"):
-                full_path = os.path.join(root, file)
-                try:
-                    with open(full_path, 'r') as f:
-                        data = json.load(f)
-                        
-                    # Validar si es un workflow de n8n
-                    nodes = data.get('nodes', [])
-                    connections = data.get('connections', {})
-                    
-                    if not nodes:
+    from app.services.vector_search import vector_search_service
+
+    loop = asyncio.get_running_loop()
+    blueprint_index = get_blueprint_index()
+    workers = workers or os.cpu_count() or 2
+    queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+    stats = {"members": 0, "valid": 0, "stored": 0}
+
+    async def produce():
+        # At most 2 members per worker are read into memory and waiting to be parsed
+        slots = asyncio.Semaphore(workers * 2)
+        parsing = set()
+
+        async def parse(pool: ProcessPoolExecutor, name: str, raw: bytes):
+            try:
+                doc = await loop.run_in_executor(pool, summarize_blueprint, name, raw)
+            except Exception as e:
+                logger.error(f"❌ Error leyendo {name}: {e}")
+                doc = None
+            finally:
+                slots.release()
+            if doc:
+                stats["valid"] += 1
+                await queue.put(doc)  # blocks when the embedders fall behind
+
+        logger.info(f"📂 Leyendo {zip_path} en streaming ({workers} procesos)...")
+        try:
+            with ProcessPoolExecutor(max_workers=workers) as pool, zipfile.ZipFile(zip_path, "r") as zf:
+                for info in zf.infolist():
+                    if info.is_dir() or not info.filename.endswith(".json"):
                         continue
-                        
-                    # Crear resumen del flujo
-                    node_types = [n.get('type', 'unknown').replace('n8n-nodes-base.', '') for n in nodes]
-                    node_names = [n.get('name', 'unknown') for n in nodes]
-                    
-                    summary = f"Workflow n8n: {file}\n"
-                    summary += f"Nodos: {', '.join(set(node_types))}\n"
-                    summary += f"Estructura: {len(nodes)} nodos, {len(connections)} conexiones.\n"
-                    
-                    # Store logic (Raw JSON is too tokens expensive, store structural summary + key logic)
-                    content_to_embed = f"BLUEPRINT: {file}\nTYPE: n8n_workflow\n\nLOGIC:\n{summary}\n\nNODES:\n"
-                    for n in nodes[:20]: # Limit processing
-                         content_to_embed += f"- {n.get('name')} ({n.get('type')})\n"
-                    
-                    blueprints.append({
-                        "content": content_to_embed,
-                        "metadata": {
-                            "file_name": file,
-                            "type": "n8n_blueprint",
-                            "node_count": len(nodes),
-                            "raw_json_snippet": json.dumps(data)[:500] # Guardar snippet para referencia
-                        }
-                    })
-                    
-                except Exception as e:
-                    logger.error(f"❌ Error leyendo {file}: {e}")
-
-    logger.info(f"🧠 Encontrados {len(blueprints)} blueprints válidos. Inserción vectorial iniciada...")
-    
-    # Insertar en lotes
-    count = 0
-    for bp in blueprints:
+                    await slots.acquire()
+                    stats["members"] += 1
+                    # Decompressing a big member is CPU-bound: keep it off the event loop
+                    raw = await loop.run_in_executor(None, zf.read, info)
+                    task = asyncio.create_task(parse(pool, info.filename, raw))
+                    parsing.add(task)
+                    task.add_done_callback(parsing.discard)
+                if parsing:
+                    await asyncio.gather(*parsing)
+        finally:
+            # Always release the consumer, even if the ZIP is unreadable
+            await queue.put(None)
+
+    async def flush(batch: List[Dict[str, Any]]):
         try:
-            # Usar el nuevo método store_document
-            success = await vector_search_service.store_document(
-                content=bp["content"], 
-                metadata=bp["metadata"], 
-                organization_id=org_id
-            )
-            
-            if success:
-                count += 1
-                logger.info(f"✅ Ingerido: {bp['metadata']['file_name']}")
-            else:
-                logger.warning(f"⚠️ Falló inserción: {bp['metadata']['file_name']}")
-            
-        except Exception as e:
-            logger.error(f"❌ Error indexing {bp['metadata']['file_name']}: {e}")
-
-    return f"Procesados e ingeridos {count} de {len(blueprints)} archivos."
+            stored = await vector_search_service.store_documents(batch, organization_id=org_id)
+        finally:
+            inflight.release()
+        stats["stored"] += stored
+        if stored:
+            logger.info(f"✅ Lote ingerido: {stored} blueprints ({stats['stored']} en total)")
+        else:
+            names = ", ".join(d["metadata"]["file_name"] for d in batch[:3])
+            logger.warning(f"⚠️ Falló inserción de {len(batch)} blueprints ({names}...)")
+
+    async def consume():
+        # Full batches, up to `concurrency` embed + insert calls in flight
+        flushing = []
+        batch: List[Dict[str, Any]] = []
+        while True:
+            doc = await queue.get()
+            if doc is not None:
+                batch.append(doc)
+            if batch and (doc is None or len(batch) >= batch_size):
+                # Structural index first: it doesn't depend on the embedding quota.
+                # The structure also stays in metadata.structure on purpose: that is
+                # what lets the deployed API rebuild this index (find_blueprints).
+                await asyncio.to_thread(
+                    blueprint_index.add_many, org_id, [(d["metadata"]["source"], d.pop("structure")) for d in batch]
+                )
+                await inflight.acquire()
+                flushing.append(asyncio.create_task(flush(batch)))
+                batch = []
+            if doc is None:
+                break
+        await asyncio.gather(*flushing)
+
+    inflight = asyncio.Semaphore(concurrency)
+    try:
+        await asyncio.gather(produce(), consume())
+    finally:
+        await vector_search_service.close()
+
+    logger.info(f"🧠 {stats['valid']} blueprints válidos de {stats['members']} archivos JSON.")
+    return f"Procesados e ingeridos {stats['stored']} de {stats['valid']} archivos."
+
 
 if __name__ == "__main__":
-    import sys
-    if len(sys.argv) > 1:
-        zip_file = sys.argv[1]
-        print(f"🚀 Iniciando ingesta de: {zip_file}")
-        asyncio.run(ingest_blueprints(zip_file))
-    else:
-        print("❌ Por favor especifica la ruta del ZIP como argumento.")
+    parser = argparse.ArgumentParser(description="Ingest an n8n blueprint ZIP export into document_chunks.")
+    parser.add_argument("zip_file", help="ruta del ZIP")
+    parser.add_argument("--org", default=DEFAULT_ORG_ID, help="organization_id")
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=None, help="parser processes (default: CPU count)")
+    parser.add_argument("--concurrency", type=int, default=4, help="embed + insert batches in flight")
+    args = parser.parse_args()
+
+    print(f"🚀 Iniciando ingesta de: {args.zip_file}")
+    print(asyncio.run(ingest_blueprints(
+        args.zip_file,
+        org_id=args.org,
+        batch_size=args.batch_size,
+        workers=args.workers,
+        concurrency=args.concurrency,
+    )))
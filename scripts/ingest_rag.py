@@ -1,96 +1,95 @@
+"""
+RAG Ingestion CLI - loads Markdown/text knowledge into document_chunks.
+
+Resumable: chunks already stored for the org are recorded in a local
+checkpoint and skipped on the next run, so re-running after a failure
+only embeds what is missing.
+
+--sync re-indexes per file (new chunks inserted, vanished chunks and
+deleted files removed); --watch keeps syncing as files change.
+Both need the sync_document_chunks migration (supabase/migrations).
+
+Usage:
+    python scripts/ingest_rag.py RAG/ --org <organization_id>
+    python scripts/ingest_rag.py RAG/clientes.md RAG/procesos/ --batch-size 50 --concurrency 2
+    python scripts/ingest_rag.py RAG/ --watch
+"""
 import os
+import sys
 import asyncio
-import httpx
-from typing import List, Dict, Any
+import argparse
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_KEY")
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-ORG_ID = os.getenv("ELEVATE_ORG_ID", "pmvupdwzepfdvzycyaat")
-
-print(f"--- RAG Ingestion Debug ---")
-print(f"URL: {SUPABASE_URL}")
-print(f"ORG_ID: {ORG_ID}")
-
-async def get_embedding(text: str) -> List[float]:
-    url = f"https://generativelanguage.googleapis.com/v1beta/models/text-embedding-004:embedContent?key={GEMINI_API_KEY}"
-    payload = {
-        "model": "models/text-embedding-004",
-        "content": {"parts": [{"text": text}]}
-    }
-    async with httpx.AsyncClient() as client:
-        response = await client.post(url, json=payload, timeout=30.0)
-        if response.status_code != 200:
-            print(f"   ❌ Embedding Error: {response.status_code} - {response.text}")
-            response.raise_for_status()
-        data = response.json()
-        return data["embedding"]["values"]
-
-async def insert_to_supabase(content: str, embedding: List[float], metadata: Dict[str, Any]):
-    url = f"{SUPABASE_URL}/rest/v1/documents"
-    headers = {
-        "apikey": SUPABASE_KEY,
-        "Authorization": f"Bearer {SUPABASE_KEY}",
-        "Content-Type": "application/json",
-        "Prefer": "return=minimal"
-    }
-    payload = {
-        "content": content,
-        "metadata": metadata, # Embedding field removed temporarily if column doesn't exist
-    }
-    async with httpx.AsyncClient() as client:
-        response = await client.post(url, json=payload, headers=headers, timeout=10.0)
-        if response.status_code not in [200, 201]:
-            print(f"   ❌ Supabase Error: {response.status_code} - {response.text}")
-            response.raise_for_status()
-
-def chunk_text(text: str, max_size: int = 1000) -> List[str]:
-    sections = text.split("## ")
-    chunks = []
-    for section in sections:
-        if not section.strip(): continue
-        content = "## " + section if not section.startswith("#") else section
-        if len(content) > max_size:
-            paras = content.split("\n\n")
-            curr = ""
-            for p in paras:
-                if len(curr) + len(p) > max_size:
-                    chunks.append(curr.strip())
-                    curr = p + "\n\n"
-                else: curr += p + "\n\n"
-            if curr: chunks.append(curr.strip())
-        else: chunks.append(content.strip())
-    return chunks
-
-async def ingest_file(file_path: str):
-    file_name = os.path.basename(file_path)
-    print(f"📄 Processing: {file_name}")
-    with open(file_path, "r", encoding="utf-8") as f:
-        content = f.read()
-    chunks = chunk_text(content)
-    print(f"   📦 Found {len(chunks)} chunks")
-    for i, chunk in enumerate(chunks):
-        try:
-            embedding = await get_embedding(chunk)
-            await insert_to_supabase(chunk, embedding, {"file_name": file_name, "index": i})
-            print(f"   ✅ Chunk {i+1} inserted")
-        except Exception as e:
-            print(f"   ❌ Error in chunk {i+1}: {e}")
-
-async def main():
-    rag_dir = "/Users/astursadeth/multiversa-lab/portality/cortex/RAG"
-    if not os.path.exists(rag_dir):
-        print(f"❌ Error: RAG folder not found at {rag_dir}")
-        return
-    files = [f for f in os.listdir(rag_dir) if f.endswith(".md")]
-    print(f"📁 Found {len(files)} files to ingest")
-    for file in files:
-        await ingest_file(os.path.join(rag_dir, file))
-    print("\n✨ Ingestion complete!")
+from app.core.config import get_settings
+from app.services.ingestion import DEFAULT_PATTERNS, IngestionCheckpoint, RAGIngestor
+from app.utils.chunker import MarkdownChunker
+
+settings = get_settings()
+
+DEFAULT_ORG_ID = os.getenv("ELEVATE_ORG_ID", "392ecec2-e769-4db2-810f-ccd5bd09d92a")
+
+
+async def main(args: argparse.Namespace) -> int:
+    from app.services.vector_search import vector_search_service
+
+    checkpoint = IngestionCheckpoint(args.checkpoint)
+    if args.reset:
+        checkpoint.reset(args.org)
+        print(f"🧹 Checkpoint reiniciado para org {args.org}")
+
+    ingestor = RAGIngestor(
+        vector_search_service,
+        args.org,
+        checkpoint,
+        batch_size=args.batch_size,
+        concurrency=args.concurrency,
+        chunker=MarkdownChunker(max_tokens=args.max_tokens, overlap_tokens=args.overlap_tokens),
+    )
+    patterns = args.pattern or DEFAULT_PATTERNS
+    print(f"📁 {'Sincronizando' if args.sync or args.watch else 'Ingestando'} {', '.join(args.paths)} → org {args.org}")
+    try:
+        if args.watch:
+            await ingestor.watch(args.paths, patterns, interval=args.interval)
+            return 0
+        elif args.sync:
+            report = await ingestor.sync(args.paths, patterns)
+        else:
+            report = await ingestor.ingest(args.paths, patterns)
+    finally:
+        await vector_search_service.close()
+        checkpoint.close()
+
+    for error in report.errors:
+        print(f"   ❌ {error}")
+    print(f"\n✨ {report}")
+    return 1 if report.failed or report.errors else 0
+
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    parser = argparse.ArgumentParser(description="Ingest RAG documents into document_chunks.")
+    parser.add_argument("paths", nargs="+", help="files or folders to ingest")
+    parser.add_argument("--org", default=DEFAULT_ORG_ID, help="organization_id (default: ELEVATE_ORG_ID)")
+    parser.add_argument("--pattern", action="append", help="file glob inside folders (repeatable, default *.md, *.txt)")
+    parser.add_argument("--batch-size", type=int, default=100, help="chunks per embed + insert batch")
+    parser.add_argument("--concurrency", type=int, default=4, help="batches in flight")
+    parser.add_argument("--max-tokens", type=int, default=350, help="chunk token budget")
+    parser.add_argument("--overlap-tokens", type=int, default=40, help="tokens shared by consecutive pieces of a long section")
+    parser.add_argument(
+        "--checkpoint",
+        default=os.path.join(settings.CACHE_DIR, "ingestion.sqlite3"),
+        help="local progress file",
+    )
+    parser.add_argument("--reset", action="store_true", help="forget the checkpoint and re-ingest everything")
+    parser.add_argument("--sync", action="store_true", help="incremental per-file sync (deletes stale chunks)")
+    parser.add_argument("--watch", action="store_true", help="sync, then keep syncing on file changes")
+    parser.add_argument("--interval", type=float, default=2.0, help="watch debounce / polling interval (seconds)")
+    try:
+        sys.exit(asyncio.run(main(parser.parse_args())))
+    except KeyboardInterrupt:
+        print("\n👋 Watch detenido.")
@@ -0,0 +1,40 @@
+-- Incremental RAG sync: replace the chunks of one source file in a single transaction.
+-- Rows whose metadata->>'chunk_hash' is not in p_keep_hashes are deleted, p_rows are inserted.
+-- Called by VectorSearchService.sync_source (app/services/vector_search.py).
+
+create index if not exists document_chunks_org_source_idx
+    on document_chunks (organization_id, (metadata->>'source'));
+
+create or replace function sync_document_chunks(
+    p_organization_id uuid,
+    p_source text,
+    p_keep_hashes text[],
+    p_rows jsonb
+)
+returns jsonb
+language plpgsql
+as $$
+declare
+    v_deleted integer;
+    v_inserted integer;
+begin
+    -- Serialize concurrent syncs of the same file
+    perform pg_advisory_xact_lock(hashtext(p_organization_id::text || ':' || p_source));
+
+    delete from document_chunks d
+     where d.organization_id = p_organization_id
+       and d.metadata->>'source' = p_source
+       and not (coalesce(d.metadata->>'chunk_hash', '') = any (p_keep_hashes));
+    get diagnostics v_deleted = row_count;
+
+    insert into document_chunks (organization_id, content, metadata, embedding)
+    select p_organization_id,
+           r->>'content',
+           r->'metadata',
+           (r->>'embedding')::vector
+      from jsonb_array_elements(coalesce(p_rows, '[]'::jsonb)) r;
+    get diagnostics v_inserted = row_count;
+
+    return jsonb_build_object('deleted', v_deleted, 'inserted', v_inserted);
+end;
+$$;
@@ -0,0 +1,107 @@
+import os
+import sys
+import json
+import time
+import asyncio
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("SUPABASE_URL", "https://test.supabase.co")
+os.environ.setdefault("SUPABASE_SERVICE_ROLE_KEY", "test-service-role-key")
+
+from app.services import blueprints
+from app.services.blueprints import BlueprintIndex, find_blueprints, summarize_blueprint
+
+
+def workflow(name, nodes, edges):
+    return json.dumps({
+        "name": name,
+        "nodes": [{"name": n, "type": t} for n, t in nodes],
+        "connections": {
+            src: {"main": [[{"node": dst, "type": "main", "index": 0}]]} for src, dst in edges
+        },
+    }).encode()
+
+
+BOT = workflow(
+    "Bot a Notion",
+    [("Trigger", "n8n-nodes-base.telegramTrigger"), ("Agente", "@n8n/n8n-nodes-langchain.agent"), ("Guardar", "n8n-nodes-base.notion")],
+    [("Trigger", "Agente"), ("Agente", "Guardar")],
+)
+REVERSE = workflow(
+    "Notion a Telegram",
+    [("Leer", "n8n-nodes-base.notion"), ("Enviar", "n8n-nodes-base.telegram"), ("Cron", "n8n-nodes-base.telegramTrigger")],
+    [("Leer", "Enviar")],
+)
+
+
+def test_summary_keeps_structure():
+    doc = summarize_blueprint("wf/bot.json", BOT)
+    assert doc["metadata"]["file_name"] == "bot.json"
+    assert doc["metadata"]["source"] == "wf/bot.json"
+    assert ["Trigger", "Agente"] in doc["structure"]["edges"]
+    # Stored with the chunk so other processes can rebuild the index
+    assert doc["metadata"]["structure"] == doc["structure"]
+    assert summarize_blueprint("bad.json", b"{nope") is None
+    assert summarize_blueprint("empty.json", b'{"nodes": []}') is None
+
+
+def test_find_by_node_types_and_path(tmp_path):
+    path = str(tmp_path / "blueprints.sqlite3")
+    writer = BlueprintIndex(path)
+    writer.add_many("org", [
+        ("bot.json", summarize_blueprint("bot.json", BOT)["structure"]),
+        ("reverse.json", summarize_blueprint("reverse.json", REVERSE)["structure"]),
+    ])
+
+    # A second instance (another process in production) sees the writer's data
+    index = BlueprintIndex(path)
+    both = index.find("org", ["Notion", "telegramTrigger"])
+    assert [r["file_name"] for r in both] == ["bot.json", "reverse.json"]
+    assert [r["file_name"] for r in index.find("org", ["telegramTrigger", "notion"], ordered=True)] == ["bot.json"]
+    assert [r["file_name"] for r in index.find("org", ["notion", "telegram"], ordered=True)] == ["reverse.json"]
+    assert index.find("other-org", ["notion"]) == []
+
+    started = time.perf_counter()
+    for _ in range(1000):
+        index.find("org", ["notion", "telegramTrigger"], ordered=True)
+    assert (time.perf_counter() - started) / 1000 < 0.001
+
+    writer.add_many("org", [("new.json", summarize_blueprint("new.json", REVERSE)["structure"])])
+    assert len(index.find("org", ["notion"])) == 3
+
+
+def test_index_is_rebuilt_from_stored_chunks(tmp_path, monkeypatch):
+    from app.services.vector_search import vector_search_service
+
+    # Fresh process: empty local index, blueprints only in document_chunks
+    index = BlueprintIndex(str(tmp_path / "blueprints.sqlite3"))
+    monkeypatch.setattr(blueprints, "get_blueprint_index", lambda: index)
+    monkeypatch.setattr(blueprints, "_loaded", set())
+    loads = []
+
+    async def blueprint_structures(organization_id):
+        loads.append(organization_id)
+        await asyncio.sleep(0.01)
+        docs = [summarize_blueprint(name, raw) for name, raw in (("bot.json", BOT), ("reverse.json", REVERSE))]
+        return [(d["metadata"]["source"], d["metadata"]["structure"]) for d in docs]
+
+    monkeypatch.setattr(vector_search_service, "blueprint_structures", blueprint_structures)
+
+    async def main():
+        first = await asyncio.gather(*(find_blueprints("org", ["telegramTrigger", "notion"], ordered=True) for _ in range(3)))
+        again = await find_blueprints("org", ["notion"])
+        return first, again
+
+    first, again = asyncio.run(main())
+    assert [[r["file_name"] for r in results] for results in first] == [["bot.json"]] * 3
+    assert len(again) == 2
+    assert loads == ["org"]
+
+
+def test_same_named_workflows_in_different_folders_are_kept_apart(tmp_path):
+    index = BlueprintIndex(str(tmp_path / "blueprints.sqlite3"))
+    docs = [summarize_blueprint("ventas/flujo.json", BOT), summarize_blueprint("./soporte/flujo.json", REVERSE)]
+    index.add_many("org", [(d["metadata"]["source"], d["structure"]) for d in docs])
+
+    assert [r["file_name"] for r in index.find("org", ["notion"])] == ["soporte/flujo.json", "ventas/flujo.json"]
@@ -0,0 +1,58 @@
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils.chunker import MarkdownChunker, split_sections
+
+DOC = """# ElevateOS
+
+Intro corta.
+
+## Agentes
+
+### Vox
+Vox habla con el usuario.
+
+### Nux
+Nux ejecuta.
+
+```python
+# not a heading
+print("hola")
+```
+
+## Operaciones
+""" + " ".join(f"Frase número {i} sobre despliegues y facturación." for i in range(200))
+
+
+def test_heading_paths_ignore_code_fences():
+    paths = [s.heading_path for s in split_sections(DOC)]
+    assert paths == [["ElevateOS"], ["ElevateOS", "Agentes"], ["ElevateOS", "Agentes", "Vox"],
+                     ["ElevateOS", "Agentes", "Nux"], ["ElevateOS", "Operaciones"]]
+
+
+def test_chunks_fit_budget_merge_small_sections_and_overlap():
+    chunker = MarkdownChunker(max_tokens=100, overlap_tokens=20)
+    chunks = chunker.chunk(DOC)
+
+    # Intro + Agentes + Vox + Nux are merged; their common heading path is kept
+    assert chunks[0].heading_path == ["ElevateOS"]
+    assert "Nux ejecuta." in chunks[0].text and "# not a heading" in chunks[0].text
+
+    long_pieces = [c for c in chunks if c.heading_path == ["ElevateOS", "Operaciones"]]
+    assert len(long_pieces) > 5
+    assert all(c.tokens <= 100 for c in chunks)
+    # Pieces end on sentence boundaries and overlap with the next one
+    for a, b in zip(long_pieces, long_pieces[1:]):
+        assert a.text.endswith(".")
+        assert b.text[:30] in a.text
+
+
+def test_without_numpy_the_cuts_are_identical(monkeypatch):
+    from app.utils import chunker as chunker_module
+
+    text = DOC + "\n\n" + "\n".join(f"linea {i} sin punto final" for i in range(300)) + "\n\n" + "x" * 3000
+    expected = [c.text for c in MarkdownChunker(max_tokens=100, overlap_tokens=20).chunk(text)]
+    monkeypatch.setattr(chunker_module, "np", None)
+    assert [c.text for c in MarkdownChunker(max_tokens=100, overlap_tokens=20).chunk(text)] == expected
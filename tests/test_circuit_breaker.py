@@ -0,0 +1,87 @@
+import asyncio
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from app.utils.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError
+from app.utils.hydra import HydraPool
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class ServerError(Exception):
+    status_code = 503
+
+
+def test_opens_on_failure_rate_and_recovers_through_one_probe():
+    clock = Clock()
+    breaker = CircuitBreaker("mistral", failure_rate=0.5, min_calls=4, window=10, open_seconds=30, clock=clock)
+    for failure in (False, True, False):
+        breaker.record(failure)
+    assert breaker.state == CLOSED  # below min_calls
+    breaker.record(True)
+    assert breaker.state == OPEN and breaker.is_open() and breaker.admit() is None
+
+    clock.now = 31
+    assert not breaker.is_open()
+    probe = breaker.admit()
+    assert probe is not None and breaker.state == HALF_OPEN
+    assert breaker.admit() is None  # a single probe at a time
+    breaker.record(True, probe)
+    assert breaker.state == OPEN and breaker.admit() is None
+
+    clock.now = 62
+    probe = breaker.admit()
+    breaker.record(False, probe)
+    assert breaker.state == CLOSED and breaker.snapshot()["recent_calls"] == 0
+
+
+def test_late_call_from_before_opening_does_not_decide_the_probe():
+    clock = Clock()
+    breaker = CircuitBreaker("mistral", failure_rate=0.5, min_calls=2, open_seconds=30, clock=clock)
+    straggler = breaker.admit()
+    for _ in range(2):
+        breaker.record(True, breaker.admit())
+    assert breaker.state == OPEN
+
+    clock.now = 31
+    probe = breaker.admit()
+    # The slow call admitted while closed succeeds now: the circuit stays half-open
+    breaker.record(False, straggler)
+    breaker.release(straggler)
+    assert breaker.state == HALF_OPEN and breaker.admit() is None
+    breaker.record(True, probe)
+    assert breaker.state == OPEN
+
+
+def test_lease_feeds_the_breaker_and_fails_fast_when_open():
+    breaker = CircuitBreaker("groq", min_calls=2, open_seconds=60)
+    pool = HydraPool(keys=["key-a", "key-b"], provider="groq", breaker=breaker)
+
+    async def call(error):
+        async with pool.lease():
+            if error:
+                raise error
+
+    async def main():
+        # Rate limits are per key: Hydra rotates, the provider stays closed
+        for _ in range(3):
+            with pytest.raises(RuntimeError):
+                await call(RuntimeError("429 RESOURCE_EXHAUSTED"))
+        assert breaker.state == CLOSED
+        for _ in range(2):
+            with pytest.raises(ServerError):
+                await call(ServerError("upstream down"))
+        assert breaker.state == OPEN
+        with pytest.raises(CircuitOpenError):
+            await call(None)
+
+    asyncio.run(main())
@@ -0,0 +1,66 @@
+import asyncio
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from app.utils.deadline import DeadlineExceeded, request_deadline, timeout_for, within
+from app.utils.hedging import LatencyTracker, hedged
+from app.utils.hydra import classify_failure
+
+
+def test_without_scope_fixed_timeouts_are_kept():
+    assert timeout_for(30.0) == 30.0
+    assert asyncio.run(within(asyncio.sleep(0, "ok"), "stage")) == "ok"
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(within(asyncio.sleep(1), "stage", cap=0.01))
+
+
+def test_stage_is_cut_and_later_stages_skipped():
+    async def main():
+        with request_deadline(0.3) as deadline:
+            assert timeout_for(30.0) <= 0.3
+            with pytest.raises(DeadlineExceeded):
+                await within(asyncio.sleep(5), "lumina", cap=30.0)
+            with pytest.raises(DeadlineExceeded):
+                await within(asyncio.sleep(0), "nux")
+            with pytest.raises(DeadlineExceeded):
+                timeout_for(15.0, "direct")
+        return deadline
+
+    deadline = asyncio.run(main())
+    assert deadline.skipped == ["lumina", "nux", "direct"]
+
+
+def test_budget_reaches_spawned_tasks_and_nested_scopes_only_shrink():
+    async def child():
+        return timeout_for(60.0)
+
+    async def main():
+        with request_deadline(1.0):
+            spawned = await asyncio.ensure_future(child())
+            with request_deadline(10.0):
+                nested = timeout_for(60.0)
+        return spawned, nested
+
+    spawned, nested = asyncio.run(main())
+    assert spawned <= 1.0 and nested <= 1.0
+
+
+def test_hedged_chain_stops_at_the_deadline():
+    async def slow():
+        await asyncio.sleep(5)
+
+    async def main():
+        with request_deadline(0.1) as deadline:
+            with pytest.raises(DeadlineExceeded):
+                await hedged([("vox", slow), ("lumina", slow), ("nux", slow)], LatencyTracker(default_delay=0.05), scope="t")
+        return deadline
+
+    deadline = asyncio.run(main())
+    assert set(deadline.skipped) == {"vox", "lumina", "nux"}
+
+
+def test_deadline_is_not_blamed_on_the_provider():
+    assert classify_failure(DeadlineExceeded("cut"))[0] == "deadline"
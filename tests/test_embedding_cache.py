@@ -0,0 +1,71 @@
+import os
+import sys
+import asyncio
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.embedding_cache import EmbeddingCache
+
+
+def test_normalized_text_shares_a_key():
+    a = EmbeddingCache.make_key("text-embedding-004", "RETRIEVAL_QUERY", "¿Qué tengo  hoy?")
+    b = EmbeddingCache.make_key("text-embedding-004", "RETRIEVAL_QUERY", "  ¿qué tengo hoy? ")
+    c = EmbeddingCache.make_key("text-embedding-004", "RETRIEVAL_DOCUMENT", "¿qué tengo hoy?")
+    assert a == b
+    assert a != c
+
+
+def test_lru_evicts_oldest_entry():
+    cache = EmbeddingCache(max_items=2)
+    cache.put("a", [1.0])
+    cache.put("b", [2.0])
+    cache.get("a")
+    cache.put("c", [3.0])
+
+    assert cache.get("b") is None
+    assert cache.get("a") == [1.0]
+    assert cache.stats()["size"] == 2
+
+
+def test_disk_tier_survives_restart(tmp_path):
+    path = str(tmp_path / "embeddings.sqlite3")
+    EmbeddingCache(path=path).put("k", [0.5, -0.25])
+
+    restarted = EmbeddingCache(path=path)
+    assert restarted.get("k") == [0.5, -0.25]
+    assert restarted.get("k") == [0.5, -0.25]
+
+    stats = restarted.stats()
+    assert (stats["disk_hit"], stats["memory_hit"], stats["miss"]) == (1, 1, 0)
+    assert stats["hit_ratio"] == 1.0
+
+
+def test_disk_tier_is_capped_oldest_first(tmp_path):
+    path = str(tmp_path / "embeddings.sqlite3")
+    cache = EmbeddingCache(path=path, max_items=1, max_disk_items=10)
+    for i in range(25):
+        cache.put(f"k{i}", [float(i)])
+
+    assert cache.stats()["disk_size"] <= 10
+    restarted = EmbeddingCache(path=path, max_disk_items=10)
+    assert restarted.stats()["disk_size"] <= 10
+    assert restarted.get("k24") == [24.0]
+    assert restarted.get("k0") is None
+
+
+def test_async_batch_lookups_go_through_both_tiers(tmp_path):
+    path = str(tmp_path / "embeddings.sqlite3")
+    EmbeddingCache(path=path).put_many([("a", [1.0]), ("b", [2.0])])
+    cache = EmbeddingCache(path=path)
+
+    async def main():
+        first = await cache.aget_many(["a", "b", "c"])
+        await cache.aput_many([("c", [3.0])])
+        return first, await cache.aget_many(["a", "c"])
+
+    first, again = asyncio.run(main())
+    assert first == {"a": [1.0], "b": [2.0]}
+    assert again == {"a": [1.0], "c": [3.0]}
+    stats = cache.stats()
+    assert (stats["disk_hit"], stats["memory_hit"], stats["miss"]) == (2, 2, 1)
+    assert EmbeddingCache(path=path).get("c") == [3.0]
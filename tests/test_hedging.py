@@ -0,0 +1,167 @@
+import asyncio
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from app.core.metrics import HEDGED_REQUESTS
+from app.utils.hedging import LatencyTracker, claim_side_effects, hedged
+
+
+def count(scope: str, event: str) -> float:
+    return HEDGED_REQUESTS.labels(scope=scope, event=event)._value.get()
+
+
+def attempt(log, name, delay, result=None, error=None):
+    async def run():
+        log.append(f"start {name}")
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            log.append(f"cancel {name}")
+            raise
+        if error:
+            raise error
+        return result
+    return name, run
+
+
+def test_slow_primary_is_raced_and_cancelled():
+    log = []
+    tracker = LatencyTracker(default_delay=0.02)
+    fired, won = count("t1", "fired"), count("t1", "won")
+    result = asyncio.run(hedged(
+        [attempt(log, "slow", 1.0, "slow"), attempt(log, "fast", 0.01, "fast"), attempt(log, "spare", 0, "spare")],
+        tracker, scope="t1",
+    ))
+    assert result == "fast"
+    assert log == ["start slow", "start fast", "cancel slow"]  # max_inflight=2: spare never starts
+    assert count("t1", "fired") - fired == 1 and count("t1", "won") - won == 1
+
+
+def test_failure_falls_back_without_hedging():
+    log = []
+    tracker = LatencyTracker(default_delay=10.0)
+    fired = count("t2", "fired")
+    result = asyncio.run(hedged(
+        [attempt(log, "a", 0, error=RuntimeError("429")), attempt(log, "b", 0, "b")],
+        tracker, scope="t2",
+    ))
+    assert result == "b"
+    assert count("t2", "fired") == fired
+
+
+def test_all_failures_raise_the_last_error():
+    with pytest.raises(ValueError):
+        asyncio.run(hedged(
+            [attempt([], "a", 0, error=RuntimeError("a")), attempt([], "b", 0, error=ValueError("b"))],
+            LatencyTracker(default_delay=0.01), scope="t3",
+        ))
+
+
+def test_disabled_is_sequential():
+    log = []
+    result = asyncio.run(hedged(
+        [attempt(log, "slow", 0.05, "slow"), attempt(log, "fast", 0, "fast")],
+        LatencyTracker(default_delay=0.001), scope="t4", enabled=False,
+    ))
+    assert result == "slow" and log == ["start slow"]
+
+
+def test_delay_follows_the_latency_percentile():
+    tracker = LatencyTracker(percentile=90, default_delay=8.0, min_delay=0.0)
+    assert tracker.delay("gemini") == 8.0  # not enough samples yet
+    for i in range(1, 101):
+        tracker.observe("gemini", i / 100)
+    assert tracker.delay("gemini") == pytest.approx(0.91)
+
+
+def test_early_wakeup_before_deadline_does_not_overlaunch(monkeypatch):
+    from app.utils import hedging
+    from app.utils.deadline import request_deadline
+
+    real_wait = asyncio.wait
+    wakeups = []
+
+    async def early_wait(tasks, timeout=None, return_when=asyncio.ALL_COMPLETED):
+        # The first wait returns with nothing done while the deadline is still open
+        if not wakeups:
+            wakeups.append(timeout)
+            return set(), set(tasks)
+        return await real_wait(tasks, timeout=timeout, return_when=return_when)
+
+    monkeypatch.setattr(hedging.asyncio, "wait", early_wait)
+
+    async def run(attempts, **kwargs):
+        with request_deadline(5.0):
+            return await hedged(attempts, LatencyTracker(default_delay=10.0), scope="t5", **kwargs)
+
+    # Every attempt already in flight: nothing left to hedge with
+    log = []
+    assert asyncio.run(run([attempt(log, "only", 0.01, "only")])) == "only"
+    assert log == ["start only"]
+
+    # Attempts left, but the in-flight cap is reached
+    wakeups.clear()
+    log = []
+    assert asyncio.run(run([attempt(log, "a", 0.01, "a"), attempt(log, "b", 0, "b")], max_inflight=1)) == "a"
+    assert log == ["start a"]
+
+
+def writer(log, writes, name, before, after, result=None, error=None):
+    """An attempt that writes (e.g. a Notion task) after `before` seconds."""
+    async def run():
+        log.append(f"start {name}")
+        try:
+            await asyncio.sleep(before)
+            claim_side_effects("notion:create_task")
+            writes.append(name)
+            await asyncio.sleep(after)
+        except asyncio.CancelledError:
+            log.append(f"cancel {name}")
+            raise
+        if error:
+            raise error
+        return result
+    return name, run
+
+
+def test_write_runs_once_when_the_hedge_fires():
+    # The hedge writes first: the slow primary is cancelled before its write
+    log, writes = [], []
+    fired = count("t6", "fired")
+    result = asyncio.run(hedged(
+        [writer(log, writes, "slow", 0.1, 0, "slow"), writer(log, writes, "fast", 0.01, 0.02, "fast")],
+        LatencyTracker(default_delay=0.01), scope="t6",
+    ))
+    assert result == "fast" and writes == ["fast"]
+    assert log == ["start slow", "start fast", "cancel slow"]
+    assert count("t6", "fired") - fired == 1
+
+    # The primary wrote before the hedge delay: no hedge starts after it
+    log, writes = [], []
+    fired = count("t6", "fired")
+    result = asyncio.run(hedged(
+        [writer(log, writes, "slow", 0, 0.05, "slow"), writer(log, writes, "fast", 0, 0, "fast")],
+        LatencyTracker(default_delay=0.01), scope="t6",
+    ))
+    assert result == "slow" and writes == ["slow"]
+    assert log == ["start slow"] and count("t6", "fired") == fired
+
+
+def test_chain_is_sequential_after_a_write():
+    # The owner fails after writing: the next provider runs alone, never hedged
+    log, writes = [], []
+    fired = count("t7", "fired")
+    result = asyncio.run(hedged(
+        [
+            writer(log, writes, "a", 0, 0.05, error=RuntimeError("500")),
+            attempt(log, "b", 0.05, "b"),
+            attempt(log, "c", 0, "c"),
+        ],
+        LatencyTracker(default_delay=0.01), scope="t7",
+    ))
+    assert result == "b" and writes == ["a"]
+    assert log == ["start a", "start b"]
+    assert count("t7", "fired") == fired
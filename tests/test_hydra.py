@@ -0,0 +1,276 @@
+import asyncio
+import os
+import sqlite3
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from app.utils import hydra
+from app.utils.hydra import HydraPool
+from app.utils.hydra_state import SQLiteStateBackend
+
+
+class FakeClock:
+    def __init__(self, now: float = 1_000.0):
+        self.now = now
+
+    def time(self) -> float:
+        return self.now
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(hydra, "time", fake)
+    return fake
+
+
+def test_rotates_across_keys_before_exhausting_budget(clock, monkeypatch):
+    monkeypatch.setattr(hydra, "KEY_RPM", 2)
+    pool = HydraPool(keys=["key-a", "key-b"])
+
+    picked = [pool.get_active_key() for _ in range(4)]
+
+    # Each key serves its 2 RPM before any key is borrowed past its budget
+    assert sorted(picked) == ["key-a", "key-a", "key-b", "key-b"]
+    assert all(k.rpm.level < 1 for k in pool.keys)
+
+
+def test_budget_refills_over_time(clock, monkeypatch):
+    monkeypatch.setattr(hydra, "KEY_RPM", 1)
+    pool = HydraPool(keys=["key-a", "key-b"])
+
+    first, second = pool.get_active_key(), pool.get_active_key()
+    assert {first, second} == {"key-a", "key-b"}
+
+    clock.now += 60
+    assert pool.get_active_key() in {"key-a", "key-b"}
+    assert pool._waiting  # the other key still refilling or already promoted lazily
+
+
+def test_failed_key_is_skipped_until_cooldown_expires(clock):
+    pool = HydraPool(keys=["key-a", "key-b"])
+
+    pool.report_failure("key-a", 429)
+    assert {pool.get_active_key() for _ in range(5)} == {"key-b"}
+
+    clock.now += 31
+    pool.report_failure("key-b", 500)
+    assert pool.get_active_key() == "key-a"
+
+
+def test_emergency_reset_when_every_key_is_cooling_down(clock):
+    pool = HydraPool(keys=["key-a"])
+    pool.report_failure("key-a", 429)
+
+    assert pool.get_active_key() == "key-a"
+    assert pool.keys[0].cooldown == 0
+    assert pool.keys[0].fails == 0
+
+
+def test_empty_pool_returns_none():
+    assert HydraPool(keys=[]).get_active_key() is None
+
+
+def test_lease_caps_in_flight_requests_per_key(monkeypatch):
+    monkeypatch.setattr(hydra, "KEY_MAX_INFLIGHT", 2)
+    pool = HydraPool(keys=["key-a", "key-b"])
+    peak = {"key-a": 0, "key-b": 0}
+    active = {"key-a": 0, "key-b": 0}
+
+    async def call():
+        async with pool.lease() as key:
+            active[key] += 1
+            peak[key] = max(peak[key], active[key])
+            await asyncio.sleep(0.01)
+            active[key] -= 1
+
+    async def main():
+        await asyncio.gather(*(call() for _ in range(12)))
+
+    asyncio.run(main())
+
+    assert peak == {"key-a": 2, "key-b": 2}
+    assert sum(k.successes for k in pool.keys) == 12
+    assert all(k.inflight == 0 for k in pool.keys)
+
+
+def test_lease_waiters_are_served_in_arrival_order(monkeypatch):
+    monkeypatch.setattr(hydra, "KEY_MAX_INFLIGHT", 1)
+    pool = HydraPool(keys=["key-a"])
+    order = []
+
+    async def call(i):
+        async with pool.lease():
+            order.append(i)
+            await asyncio.sleep(0.005)
+
+    async def main():
+        tasks = []
+        for i in range(5):
+            tasks.append(asyncio.create_task(call(i)))
+            await asyncio.sleep(0)
+        await asyncio.gather(*tasks)
+
+    asyncio.run(main())
+    assert order == [0, 1, 2, 3, 4]
+
+
+def test_lease_records_failure_class_and_cools_key_down():
+    pool = HydraPool(keys=["key-a", "key-b"])
+
+    async def main():
+        with pytest.raises(RuntimeError):
+            async with pool.lease() as key:
+                raise RuntimeError("429 RESOURCE_EXHAUSTED")
+        return key
+
+    failed = asyncio.run(main())
+    state = pool._by_key[failed]
+    assert state.failures == {"rate_limit": 1}
+    assert state.cooldown > 0
+    assert pool.get_active_key() != failed
+
+
+def test_lease_times_out_when_every_key_is_saturated(monkeypatch):
+    monkeypatch.setattr(hydra, "KEY_MAX_INFLIGHT", 1)
+    pool = HydraPool(keys=["key-a"])
+
+    async def main():
+        async with pool.lease():
+            with pytest.raises(hydra.HydraExhausted):
+                async with pool.lease(timeout=0.05):
+                    pass
+
+    asyncio.run(main())
+    assert pool.keys[0].inflight == 0
+
+
+def test_sqlite_backend_shares_cooldowns_between_pools(tmp_path):
+    path = str(tmp_path / "hydra_state.sqlite3")
+    worker_a = HydraPool(keys=["key-a", "key-b"], backend=SQLiteStateBackend(path))
+    worker_b = HydraPool(keys=["key-a", "key-b"], backend=SQLiteStateBackend(path))
+
+    worker_a.report_failure("key-a", 429)
+
+    # worker_b never saw the 429 itself but must steer away from key-a
+    assert {worker_b.get_active_key() for _ in range(5)} == {"key-b"}
+    assert worker_b._by_key["key-a"].fails == 1
+
+    # Fail counts are incremented atomically on the shared row
+    worker_b.report_failure("key-a", 429)
+    assert worker_b._by_key["key-a"].fails == 2
+
+
+def test_busy_shared_state_does_not_block_the_loop(tmp_path):
+    path = str(tmp_path / "hydra_state.sqlite3")
+    worker_a = HydraPool(keys=["key-a", "key-b"], backend=SQLiteStateBackend(path))
+    worker_b = HydraPool(keys=["key-a", "key-b"], backend=SQLiteStateBackend(path))
+    # A third worker sits on the write lock
+    other = sqlite3.connect(path, isolation_level=None)
+    other.execute("BEGIN IMMEDIATE")
+
+    async def main():
+        started = time.monotonic()
+        worker_a.report_failure("key-a", 429)
+        elapsed = time.monotonic() - started
+        # Applied locally right away, published once the lock is free
+        assert worker_a._by_key["key-a"].fails == 1
+        other.execute("COMMIT")
+        await asyncio.sleep(0.5)
+        return elapsed
+
+    assert asyncio.run(main()) < 0.5
+    assert {worker_b.get_active_key() for _ in range(5)} == {"key-b"}
+    assert worker_b._by_key["key-a"].fails == 1
+
+
+def test_prefers_fastest_key_and_model_by_ewma(clock, monkeypatch):
+    monkeypatch.setattr(hydra, "EXPLORE_RATE", 0.0)
+    pool = HydraPool(keys=["slow-key", "fast-key"])
+
+    async def call(expected_key, model, seconds):
+        async with pool.lease(model=model) as key:
+            assert key == expected_key
+            clock.now += seconds
+
+    async def main():
+        # Unseen keys are tried first, in order
+        await call("slow-key", "model-a", 2.0)
+        await call("fast-key", "model-b", 0.2)
+
+    asyncio.run(main())
+
+    assert {pool.get_active_key() for _ in range(3)} == {"fast-key"}
+    assert pool.rank_models(["model-a", "model-b", "model-c"]) == ["model-c", "model-b", "model-a"]
+
+
+def test_errors_inflate_key_cost():
+    healthy, flaky = hydra.Ewma(), hydra.Ewma()
+    healthy.observe(1.0, error=False)
+    flaky.observe(0.5, error=False)
+    flaky.observe(None, error=True)
+    flaky.observe(None, error=True)
+
+    assert flaky.cost() > healthy.cost()
+
+
+def test_provider_pools_are_independent_with_their_own_budgets(monkeypatch):
+    monkeypatch.setenv("HYDRA_GROQ_RPM", "3")
+    groq = HydraPool(keys=["groq-a"], provider="groq")
+    mistral = HydraPool(keys=["mistral-a"], provider="mistral")
+
+    assert groq.keys[0].rpm.capacity == 3
+    assert mistral.keys[0].rpm.capacity == hydra.PROVIDER_BUDGETS["mistral"][0]
+
+    groq.report_failure("groq-a", 429)
+    assert mistral.keys[0].cooldown == 0
+
+
+def test_embeddings_have_their_own_budget_on_the_gemini_keys(clock, monkeypatch, tmp_path):
+    monkeypatch.setattr(hydra, "KEY_RPM", 1)
+    monkeypatch.setenv("GEMINI_API_KEY", "key-a")
+    monkeypatch.setenv("VITE_GEMINI_KEY_POOL", "[]")
+    monkeypatch.setattr(hydra, "_setting", lambda name: os.environ.get(name))
+    backend = SQLiteStateBackend(str(tmp_path / "hydra_state.sqlite3"))
+    flash = HydraPool(provider="gemini", backend=backend)
+    embeddings = HydraPool(provider="gemini_embedding", backend=backend)
+
+    assert [k.key for k in embeddings.keys] == ["key-a"]
+    assert embeddings.keys[0].rpm.capacity == hydra.PROVIDER_BUDGETS["gemini_embedding"][0]
+
+    # Flash over its 1 RPM and cooling down after a 429 doesn't touch the embedding quota
+    flash.get_active_key()
+    flash.report_failure("key-a", 429)
+    assert embeddings.keys[0].key_id != flash.keys[0].key_id
+    assert embeddings.keys[0].cooldown == 0
+    assert [embeddings.get_active_key() for _ in range(3)] == ["key-a"] * 3
+    assert embeddings.keys[0].rpm.level >= 1
+
+
+def test_whisper_has_its_own_budget_and_breaker_on_the_groq_keys(monkeypatch):
+    monkeypatch.setattr(HydraPool, "_pools", {})
+    monkeypatch.setenv("GROQ_API_KEY", "gsk-a")
+    monkeypatch.setenv("GROQ_KEY_POOL", "[]")
+    monkeypatch.setattr(hydra, "_setting", lambda name: os.environ.get(name))
+    chat, whisper = hydra.get_pool("groq"), hydra.get_pool("groq_whisper")
+
+    assert [k.key for k in whisper.keys] == ["gsk-a"]
+    assert whisper.keys[0].rpm.capacity == hydra.PROVIDER_BUDGETS["groq_whisper"][0]
+    assert whisper.breaker is not chat.breaker
+
+    # A burst of voice notes drains the Whisper bucket only
+    for _ in range(10):
+        whisper.get_active_key()
+    assert chat.keys[0].rpm.level == chat.keys[0].rpm.capacity
+
+
+def test_for_provider_returns_a_process_wide_pool(monkeypatch):
+    monkeypatch.setattr(HydraPool, "_pools", {})
+    assert hydra.get_pool("deepseek") is HydraPool.for_provider("deepseek")
+    assert hydra.get_pool("deepseek").provider == "deepseek"
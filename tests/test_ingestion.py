@@ -0,0 +1,131 @@
+import os
+import sys
+import asyncio
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.ingestion import IngestionCheckpoint, RAGIngestor, source_for
+from app.utils.chunker import MarkdownChunker
+
+# Small budget: one chunk per "## " section of the test corpus
+SECTION_CHUNKER = MarkdownChunker(max_tokens=8, overlap_tokens=2)
+
+
+class FakeService:
+    def __init__(self, fail_after=None):
+        self.batches = []
+        self.fail_after = fail_after
+
+    async def store_documents(self, documents, organization_id):
+        if self.fail_after is not None and len(self.batches) >= self.fail_after:
+            return 0
+        await asyncio.sleep(0)
+        self.batches.append([d["content"] for d in documents])
+        return len(documents)
+
+
+def write_corpus(root):
+    root.mkdir()
+    (root / "a.md").write_text("## Clientes\nAndrea\n## Procesos\nFacturación\n## Equipo\nVox", encoding="utf-8")
+    (root / "b.md").write_text("## Precios\nPlan base\n## Contacto\nhola@elevate", encoding="utf-8")
+    (root / "notes.bin").write_text("ignored", encoding="utf-8")
+
+
+def test_ingest_batches_and_skips_unchanged_chunks(tmp_path):
+    write_corpus(tmp_path / "RAG")
+    checkpoint = IngestionCheckpoint(str(tmp_path / "ckpt.sqlite3"))
+    service = FakeService()
+
+    report = asyncio.run(RAGIngestor(service, "org", checkpoint, batch_size=2, chunker=SECTION_CHUNKER).ingest([str(tmp_path / "RAG")]))
+    assert (report.files, report.chunks, report.stored, report.skipped) == (2, 5, 5, 0)
+    assert [len(b) for b in service.batches] == [2, 2, 1]
+
+    # Edit one section: only the changed chunk is embedded again
+    (tmp_path / "RAG" / "b.md").write_text("## Precios\nPlan pro\n## Contacto\nhola@elevate", encoding="utf-8")
+    service.batches.clear()
+    report = asyncio.run(RAGIngestor(service, "org", checkpoint, batch_size=2, chunker=SECTION_CHUNKER).ingest([str(tmp_path / "RAG")]))
+    assert (report.stored, report.skipped) == (1, 4)
+    assert service.batches == [["## Precios\nPlan pro"]]
+
+
+def test_interrupted_run_resumes_from_checkpoint(tmp_path):
+    write_corpus(tmp_path / "RAG")
+    checkpoint = IngestionCheckpoint(str(tmp_path / "ckpt.sqlite3"))
+
+    failing = FakeService(fail_after=1)
+    report = asyncio.run(RAGIngestor(failing, "org", checkpoint, batch_size=2, concurrency=1, chunker=SECTION_CHUNKER).ingest([str(tmp_path / "RAG")]))
+    assert report.stored == 2 and report.failed == 3
+
+    healthy = FakeService()
+    report = asyncio.run(RAGIngestor(healthy, "org", checkpoint, batch_size=2, chunker=SECTION_CHUNKER).ingest([str(tmp_path / "RAG")]))
+    assert (report.stored, report.skipped) == (3, 2)
+    assert sum(len(b) for b in healthy.batches) == 3
+
+
+class FakeStore:
+    """document_chunks for one org as {source: {chunk_hash: content}}."""
+
+    def __init__(self):
+        self.rows = {}
+        self.embedded = 0
+
+    async def sync_source(self, source, documents, organization_id):
+        stored = self.rows.get(source, {})
+        current = {d["metadata"]["chunk_hash"]: d["content"] for d in documents}
+        new = {h: c for h, c in current.items() if h not in stored}
+        deleted = len(stored.keys() - current.keys())
+        self.embedded += len(new)
+        self.rows[source] = current
+        return {"inserted": len(new), "deleted": deleted}
+
+
+def test_sync_inserts_new_and_deletes_stale_chunks(tmp_path):
+    write_corpus(tmp_path / "RAG")
+    checkpoint = IngestionCheckpoint(str(tmp_path / "ckpt.sqlite3"))
+    store = FakeStore()
+    ingestor = RAGIngestor(store, "org", checkpoint, chunker=SECTION_CHUNKER)
+
+    report = asyncio.run(ingestor.sync([str(tmp_path / "RAG")]))
+    assert (report.files, report.stored, report.deleted) == (2, 5, 0)
+    assert set(store.rows) == {"RAG/a.md", "RAG/b.md"}
+
+    (tmp_path / "RAG" / "a.md").write_text("## Clientes\nAndrea\n## Equipo\nVox y Lumina", encoding="utf-8")
+    (tmp_path / "RAG" / "b.md").unlink()
+    store.embedded = 0
+    report = asyncio.run(ingestor.sync([str(tmp_path / "RAG")]))
+
+    assert (report.stored, report.deleted) == (1, 4)
+    assert store.embedded == 1
+    assert store.rows["RAG/b.md"] == {}
+    assert checkpoint.sources("org") == {"RAG/a.md"}
+
+
+def test_sync_keeps_same_named_files_apart(tmp_path):
+    for folder in ("ventas", "soporte"):
+        (tmp_path / folder).mkdir()
+        (tmp_path / folder / "notas.md").write_text(f"## {folder}\nPendientes de {folder}", encoding="utf-8")
+    files = [str(tmp_path / "ventas" / "notas.md"), str(tmp_path / "soporte" / "notas.md")]
+    checkpoint = IngestionCheckpoint(str(tmp_path / "ckpt.sqlite3"))
+    store = FakeStore()
+    ingestor = RAGIngestor(store, "org", checkpoint, chunker=SECTION_CHUNKER)
+
+    asyncio.run(ingestor.sync(files))
+    assert len(store.rows) == 2 and all(len(rows) == 1 for rows in store.rows.values())
+
+    # Removing one file deletes its chunks only; the namesake stays indexed
+    os.remove(files[0])
+    report = asyncio.run(ingestor.sync(files))
+    assert (report.files, report.deleted) == (2, 1)
+    kept = source_for(files[1], files)
+    assert checkpoint.sources("org") == {kept}
+    assert {s for s, rows in store.rows.items() if rows} == {kept}
+
+
+def test_folder_roots_with_the_same_name_are_rejected(tmp_path):
+    for parent in ("a", "b"):
+        (tmp_path / parent / "RAG").mkdir(parents=True)
+    ingestor = RAGIngestor(FakeStore(), "org", IngestionCheckpoint(str(tmp_path / "ckpt.sqlite3")))
+    with pytest.raises(ValueError):
+        asyncio.run(ingestor.sync([str(tmp_path / "a" / "RAG"), str(tmp_path / "b" / "RAG")]))
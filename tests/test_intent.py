@@ -0,0 +1,151 @@
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("SUPABASE_URL", "https://test.supabase.co")
+os.environ.setdefault("SUPABASE_SERVICE_ROLE_KEY", "test-service-role-key")
+
+import asyncio
+import zlib
+
+import pytest
+
+from app.agentes.intent import IntentMatcher, CentroidRouter, words
+from app.agentes.router import AureonCortex
+from app.agentes.scheduler import SCHEDULER_INTENTS
+from app.agentes.nux import NUX_INTENTS
+
+ROUTER = [
+    ("Dame una estrategia para el lanzamiento de Vernal", "lumina"),
+    ("Analiza el ROI de la campaña de marzo", "lumina"),
+    ("¿Cuál es el riesgo de migrar el servidor?", "lumina"),
+    ("Necesito un plan de contenidos", "lumina"),
+    ("Evalúa estas dos propuestas", "lumina"),
+    ("Prospecta leads de clínicas dentales", "nux"),
+    ("Contacta al cliente de ayer", "nux"),
+    ("Haz seguimiento a la propuesta de Vernal", "nux"),
+    ("¿Qué dijimos sobre el contrato de Andrea?", "memoris"),
+    ("Recuerda el historial con este proveedor", "memoris"),
+    ("Busca en el conocimiento cómo facturamos", "memoris"),
+    ("Agenda una reunión con Andrea el jueves", "scheduler"),
+    ("¿Qué tengo en el calendario?", "scheduler"),
+    ("Revisa mi correo", "scheduler"),
+    ("Crea una tarea en Notion", "scheduler"),
+    ("¿Tengo clases mañana?", "scheduler"),
+    ("REUNION con el equipo a las 3", "scheduler"),
+    # Word boundaries: these used to be misrouted by substring matching
+    ("Compré una planta para la oficina", "vox"),
+    ("La explanada quedó bonita", "vox"),
+    ("Hola Aureon, ¿cómo estás?", "vox"),
+    ("Cuéntame un chiste", "vox"),
+    ("Lo citaron en el periódico", "vox"),
+]
+
+SCHEDULER = [
+    ("Revisa mis correos de Andrea", "sync"),
+    ("¿Llegó algún email nuevo?", "sync"),
+    ("Agenda una cita con el dentista", "create"),
+    ("Crea una tarea: enviar factura", "create"),
+    ("Nueva reunión con Vernal el lunes", "create"),
+    ("¿Qué tengo hoy?", "list"),
+    ("Muéstrame mis tareas", "list"),
+    ("Lee el calendario de la semana", "list"),
+]
+
+NUX = [
+    ("Crea tarea de seguimiento para Vernal", "followup"),
+    ("Anota: llamar a Andrea", "followup"),
+    ("Envíale el outreach a los leads nuevos", "outreach"),
+    ("Contacta a las clínicas de Caracas", "outreach"),
+    ("¿Qué opinas de este lead?", None),
+]
+
+
+@pytest.mark.parametrize("query,agent", ROUTER)
+def test_router_labels(query, agent):
+    # classify_intent only needs the class-level matcher, not the agents
+    cortex = AureonCortex.__new__(AureonCortex)
+    assert cortex.classify_intent(query).agent == agent
+
+
+@pytest.mark.parametrize("query,intent", SCHEDULER)
+def test_scheduler_labels(query, intent):
+    assert SCHEDULER_INTENTS.best(query).intent == intent
+
+
+@pytest.mark.parametrize("query,intent", NUX)
+def test_nux_labels(query, intent):
+    best = NUX_INTENTS.best(query)
+    assert (best.intent if best else None) == intent
+
+
+def test_scores_every_intent_in_one_pass():
+    matcher = IntentMatcher({"a": ["plan", "nueva reunión"], "b": ["reunión", "plan*"]})
+    ranked = matcher.scores("Plan para la nueva reunión y planificación")
+    # "Plan" is the exact keyword of a; only "planificación" needs b's stem
+    assert [(m.intent, m.score) for m in ranked] == [("a", 3.0), ("b", 1.0)]
+    assert ranked[1].keywords == ["plan*"]
+
+
+def test_whole_words_accents_and_overlaps():
+    matcher = IntentMatcher({
+        "a": ["qué dijimos", "plan", "nueva reunión", "analiz*"],
+        "b": ["reunión", "plan*", "dijimos ayer", "agenda una", "cita", "mañana"],
+    })
+    assert matcher._keywords("Compré una planta, la explanada quedó bonita") == ["plan*"]
+    assert matcher._keywords("Lo citaron ayer; ¿cita?") == ["cita"]
+    assert matcher._keywords("¿QUÉ DIJIMOS ayer de la REUNION?") == ["que dijimos", "reunion"]
+    assert matcher._keywords("Analizar la nueva reunión, MAÑANA o manana") == ["analiz*", "nueva reunion", "manana", "manana"]
+    assert matcher._keywords("agenda unas citas_nuevas; reunión_2") == []
+    assert matcher._keywords("") == [] and matcher._keywords("¿😀?") == []
+
+
+class BagOfWords:
+    """Deterministic stand-in for the embedding model: hashed word counts."""
+
+    def __init__(self, dim: int = 64):
+        self.dim = dim
+        self.calls = []
+
+    async def __call__(self, texts):
+        self.calls.append(list(texts))
+        vectors = []
+        for text in texts:
+            v = [0.0] * self.dim
+            for w in words(text):
+                v[zlib.crc32(w.encode()) % self.dim] += 1.0
+            vectors.append(v)
+        return vectors
+
+
+EXAMPLES = {
+    "scheduler": ["mueve la llamada del viernes", "pon la llamada del lunes"],
+    "vox": ["hola como estas", "gracias hola"],
+}
+
+
+def test_centroids_route_clear_winner_and_embed_examples_once():
+    embed = BagOfWords()
+    router = CentroidRouter(EXAMPLES, embed, threshold=0.5, margin=0.1)
+
+    async def run():
+        return [await router.classify("mueve la llamada del lunes"), await router.classify("hola")]
+
+    scheduler, vox = asyncio.run(run())
+    assert scheduler.intent == "scheduler" and scheduler.score >= 0.5
+    assert vox.intent == "vox"
+    assert len(embed.calls) == 3  # examples once + one per query
+
+
+def test_centroids_abstain_when_unsure_or_unavailable():
+    router = CentroidRouter(EXAMPLES, BagOfWords(), threshold=0.5, margin=0.1)
+    assert asyncio.run(router.classify("factura de marzo")) is None
+
+    async def broken(texts):
+        raise RuntimeError("no keys")
+
+    router = CentroidRouter(EXAMPLES, broken)
+    assert asyncio.run(router.classify("mueve la llamada")) is None
+    # The failed build is not retried on every message
+    assert router._retry_at > 0
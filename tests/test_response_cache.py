@@ -0,0 +1,83 @@
+import asyncio
+import os
+import sys
+import zlib
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("SUPABASE_URL", "https://test.supabase.co")
+os.environ.setdefault("SUPABASE_SERVICE_ROLE_KEY", "test-service-role-key")
+
+from app.agentes.intent import words
+from app.services.response_cache import SemanticResponseCache, response_scope, ttl_for
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class BagOfWords:
+    """Hashed word counts, ignoring filler words, as a stand-in for the embedding model."""
+
+    FILLER = {"me", "por", "favor", "el", "la", "de"}
+
+    def __init__(self):
+        self.calls = 0
+
+    async def __call__(self, texts):
+        self.calls += 1
+        vectors = []
+        for text in texts:
+            v = [0.0] * 64
+            for w in words(text):
+                if w not in self.FILLER:
+                    v[zlib.crc32(w.encode()) % 64] += 1.0
+            vectors.append(v)
+        return vectors
+
+
+ANDREA = response_scope("org-1", 42, "lumina")
+
+
+def test_exact_and_near_duplicate_hits_within_scope():
+    embed, clock = BagOfWords(), Clock()
+    cache = SemanticResponseCache("t", embed=embed, similarity=0.95, clock=clock)
+
+    async def main():
+        await cache.put("Dame la estrategia de precios", ANDREA, "Sube 10%", ttl=60)
+        calls = embed.calls
+        exact = await cache.get("  dame la ESTRATEGIA de precios ", ANDREA)
+        assert embed.calls == calls  # exact text: no embedding call
+        near = await cache.get("dame por favor estrategia de precios", ANDREA)
+        other_user = await cache.get("Dame la estrategia de precios", response_scope("org-1", 7, "lumina"))
+        unrelated = await cache.get("Dame la estrategia de contenidos", ANDREA)
+        clock.now = 61
+        expired = await cache.get("Dame la estrategia de precios", ANDREA)
+        return exact, near, other_user, unrelated, expired
+
+    exact, near, other_user, unrelated, expired = asyncio.run(main())
+    assert exact == near == "Sube 10%"
+    assert other_user is None and unrelated is None and expired is None
+    stats = cache.stats()
+    assert (stats["exact_hit"], stats["semantic_hit"], stats["miss"]) == (1, 1, 3)
+    assert stats["hit_ratio"] == 0.4
+
+
+def test_failures_and_side_effects_are_never_cached():
+    cache = SemanticResponseCache("t", embed=BagOfWords())
+
+    async def main():
+        await cache.put("¿Cómo vamos?", ANDREA, "❌ Lumina error: 500", ttl=60)
+        await cache.put("¿Cómo vamos?", ANDREA, "⏱️ Se me acabó el tiempo", ttl=60)
+        return await cache.get("¿Cómo vamos?", ANDREA)
+
+    assert asyncio.run(main()) is None
+    assert ttl_for("nux", "¿Qué opinas de este lead?") == 0
+    assert ttl_for("vox", "Crea una tarea para mañana") == 0
+    assert ttl_for("scheduler", "¿Qué tengo hoy?") == 60
+    assert ttl_for("vox", "¿Cómo está el servidor?") == 60
+    assert ttl_for("lumina", "Dame una estrategia para Vernal") == 3600
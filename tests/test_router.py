@@ -0,0 +1,129 @@
+import asyncio
+import os
+import sys
+import time
+import types
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("SUPABASE_URL", "https://test.supabase.co")
+os.environ.setdefault("SUPABASE_SERVICE_ROLE_KEY", "test-service-role-key")
+
+from app.agentes.router import AureonCortex
+from app.utils.deadline import request_deadline
+
+
+def make_cortex(delays):
+    """Cortex with stub agents that sleep `delays[agent]` seconds and echo their input."""
+    cortex = AureonCortex.__new__(AureonCortex)
+    cortex.centroids = None
+    cortex.response_cache = None
+    calls = []
+
+    def agent(name):
+        async def run(query, context=None):
+            calls.append((name, query, context.get("mensaje_completo")))
+            await asyncio.sleep(delays.get(name, 0))
+            return f"{name} ok"
+        return run
+
+    cortex.lumina = types.SimpleNamespace(think=agent("lumina"))
+    cortex.scheduler = types.SimpleNamespace(act=agent("scheduler"))
+    cortex.memoris = types.SimpleNamespace(recall=agent("memoris"))
+    cortex.nux = types.SimpleNamespace(act=agent("nux"))
+    return cortex, calls
+
+
+QUERY = "Analiza el riesgo del cliente Vernal y agéndame una reunión con ellos el jueves"
+
+
+def test_multi_intent_message_is_split_per_agent():
+    cortex, _ = make_cortex({})
+    decision = cortex.classify_intent(QUERY)
+    assert [(t.agent, t.query) for t in decision.subtasks] == [
+        ("lumina", "Analiza el riesgo del cliente Vernal"),
+        ("scheduler", "agéndame una reunión con ellos el jueves"),
+    ]
+    # Several keywords of different agents in one clause are still one task
+    assert cortex.classify_intent("Agenda una reunión con el cliente").subtasks == []
+
+
+def test_fan_out_runs_agents_concurrently_and_merges_in_order():
+    cortex, calls = make_cortex({"lumina": 0.2, "scheduler": 0.2})
+    started = time.perf_counter()
+    answer = asyncio.run(cortex.route(QUERY, context={"user_id": 1}))
+    elapsed = time.perf_counter() - started
+
+    assert elapsed < 0.35
+    assert answer.index("lumina ok") < answer.index("scheduler ok")
+    assert all(full == QUERY for _, _, full in calls)
+
+
+def test_slow_agent_is_cut_by_the_deadline_without_losing_the_rest():
+    cortex, _ = make_cortex({"lumina": 5})
+
+    async def main():
+        with request_deadline(0.3) as deadline:
+            answer = await cortex.route(QUERY, context={"user_id": 1})
+        return answer, deadline
+
+    answer, deadline = asyncio.run(main())
+    assert "scheduler ok" in answer and "⏱️" in answer
+    assert "fanout:lumina" in deadline.skipped
+
+
+def test_telegram_voice_note_is_transcribed_for_text_agents(monkeypatch):
+    from app.agentes import router
+
+    cortex, _ = make_cortex({})
+    cortex.latency = router.LatencyTracker(95.0, 8.0)
+    heard = []
+
+    async def respond(query, context=None, attachments=None):
+        heard.append(query)
+        return "vox ok"
+
+    async def transcribe(audio, mime_type="audio/ogg"):
+        assert audio == b"OggS" and mime_type == "audio/ogg"
+        return "agenda una reunión"
+
+    cortex.vox = types.SimpleNamespace(respond=respond)
+    monkeypatch.setattr(router.transcription_service, "transcribe", transcribe)
+    attachments = [{"type": "audio", "data": b"OggS", "mime_type": "audio/ogg"}]
+
+    assert asyncio.run(cortex.route("", context={"user_id": 1}, attachments=attachments)) == "vox ok"
+    assert heard == ["agenda una reunión"]
+
+
+class RecordingCache:
+    def __init__(self):
+        self.puts = []
+
+    async def get(self, query, scope):
+        return None
+
+    async def put(self, query, scope, answer, ttl):
+        self.puts.append(answer)
+
+    def bypass(self):
+        pass
+
+
+def test_fan_out_with_a_failed_part_is_not_cached():
+    cortex, _ = make_cortex({})
+    cortex.response_cache = RecordingCache()
+
+    async def failing_think(query, context=None):
+        return "Error estratégico: Mistral no respondió"
+
+    cortex.lumina = types.SimpleNamespace(think=failing_think)
+    query = "Analiza el riesgo del cliente Vernal y recuerda qué dijimos del contrato"
+    answer = asyncio.run(cortex.route(query, context={"user_id": 1}))
+    assert "Error estratégico" in answer and "memoris ok" in answer
+    assert cortex.response_cache.puts == []
+
+    # The same message with every part healthy is cached
+    cortex, _ = make_cortex({})
+    cortex.response_cache = RecordingCache()
+    asyncio.run(cortex.route(query, context={"user_id": 1}))
+    assert len(cortex.response_cache.puts) == 1
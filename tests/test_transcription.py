@@ -0,0 +1,99 @@
+import os
+import sys
+import asyncio
+from contextlib import asynccontextmanager
+
+import httpx
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("SUPABASE_URL", "https://test.supabase.co")
+os.environ.setdefault("SUPABASE_SERVICE_ROLE_KEY", "test-service-role-key")
+
+from app.services import transcription
+from app.services.transcription import TranscriptionService, plan_chunks
+
+
+class FakePool:
+    keys = ["gsk-test"]
+
+    @asynccontextmanager
+    async def lease(self, **kwargs):
+        yield "gsk-test"
+
+
+def make_service(monkeypatch, handler, **kwargs) -> TranscriptionService:
+    pools = {"groq_whisper": FakePool()}  # never the Groq chat pool
+    monkeypatch.setattr(transcription, "get_pool", pools.__getitem__)
+    service = TranscriptionService(**kwargs)
+    service._transport = httpx.MockTransport(handler)
+    return service
+
+
+def test_plan_chunks_cuts_at_silences_within_budget():
+    # 150s note, pauses around 40s, 70s and 125s; 60s pieces, 30s minimum
+    silences = [(39_000, 41_000), (69_000, 71_000), (124_000, 126_000)]
+    assert plan_chunks(150_000, silences, 60_000, 30_000) == [(0, 40_000), (40_000, 70_000), (70_000, 125_000), (125_000, 150_000)]
+    # Only a pause too early to be useful: hard cut at the budget
+    assert plan_chunks(100_000, [(5_000, 6_000)], 60_000, 30_000) == [(0, 60_000), (60_000, 100_000)]
+    assert plan_chunks(50_000, [], 60_000, 30_000) == [(0, 50_000)]
+
+
+def test_same_note_is_transcribed_once(monkeypatch):
+    uploads = []
+
+    async def handler(request):
+        uploads.append(request)
+        assert request.url.path == "/openai/v1/audio/transcriptions"
+        assert request.headers["authorization"] == "Bearer gsk-test"
+        await asyncio.sleep(0.05)
+        return httpx.Response(200, text=" hola mundo \n")
+
+    service = make_service(monkeypatch, handler)
+
+    async def main():
+        # Concurrent requests for one note share the upload; later ones hit the cache
+        first = await asyncio.gather(*(service.transcribe(b"OggS-note") for _ in range(3)))
+        again = await service.transcribe(b"OggS-note")
+        await service.close()
+        return first, again
+
+    first, again = asyncio.run(main())
+    assert first == ["hola mundo"] * 3 and again == "hola mundo"
+    assert len(uploads) == 1
+    assert service.stats()["hit"] == 1
+
+
+def test_long_note_pieces_run_in_parallel_and_keep_order(monkeypatch):
+    monkeypatch.setattr(transcription, "MIN_BYTES_PER_SECOND", 0)
+    monkeypatch.setattr(transcription, "_split_audio", lambda audio, fmt, chunk_ms: [b"p1", b"p2", b"p3"])
+    in_flight = peak = 0
+
+    async def handler(request):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        body = request.content
+        piece = next(p for p in (b"p1", b"p2", b"p3") if p in body)
+        # Later pieces answer first: the stitched text must still follow the audio
+        await asyncio.sleep({b"p1": 0.06, b"p2": 0.03, b"p3": 0.0}[piece])
+        in_flight -= 1
+        return httpx.Response(200, text=piece.decode())
+
+    service = make_service(monkeypatch, handler)
+    assert asyncio.run(service.transcribe(b"long-note")) == "p1 p2 p3"
+    assert peak == 3
+
+
+def test_failed_piece_returns_partial_text_without_caching(monkeypatch):
+    monkeypatch.setattr(transcription, "MIN_BYTES_PER_SECOND", 0)
+    monkeypatch.setattr(transcription, "_split_audio", lambda audio, fmt, chunk_ms: [b"p1", b"p2"])
+
+    async def handler(request):
+        if b"p2" in request.content:
+            return httpx.Response(500)
+        return httpx.Response(200, text="inicio")
+
+    service = make_service(monkeypatch, handler)
+    assert asyncio.run(service.transcribe(b"long-note")) == "inicio"
+    assert service.stats()["failed"] == 1 and service.stats()["size"] == 0
@@ -0,0 +1,266 @@
+import os
+import sys
+import json
+import asyncio
+
+import httpx
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("SUPABASE_URL", "https://test.supabase.co")
+os.environ.setdefault("SUPABASE_SERVICE_ROLE_KEY", "test-service-role-key")
+os.environ.setdefault("GEMINI_API_KEY", "test-api-key-placeholder")
+os.environ.setdefault("CACHE_DIR", "/tmp/aureon-test")
+
+from app.services import vector_search
+from app.services.embedding_cache import EmbeddingCache
+from app.services.vector_search import VectorSearchService
+
+
+def make_service() -> VectorSearchService:
+    service = VectorSearchService()
+    service.embedding_cache = EmbeddingCache()
+    return service
+
+
+def test_embed_many_batches_dedupes_and_keeps_order(monkeypatch):
+    monkeypatch.setattr(vector_search, "EMBED_BATCH_SIZE", 3)
+    service = make_service()
+    calls = []
+
+    async def fake_batch(texts, task_type):
+        calls.append(list(texts))
+        await asyncio.sleep(0)
+        return [[float(len(t))] for t in texts]
+
+    service._embed_batch = fake_batch
+    texts = ["a", "bb", "a", "ccc", "dddd", "eeeee", "bb"]
+    vectors = asyncio.run(service.embed_many(texts))
+
+    assert vectors == [[1.0], [2.0], [1.0], [3.0], [4.0], [5.0], [2.0]]
+    assert sorted(len(c) for c in calls) == [2, 3]
+
+    # Second pass is served from the cache
+    calls.clear()
+    assert asyncio.run(service.embed_many(["eeeee", "a"])) == [[5.0], [1.0]]
+    assert calls == []
+
+
+def test_concurrent_searches_overlap():
+    service = make_service()
+    in_flight = 0
+    peak = 0
+
+    async def fake_embedding(text, task_type="RETRIEVAL_QUERY"):
+        return [0.1, 0.2]
+
+    async def handler(request):
+        nonlocal in_flight, peak
+        assert request.url.path == "/rest/v1/rpc/match_documents"
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.2)
+        in_flight -= 1
+        return httpx.Response(200, json=[{"content": "doc", "similarity": 0.9}])
+
+    service.get_embedding = fake_embedding
+    service._transport = httpx.MockTransport(handler)
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        results = await asyncio.gather(*(service.search(f"q{i}", "org") for i in range(5)))
+        elapsed = loop.time() - started
+        await service.close()
+        return results, elapsed
+
+    results, elapsed = asyncio.run(run())
+
+    assert all(r == [{"content": "doc", "similarity": 0.9}] for r in results)
+    assert peak == 5
+    # Serialized this would take ~1s
+    assert elapsed < 0.6
+
+
+def test_local_index_matches_rpc_semantics():
+    from app.services.local_index import LocalVectorIndex
+
+    rows = [
+        {"id": 1, "content": "x", "metadata": {}, "embedding": "[1, 0]"},
+        {"id": 2, "content": "diag", "metadata": {}, "embedding": [1, 1]},
+        {"id": 3, "content": "y", "metadata": {}, "embedding": [0, 1]},
+        {"id": 4, "content": "near-x", "metadata": {}, "embedding": [0.9, 0.1]},
+    ]
+
+    async def loader(org, with_embeddings):
+        return rows if org == "org" else []
+
+    async def run():
+        index = LocalVectorIndex(loader)
+        top = await index.search([1.0, 0.0], "org", match_threshold=0.5, match_count=2)
+        everything = await index.search([1.0, 0.0], "org", match_threshold=0.5, match_count=10)
+        index.add("org", [{"id": 5, "content": "new", "metadata": {}, "embedding": [2, 0]}])
+        after = await index.search([1.0, 0.0], "org", match_threshold=0.5, match_count=10)
+        other = await index.search([1.0, 0.0], "other", match_threshold=0.5, match_count=10)
+        return top, everything, after, other
+
+    top, everything, after, other = asyncio.run(run())
+
+    assert [r["id"] for r in top] == [1, 4]
+    # y (similarity 0) is below the threshold; diag (0.707) passes
+    assert [r["id"] for r in everything] == [1, 4, 2]
+    assert abs(everything[2]["similarity"] - 0.7071) < 1e-3
+    assert {r["id"] for r in after} == {1, 2, 4, 5}
+    assert other == []
+
+
+def test_identical_searches_are_coalesced_and_invalidated_on_store():
+    service = make_service()
+    rpc_calls = 0
+
+    async def fake_embedding(text, task_type="RETRIEVAL_QUERY"):
+        return [0.1, 0.2]
+
+    async def fake_embed_many(texts, task_type="RETRIEVAL_DOCUMENT"):
+        return [[0.1, 0.2] for _ in texts]
+
+    async def handler(request):
+        nonlocal rpc_calls
+        if request.url.path.endswith("/rpc/match_documents"):
+            rpc_calls += 1
+            await asyncio.sleep(0.05)
+            return httpx.Response(200, json=[{"content": "doc"}])
+        return httpx.Response(201, json=[{"id": 1}])
+
+    service.get_embedding = fake_embedding
+    service.embed_many = fake_embed_many
+    service._transport = httpx.MockTransport(handler)
+
+    async def run():
+        burst = await asyncio.gather(*(service.search("¿Quién es Andrea?", "org") for _ in range(5)))
+        await service.search("¿quién es  andrea?", "org")
+        after_burst = rpc_calls
+        await service.store_document("nuevo", {}, "org")
+        await service.search("¿Quién es Andrea?", "org")
+        await service.close()
+        return burst, after_burst
+
+    burst, after_burst = asyncio.run(run())
+
+    assert all(r == [{"content": "doc"}] for r in burst)
+    assert after_burst == 1
+    assert rpc_calls == 2
+
+
+def test_bm25_ranks_exact_identifiers():
+    from app.services.keyword_index import BM25Index, tokenize
+
+    assert "http" in tokenize("n8n-nodes-base.httpRequest") and "httprequest" in tokenize("httpRequest")
+    assert tokenize("¿Qué es la Reunión?") == ["reunion"]
+
+    index = BM25Index()
+    index.add("Workflow de facturación para clientes")
+    index.add("BLUEPRINT: sync_hubspot.json nodes: httpRequest, hubspot")
+    index.add("Notas de la reunión con Andrea sobre facturación")
+
+    assert [doc for doc, _ in index.search("hubspot")] == [1]
+    assert [doc for doc, _ in index.search("reunion facturacion")][0] == 2
+
+
+def test_hybrid_search_fuses_keyword_hits():
+    service = make_service()
+
+    async def fake_embedding(text, task_type="RETRIEVAL_QUERY"):
+        return [0.1, 0.2]
+
+    async def handler(request):
+        if request.url.path.endswith("/rpc/match_documents"):
+            return httpx.Response(200, json=[
+                {"id": 1, "content": "Guía general de automatizaciones", "metadata": {}, "similarity": 0.7},
+                {"id": 2, "content": "Workflow sync_hubspot con httpRequest", "metadata": {}, "similarity": 0.6},
+            ])
+        assert request.url.params["select"] == "id,content,metadata"
+        return httpx.Response(200, json=[
+            {"id": 1, "content": "Guía general de automatizaciones", "metadata": {}},
+            {"id": 2, "content": "Workflow sync_hubspot con httpRequest", "metadata": {}},
+            {"id": 3, "content": "Cliente Andrea: contrato hubspot", "metadata": {}},
+        ])
+
+    service.get_embedding = fake_embedding
+    service._transport = httpx.MockTransport(handler)
+
+    async def run():
+        vector_only = await service.search("hubspot", "org", limit=2, hybrid=False)
+        fused = await service.search("hubspot", "org", limit=2, hybrid=True)
+        keyword_heavy = await service.search("hubspot", "org", limit=3, hybrid=True, vector_weight=0.1)
+        await service.close()
+        return vector_only, fused, keyword_heavy
+
+    vector_only, fused, keyword_heavy = asyncio.run(run())
+
+    assert [r["id"] for r in vector_only] == [1, 2]
+    # In both rankings, id 2 wins the fusion
+    assert fused[0]["id"] == 2 and fused[0]["similarity"] == 0.6
+    assert [r["id"] for r in keyword_heavy][:2] == [2, 3]
+
+
+def test_int8_index_keeps_ranking_and_enforces_dim():
+    import numpy as np
+    from app.services.local_index import OrgIndex
+
+    rng = np.random.default_rng(3)
+    vectors = rng.normal(size=(300, 64)).astype(np.float32)
+    rows = [{"id": i, "content": "", "embedding": v.tolist()} for i, v in enumerate(vectors)]
+
+    exact = OrgIndex()
+    exact.add(rows)
+    quantized = OrgIndex(quantize=True, dim=64)
+    quantized.add(rows + [{"id": "bad", "content": "", "embedding": [1.0] * 32}])
+
+    assert len(quantized) == 300
+    assert quantized.nbytes() < exact.nbytes() / 3
+    query = vectors[17] + 0.05 * rng.normal(size=64).astype(np.float32)
+    top_exact = exact.search(query.tolist(), 0.0, 5)
+    top_quantized = quantized.search(query.tolist(), 0.0, 5)
+    assert top_quantized[0]["id"] == 17
+    assert abs(top_quantized[0]["similarity"] - top_exact[0]["similarity"]) < 0.02
+
+    try:
+        quantized.search([1.0] * 32, 0.0, 5)
+        assert False, "dim mismatch must raise"
+    except ValueError:
+        pass
+
+
+def test_sync_source_embeds_only_new_chunks():
+    service = make_service()
+    embedded = []
+    rpc_payloads = []
+
+    async def fake_embed_many(texts, task_type="RETRIEVAL_DOCUMENT"):
+        embedded.extend(texts)
+        return [[0.1, 0.2] for _ in texts]
+
+    async def handler(request):
+        if request.url.path.endswith("/rpc/sync_document_chunks"):
+            rpc_payloads.append(json.loads(request.content))
+            return httpx.Response(200, json={"inserted": 1, "deleted": 1})
+        assert request.url.params["metadata->>source"] == "eq.RAG/a.md"
+        return httpx.Response(200, json=[{"id": 1, "chunk_hash": "h1"}, {"id": 2, "chunk_hash": "h2"}])
+
+    service.embed_many = fake_embed_many
+    service._transport = httpx.MockTransport(handler)
+    documents = [
+        {"content": "kept", "metadata": {"chunk_hash": "h1"}},
+        {"content": "new", "metadata": {"chunk_hash": "h3"}},
+    ]
+
+    async def run():
+        result = await service.sync_source("RAG/a.md", documents, "org")
+        await service.close()
+        return result
+
+    assert asyncio.run(run()) == {"inserted": 1, "deleted": 1}
+    assert embedded == ["new"]
+    assert sorted(rpc_payloads[0]["p_keep_hashes"]) == ["h1", "h3"]
+    assert [r["content"] for r in rpc_payloads[0]["p_rows"]] == ["new"]